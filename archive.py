@@ -0,0 +1,216 @@
+import json
+import os
+import numpy as np
+from completion import element_type
+from pipes import Stand, Rack, pipe_id_key
+
+PIPE_TYPES = ["triple", "double", "single", "pup", "assembly"]
+
+# Column name -> dtype of the raw column file
+COLUMNS = {"well": np.int32,        # Index into the well dictionary
+           "pipe": np.int32,        # Index into the pipe ID dictionary
+           "length": np.float64,    # Length of the joint in meters
+           "type": np.uint8,        # Index into PIPE_TYPES
+           "position": np.int32,    # Index of the element in Completion.solution (bottom->top), -1 if not run
+           "depth": np.float64,     # Top depth of the joint in the final string, NaN if not run
+           "supplier": np.int32}    # Index into the supplier dictionary
+
+
+class WellArchive:
+    """Append-only columnar archive of the deck tallies and final completions of finished wells.
+
+    Every joint is one row. Columns are stored as raw binary files in one folder and read back
+    through numpy memory maps, so queries over many wells do not load or parse anything per well.
+    String values (well IDs, pipe IDs and suppliers) are dictionary encoded in meta.json."""
+
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.meta = self.__load_meta()
+        self.__columns = {}
+        self.__repair()
+
+    def __repr__(self):
+        return f"WellArchive: {self.folder}"
+
+    def __str__(self):
+        return f"{"Archive":.<8}: {self.folder}\n{"Wells":.<8}: {len(self.meta['wells'])}\n{"Rows":.<8}: {self.meta['rows']}"
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def __meta_path(self):
+        return os.path.join(self.folder, "meta.json")
+
+    def __column_path(self, name):
+        return os.path.join(self.folder, f"{name}.bin")
+
+    def __load_meta(self):
+        if os.path.exists(self.__meta_path()):
+            with open(self.__meta_path()) as f:
+                return json.load(f)
+        return {"rows": 0, "wells": [], "pipes": [], "suppliers": [""]}
+
+    def __save_meta(self):
+        tmp_path = self.__meta_path() + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self.__meta_path())
+
+    def __repair(self):
+        """Truncate column files to the row count in meta.json, in case an append was interrupted."""
+        for name, dtype in COLUMNS.items():
+            path = self.__column_path(name)
+            size = self.meta["rows"] * np.dtype(dtype).itemsize
+            if not os.path.exists(path):
+                open(path, "wb").close()
+            elif os.path.getsize(path) != size:
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+
+    @property
+    def wells(self):
+        return list(self.meta["wells"])
+
+    def append_well(self, well_id, completion, leftover_tally=None, suppliers=None):
+        """Append the final completion and the unused deck of one well.
+
+        arguments:
+        - well_id: unique ID of the well
+        - completion: finished Completion
+        - leftover_tally: deck tally of unused stands/pipes, defaults to completion.leftover_tally
+        - suppliers: optional dict of pipe ID -> supplier name
+        """
+        if str(well_id) in self.meta["wells"]:
+            raise ValueError(f"Well {well_id} is already archived")
+        if leftover_tally is None:
+            leftover_tally = completion.leftover_tally or []
+        suppliers = suppliers or {}
+
+        rows = []
+        depth = 0
+        positions = range(len(completion.solution)-1, -1, -1)
+        for position, element in zip(positions, reversed(completion.solution)):
+            joint_depth = depth
+            for pipe, type_name in self.__joints(element):
+                rows.append((pipe, type_name, position, joint_depth))
+                joint_depth += pipe.length
+            depth += element.length
+        for tally in leftover_tally:
+            elements = tally.stands if type(tally) == Rack else tally.pipes
+            for element in elements:
+                for pipe, type_name in self.__joints(element):
+                    rows.append((pipe, type_name, -1, np.nan))
+
+        well_index = len(self.meta["wells"])
+        pipe_lookup = {key: i for i, key in enumerate(self.meta["pipes"])}
+        supplier_lookup = {key: i for i, key in enumerate(self.meta["suppliers"])}
+        columns = {name: np.empty(len(rows), dtype=dtype) for name, dtype in COLUMNS.items()}
+        for i, (pipe, type_name, position, joint_depth) in enumerate(rows):
+            columns["well"][i] = well_index
+            columns["pipe"][i] = self.__encode(pipe_id_key(pipe.id), pipe_lookup, "pipes")
+            columns["length"][i] = pipe.length
+            columns["type"][i] = PIPE_TYPES.index(type_name)
+            columns["position"][i] = position
+            columns["depth"][i] = round(joint_depth, 3) if position >= 0 else np.nan
+            columns["supplier"][i] = self.__encode(suppliers.get(pipe.id, ""), supplier_lookup, "suppliers")
+
+        # Columns are written first, the row count in meta.json is what makes the rows visible.
+        for name, values in columns.items():
+            with open(self.__column_path(name), "ab") as f:
+                f.write(values.tobytes())
+        self.meta["rows"] += len(rows)
+        self.meta["wells"].append(str(well_id))
+        self.__save_meta()
+        self.__columns = {}
+        return len(rows)
+
+    def __joints(self, element):
+        """Split a solution element into (joint, type) pairs"""
+        if type(element) == Stand:
+            return [(pipe, element_type(element)) for pipe in element.pipes]
+        return [(element, element_type(element))]
+
+    def __encode(self, key, lookup, meta_key):
+        if key not in lookup:
+            lookup[key] = len(self.meta[meta_key])
+            self.meta[meta_key].append(key)
+        return lookup[key]
+
+    def column(self, name):
+        """Read-only memory map of a column"""
+        if name not in COLUMNS:
+            raise ValueError(f"Unknown column {name}")
+        if name not in self.__columns:
+            if self.meta["rows"] == 0:
+                self.__columns[name] = np.empty(0, dtype=COLUMNS[name])
+            else:
+                self.__columns[name] = np.memmap(self.__column_path(name), dtype=COLUMNS[name], mode="r", shape=(self.meta["rows"],))
+        return self.__columns[name]
+
+    def scan(self, wells=None, types=None, length_range=None, depth_range=None, suppliers=None, run_only=False):
+        """Return the row indices matching all the given filters.
+
+        arguments:
+        - wells: well IDs to include
+        - types: pipe types to include, see PIPE_TYPES
+        - length_range: (min, max) joint length, inclusive
+        - depth_range: (min, max) top depth of the joint, inclusive. Only rows in the final string match.
+        - suppliers: supplier names to include
+        - run_only: only include rows that are part of the final string
+        """
+        mask = np.ones(self.meta["rows"], dtype=bool)
+        if wells is not None:
+            mask &= np.isin(self.column("well"), self.__codes(wells, "wells"))
+        if types is not None:
+            mask &= np.isin(self.column("type"), [PIPE_TYPES.index(t) for t in types])
+        if suppliers is not None:
+            mask &= np.isin(self.column("supplier"), self.__codes(suppliers, "suppliers"))
+        if length_range is not None:
+            length = self.column("length")
+            mask &= (length >= length_range[0]) & (length <= length_range[1])
+        if depth_range is not None:
+            depth = self.column("depth")
+            mask &= (depth >= depth_range[0]) & (depth <= depth_range[1]) # NaN rows never match
+        if run_only:
+            mask &= self.column("position") >= 0
+        return np.flatnonzero(mask)
+
+    def __codes(self, keys, meta_key):
+        lookup = {key: i for i, key in enumerate(self.meta[meta_key])}
+        return [lookup[str(key)] for key in keys if str(key) in lookup]
+
+    def pipe_ids(self, rows):
+        return [self.meta["pipes"][i] for i in self.column("pipe")[rows]]
+
+    def well_ids(self, rows):
+        return [self.meta["wells"][i] for i in self.column("well")[rows]]
+
+    def length_distribution(self, bins, by="supplier", rows=None):
+        """Histogram of joint lengths grouped by 'supplier', 'type' or 'well'.
+        Returns a dict of group -> counts per bin, where bins are the bin edges as in np.histogram."""
+        group_column = {"supplier": "supplier", "type": "type", "well": "well"}[by]
+        labels = {"supplier": self.meta["suppliers"], "type": PIPE_TYPES, "well": self.meta["wells"]}[by]
+        if rows is None:
+            rows = slice(None)
+        groups = np.asarray(self.column(group_column)[rows], dtype=np.int64)
+        lengths = np.asarray(self.column("length")[rows])
+
+        bins = np.asarray(bins, dtype=np.float64)
+        num_bins = len(bins) - 1
+        bin_index = np.searchsorted(bins, lengths, side="right") - 1
+        bin_index[lengths == bins[-1]] = num_bins - 1 # Last bin is closed, as in np.histogram
+        inside = (bin_index >= 0) & (bin_index < num_bins)
+        counts = np.bincount(groups[inside]*num_bins + bin_index[inside], minlength=len(labels)*num_bins)
+        counts = counts.reshape(len(labels), num_bins)
+        return {labels[i]: counts[i] for i in np.unique(groups[inside])}
+
+    def usage_by_depth_band(self, band=100.0, kind="pup", wells=None):
+        """Number of joints of a kind (see PIPE_TYPES) run in each depth band.
+        Returns a dict of band top depth -> count."""
+        rows = self.scan(wells=wells, types=[kind], run_only=True)
+        bands = np.floor(self.column("depth")[rows] / band).astype(np.int64)
+        if len(bands) == 0:
+            return {}
+        counts = np.bincount(bands - bands.min())
+        return {round(float((i + bands.min()) * band), 3): int(count) for i, count in enumerate(counts) if count}
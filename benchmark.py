@@ -0,0 +1,79 @@
+import argparse
+import copy
+import os
+import time
+import numpy as np
+import kernels
+from completion import Completion
+from loader import load_inputs, default_sources
+from pipes import AssemblyPipe
+from solver_trace import SolverTrace
+from utils import create_deck_tally, generate_completion_tally, plan_completion
+
+
+def timed(function, repeat):
+    """Best time of repeat calls in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best*1000
+
+
+def run(inputs, repeat=20, depth=2247):
+    """Time each kernel with plain Python (the AssemblyPipe methods) and with every available backend.
+    Returns {kernel: {"python": ms, "numpy": ms, "numba": ms}}, and a solve without and with a SolverTrace
+    as {"solver_trace": {"off": ms, "on": ms}}"""
+    pipes = create_deck_tally(inputs["triples"], inputs["doubles"], inputs["singles"], inputs["pups"])
+    candidates = sorted(pipes[0].stands + pipes[1].stands + pipes[2].pipes)
+    completion = Completion(depth)
+    completion.add_casing_joints(inputs["casing_tally"])
+    completion.length = 1000.0
+    assembly = AssemblyPipe("bench", 16.228, lower_lim=280.0, sep_length=10.0, critical_point=8.114)
+    depths = np.linspace(0, depth, 10000)
+    casing = np.sort(np.asarray(inputs["casing_tally"], dtype=np.float64))
+
+    results = {"check_clears": {"python": timed(lambda: [assembly.check_all_clears_with_pipe(completion, pipe) for pipe in candidates], repeat)},
+               "nearest_distance": {"python": timed(lambda: [min(abs(joint - d) for joint in inputs["casing_tally"]) for d in depths[:1000]], 1)*10},
+               "plan_completion": {}}
+    original = kernels.get_backend()
+    try:
+        for backend in kernels.BACKENDS:
+            kernels.set_backend(backend)
+            assembly.check_all_clears_with_pipes(completion, candidates)     # Compiles the Numba kernels
+            kernels.nearest_distance(depths, casing)
+            results["check_clears"][backend] = timed(lambda: assembly.check_all_clears_with_pipes(completion, candidates), repeat)
+            results["nearest_distance"][backend] = timed(lambda: kernels.nearest_distance(depths, casing), repeat)
+            results["plan_completion"][backend] = timed(lambda: plan_completion(depth, inputs["triples"], inputs["doubles"], inputs["singles"], inputs["pups"],
+                                                                                inputs["assembly_tally"], inputs["casing_tally"]), 3)
+    finally:
+        kernels.set_backend(original)
+
+    solve = lambda trace: generate_completion_tally(depth, create_deck_tally(inputs["triples"], inputs["doubles"], inputs["singles"], inputs["pups"]),
+                                                    [copy.copy(assembly) for assembly in inputs["assembly_tally"]], inputs["casing_tally"], trace=trace)
+    results["solver_trace"] = {"off": timed(lambda: solve(None), 3), "on": timed(lambda: solve(SolverTrace()), 3)}
+    return results
+
+
+if __name__ == "__main__":
+    """
+    Usage:
+        python benchmark.py
+    Times the kernels of kernels.py against the plain Python they replace, a full Step 3 per backend,
+    and the overhead of a SolverTrace on one solve.
+    nearest_distance is timed for 10000 depths, check_clears for all stands and singles on deck.
+    """
+    parser = argparse.ArgumentParser(description='TallyNow - Kernel benchmark')
+    parser.add_argument('--repeat', type=int, default=20, help='Timing repeats, the best is reported (default: 20)')
+    args = parser.parse_args()
+
+    PATH = os.path.dirname(os.path.abspath(__file__)) + "/"
+    inputs, _ = load_inputs(default_sources(PATH+"data/"))
+    print(f"{'Backends':.<20}: {kernels.BACKENDS}")
+    for kernel, times in run(inputs, args.repeat).items():
+        reference = times.get("python")
+        for backend, ms in times.items():
+            speedup = f" ({reference/ms:.1f}x)" if reference and backend != "python" else ""
+            label = f"{kernel} {backend}"
+            print(f"{label:.<32}: {ms:9.3f} ms{speedup}")
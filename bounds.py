@@ -0,0 +1,93 @@
+from pipes import AssemblyPipe, Rack
+from utils import mm
+
+
+class Bounds:
+    """Lower bounds on the landing error and on the number of pups, from the deck tally and the assemblies.
+
+    The bounds come from the lengths the string can reach at all: every assembly, a number of stands from
+    the outside of each rack ('first in, last out'), and any of the singles and pups. The clear rules of the
+    assemblies are left out, so no completion can do better than the bounds. Reachable lengths are kept as
+    bitsets in Python integers, bit i meaning a length of i mm, and adding a pipe is a shift.
+
+    arguments:
+    - goal: well depth
+    - deck_tally: [triple stand rack, double stand rack, singles, pups] before the solve, not changed
+    - assembly_tally: [assy_1, ..., assy_n]
+    """
+
+    def __init__(self, goal, deck_tally, assembly_tally):
+        self.goal = goal
+        self.goal_mm = mm(goal)
+        mask = (1 << (self.goal_mm + 1)) - 1  # Lengths past the goal are never needed
+
+        reachable = 1 << sum(mm(assembly.length) for assembly in assembly_tally)
+        reachable &= mask
+        pups = []
+        for tally in deck_tally:
+            if type(tally) == Rack:
+                # Stands are taken from the outside, so only the lengths of the outermost stands can be reached
+                with_stands = reachable
+                length = 0
+                for stand in reversed(tally.stands):
+                    length += mm(stand.length)
+                    with_stands |= reachable << length
+                reachable = with_stands & mask
+            elif tally.type == "pups":
+                pups += tally.pipes
+            else:
+                for pipe in tally.pipes:
+                    reachable |= (reachable << mm(pipe.length)) & mask
+
+        # Layer k holds the lengths that need exactly k pups
+        self.layers = [reachable] + [0]*len(pups)
+        for i, pipe in enumerate(pups):
+            for k in range(i, -1, -1):
+                self.layers[k+1] |= (self.layers[k] << mm(pipe.length)) & mask
+        self.reachable = 0
+        for layer in self.layers:
+            self.reachable |= layer
+
+    def __repr__(self):
+        return f"Bounds goal: {self.goal}, error bound: {self.error_bound()}"
+
+    def error_bound(self):
+        """Lowest landing error of any string that does not pass the goal, None if no such string exists"""
+        if self.reachable == 0:
+            return None
+        return round((self.goal_mm - (self.reachable.bit_length() - 1))/1000, 3)
+
+    def pup_bound(self, max_error):
+        """Fewest pups in any string that lands within max_error of the goal, None if no string does"""
+        lowest = max(self.goal_mm - mm(max_error), 0)
+        reachable = 0
+        for k, layer in enumerate(self.layers):
+            reachable |= layer
+            if reachable >> lowest:
+                return k
+        return None
+
+    def report(self, completion):
+        """Landing error and pups of the completion against the bounds. The error is measured from the goal
+        given to Bounds, which may be deeper than the goal of the completion (see plan_completion)."""
+        error = round(self.goal - completion.length, 3)
+        pups = sum(1 for element in completion.solution if type(element) != AssemblyPipe and element.num_pipes == 1 and element.pup)
+        error_bound = self.error_bound()
+        pup_bound = self.pup_bound(error) if error >= 0 else None
+        return {"error": error,
+                "error_bound": error_bound,
+                "error_gap": round(error - error_bound, 3) if error_bound is not None else None,
+                "pups": pups,
+                "pup_bound": pup_bound,
+                "pup_gap": pups - pup_bound if pup_bound is not None else None}
+
+    def within_tolerance(self, completion, tolerance):
+        """True if the completion is within tolerance of the error bound, and no better completion can be
+        worth searching for"""
+        report = self.report(completion)
+        return report["error_gap"] is not None and 0 <= report["error_gap"] <= tolerance
+
+
+def gap_report(goal, completion, deck_tally, assembly_tally):
+    """Report of the completion against the bounds, see Bounds.report"""
+    return Bounds(goal, deck_tally, assembly_tally).report(completion)
@@ -0,0 +1,149 @@
+import hashlib
+import os
+import tempfile
+import numpy as np
+
+CACHE_DIR_NAME = ".tallynow_cache"
+
+# Part of every cache file name. Bump it when encode_values/decode_values change, so old entries are not decoded.
+CACHE_FORMAT = 1
+
+# Kind codes used when encoding extracted values into flat arrays
+KIND_FLOAT = 0
+KIND_INT = 1
+KIND_STR = 2
+KIND_NONE = 3
+KIND_BOOL = 4
+
+
+def cached_extract(extract_function, path, *args):
+    """Run extract_function(path, *args) through the binary input cache.
+
+    The extracted values are stored as an .npz file in a cache folder next to the source file.
+    A cached result is used when the size and modification time of the source are unchanged,
+    or when the SHA-256 hash of the source still matches, in which case the stored size and
+    modification time are updated. Otherwise the source is re-parsed and the cache is rewritten.
+    If the cache folder can not be written (e.g. a read-only data share), the values are returned uncached."""
+
+    cache_path = get_cache_path(extract_function, path, *args)
+    stat = os.stat(path)
+    source_hash = None
+
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            same_stat = (int(cached["source_mtime_ns"]) == stat.st_mtime_ns) and (int(cached["source_size"]) == stat.st_size)
+            if same_stat:
+                return decode_values(cached)
+            source_hash = hash_file(path)
+            if str(cached["source_hash"]) == source_hash:
+                # Same content, e.g. a touched or copied file. Store the new stat to skip the hash next time.
+                values = decode_values(cached)
+                try_write_cache(cache_path, values, source_hash, stat)
+                return values
+
+    values = extract_function(path, *args)
+    try_write_cache(cache_path, values, source_hash or hash_file(path), stat)
+    return values
+
+
+def get_cache_path(extract_function, path, *args):
+    """Cache file for one extract call, e.g. .tallynow_cache/tubing_tally.csv.extract_ids.A-20-200.v1.npz"""
+    folder = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME)
+    key = "-".join(str(arg) for arg in args)
+    return os.path.join(folder, f"{os.path.basename(path)}.{extract_function.__name__}.{key}.v{CACHE_FORMAT}.npz")
+
+
+def hash_file(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def try_write_cache(cache_path, values, source_hash, stat):
+    """write_cache, skipped when the cache folder can not be written"""
+    try:
+        write_cache(cache_path, values, source_hash, stat)
+    except OSError:
+        pass
+
+
+def write_cache(cache_path, values, source_hash, stat):
+    """Write the encoded values to cache_path. The file is replaced atomically."""
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    arrays = encode_values(values)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f,
+                     source_hash=np.array(source_hash),
+                     source_mtime_ns=np.array(stat.st_mtime_ns, dtype=np.int64),
+                     source_size=np.array(stat.st_size, dtype=np.int64),
+                     **arrays)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def encode_values(values):
+    """Encode a list (or list of rows) of mixed values into flat numpy arrays.
+
+    Numbers are kept in a float64 array, strings in a unicode array, and a kind code per
+    value makes it possible to restore the original Python types."""
+    if values and isinstance(values[0], list):
+        shape = (len(values), len(values[0]))
+        flat = [cell for row in values for cell in row]
+    else:
+        shape = (len(values),)
+        flat = values
+
+    kinds = np.zeros(len(flat), dtype=np.uint8)
+    numbers = np.full(len(flat), np.nan)
+    strings = [""] * len(flat)
+    for i, value in enumerate(flat):
+        if value is None:
+            kinds[i] = KIND_NONE
+        elif isinstance(value, (bool, np.bool_)):
+            kinds[i] = KIND_BOOL
+            numbers[i] = float(value)
+        elif isinstance(value, (int, np.integer)):
+            kinds[i] = KIND_INT
+            numbers[i] = float(value)
+        elif isinstance(value, (float, np.floating)):
+            kinds[i] = KIND_FLOAT
+            numbers[i] = value
+        else:
+            kinds[i] = KIND_STR
+            strings[i] = str(value)
+
+    return {"shape": np.array(shape, dtype=np.int64),
+            "kinds": kinds,
+            "numbers": numbers,
+            "strings": np.array(strings, dtype=str)}
+
+
+def decode_values(arrays):
+    """Inverse of encode_values."""
+    kinds = arrays["kinds"]
+    numbers = arrays["numbers"].tolist()
+    strings = arrays["strings"].tolist()
+    shape = tuple(arrays["shape"].tolist())
+
+    flat = []
+    for i, kind in enumerate(kinds.tolist()):
+        if kind == KIND_FLOAT:
+            flat.append(numbers[i])
+        elif kind == KIND_INT:
+            flat.append(int(numbers[i]))
+        elif kind == KIND_STR:
+            flat.append(strings[i])
+        elif kind == KIND_BOOL:
+            flat.append(bool(numbers[i]))
+        else:
+            flat.append(None)
+
+    if len(shape) == 2:
+        return [flat[i*shape[1]:(i+1)*shape[1]] for i in range(shape[0])]
+    return flat
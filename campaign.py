@@ -0,0 +1,198 @@
+import copy
+import heapq
+from completion import Completion
+from utils import generate_completion_tally, copy_deck_tally, mm
+from pipes import AssemblyPipe, Rack, Pile
+from snapshot import DeckSnapshot
+
+
+def plan_wells(well_specs, deck_tally, pup_weight=1.0, candidates=64):
+    """Plan several wells that draw from the same deck tally.
+
+    Stands can only be taken from the outside of the racks ('first in, last out'), so the well order decides
+    which stands each well gets, and they are not allocated jointly: each well is solved once, in the given
+    order, from the racks the previous wells left. That is one solve per well. Only the singles and pups,
+    which lie in piles and can go to any well, are allocated across the wells jointly. The singles and pups
+    of the top section of each well (between the last assembly and the top assembly, where the string is
+    filled up to the goal) go back in one pool with the leftover singles and pups, and the pool is assigned
+    to the wells for the lowest total score. The score of a well is its landing error plus pup_weight per
+    pup used.
+    - for each well, the sets of pool pipes that land it within 5 m of the goal are searched depth first over
+      the pool by length, keeping the `candidates` best by score, and always the set the solver chose
+    - one set per well is chosen, no pipe in two wells, by branch and bound over the wells with the best
+      score each remaining well can get as the bound
+    As the sets of the solves are among the candidates, the result is never worse than planning the wells
+    one after another. The stands, and the singles and pups below the top sections, stay where the solver
+    put them, as the clear rules of the assemblies depend on them.
+
+    arguments:
+    - well_specs: [{"name": .., "depth": .., "assembly_tally": [...], "casing_tally": [...]}, ...]
+    - deck_tally: [triple stand rack, double stand rack, singles, pups] or a DeckSnapshot, not changed
+    - pup_weight: score per pup used, in meters of landing error
+    - candidates: number of pipe sets kept per well for the assignment
+
+    returns dict with:
+    - order: well names in the order they take stands from the racks
+    - completions: {well name: Completion}
+    - score, total_error, pups: totals over all wells
+    - leftover_tally: deck tally left after all wells
+    - solves: number of single well solves used, one per well
+    - pool: number of singles and pups in the joint assignment
+    """
+    if type(deck_tally) == DeckSnapshot:
+        deck_tally = deck_tally.deck_tally()
+
+    # Stands well by well, in rack order
+    completions, rack_tallies = [], []
+    deck = copy_deck_tally(deck_tally)
+    for spec in well_specs:
+        # The solver updates the constraint flags of the assemblies, every solve gets its own copies.
+        assembly_tally = [copy.copy(assembly) for assembly in spec["assembly_tally"]]
+        try:
+            completion = generate_completion_tally(spec["depth"], deck, assembly_tally, spec["casing_tally"])
+        except (RuntimeError, IndexError): # IndexError: the deck runs out of stands and pipes
+            completion = None
+        if completion is None or not completion.done:
+            raise RuntimeError(f"Well {spec['name']} can not be planned from the deck tally.")
+        completions.append(completion)
+        rack_tallies.append([tally for tally in copy_deck_tally(deck) if type(tally) == Rack])
+
+    # Singles and pups of the top sections, jointly
+    piles = [tally for tally in deck_tally if type(tally) == Pile]
+    wells = [_TopSection(completion, pup_weight) for completion in completions]
+    pool = [pipe for tally in deck if type(tally) == Pile for pipe in tally.pipes]
+    pool += [pipe for well in wells for pipe in well.pipes]
+    pool.sort(key=lambda pipe: pipe.length, reverse=True)
+    for well in wells:
+        well.find_candidates(pool, candidates)
+    assignment = assign(wells)
+
+    new_completions, used = {}, set()
+    leftover_tally = copy_deck_tally(deck_tally)
+    for spec, well, chosen, racks in zip(well_specs, wells, assignment, rack_tallies):
+        completion = well.rebuild(chosen)
+        used |= {id(element) for element in completion.solution if type(element) != AssemblyPipe}
+        leftover_piles = []
+        for tally in piles:
+            new_tally = Pile(tally.type)
+            new_tally.add_pipes([pipe for pipe in tally.pipes if id(pipe) not in used])
+            leftover_piles.append(new_tally)
+        leftover_tally = racks + leftover_piles
+        completion.add_leftover_tally(leftover_tally)
+        new_completions[spec["name"]] = completion
+
+    return {"order": [spec["name"] for spec in well_specs],
+            "completions": new_completions,
+            "score": round(sum(well_score(c, pup_weight) for c in new_completions.values()), 3),
+            "total_error": round(sum(c.get_length_error() for c in new_completions.values()), 3),
+            "pups": sum(c.num_pipe_types["pups"] for c in new_completions.values()),
+            "leftover_tally": leftover_tally,
+            "solves": len(well_specs),
+            "pool": len(pool)}
+
+
+def well_score(completion, pup_weight):
+    return completion.get_length_error() + pup_weight*completion.num_pipe_types["pups"]
+
+
+def assign(wells):
+    """One candidate set per well, no pipe in two wells, with the lowest total score.
+    The sets of the solves are a valid assignment, so the search starts from it as the best found."""
+    order = sorted(range(len(wells)), key=lambda i: len(wells[i].candidates))
+    best_rest = [0.0]*(len(order) + 1)  # Lowest score the wells from order[k] on can get
+    for k in range(len(order)-1, -1, -1):
+        best_rest[k] = best_rest[k+1] + wells[order[k]].candidates[0][0]
+
+    best = [sum(well.score(well.pipes) for well in wells), [well.pipes for well in wells]]
+    chosen = [None]*len(wells)
+
+    def search(k, score, used):
+        if k == len(order):
+            if score < best[0]:
+                best[0], best[1] = score, list(chosen)
+            return
+        well = wells[order[k]]
+        for candidate_score, pipes in well.candidates:
+            if score + candidate_score + best_rest[k+1] >= best[0]:
+                break   # Candidates are sorted by score
+            if any(id(pipe) in used for pipe in pipes):
+                continue
+            chosen[order[k]] = pipes
+            search(k+1, score + candidate_score, used | {id(pipe) for pipe in pipes})
+
+    search(0, 0.0, frozenset())
+    return best[1]
+
+
+class _TopSection:
+    """The top section of a done completion: the singles and pups in it can be exchanged, the rest is kept"""
+
+    def __init__(self, completion, pup_weight):
+        self.completion = completion
+        self.pup_weight = pup_weight
+        solution = completion.solution
+        top = len(solution) - 1
+        start = top
+        if type(solution[top]) == AssemblyPipe and solution[top].is_top_assembly:
+            while start > 0 and type(solution[start-1]) != AssemblyPipe:
+                start -= 1
+        # else: the solver finished below the top assembly, nothing is exchanged
+        self.stands = [element for element in solution[start:top] if element.num_pipes > 1]
+        self.pipes = [element for element in solution[start:top] if element.num_pipes == 1]
+        # Length in mm the singles and pups of the top section have to fill, and the pups used below them
+        own = {id(pipe) for pipe in self.pipes}
+        self.room = mm(completion.goal) - sum(mm(element.length) for element in solution if id(element) not in own)
+        self.fixed_pups = completion.num_pipe_types["pups"] - sum(1 for pipe in self.pipes if pipe.pup)
+        self.candidates = []
+
+    def score(self, pipes):
+        error = self.room - sum(mm(pipe.length) for pipe in pipes)
+        return error/1000 + self.pup_weight*(self.fixed_pups + sum(1 for pipe in pipes if pipe.pup))
+
+    def find_candidates(self, pool, count):
+        """The count best sets of pool pipes (sorted longest first) that land the well within 5 m of the goal,
+        as [(score, pipes), ...] sorted by score. The set of the solve is always kept."""
+        lengths = [mm(pipe.length) for pipe in pool]
+        remaining = [0]*(len(pool) + 1)     # Length of pool[i:]
+        for i in range(len(pool)-1, -1, -1):
+            remaining[i] = remaining[i+1] + lengths[i]
+        heap = []   # The best sets found as (-score, counter, pipes)
+        counter = [0]
+
+        def search(start, length, pipes):
+            if self.room - length < 5000:
+                score = self.score(pipes)
+                if len(heap) < count or -heap[0][0] > score:
+                    counter[0] += 1
+                    item = (-score, counter[0], list(pipes))
+                    heapq.heappush(heap, item) if len(heap) < count else heapq.heapreplace(heap, item)
+            for i in range(start, len(pool)):
+                if length + remaining[i] < self.room - 4999:
+                    break   # Even all the shorter pipes can not reach within 5 m of the goal
+                if length + lengths[i] <= self.room:
+                    pipes.append(pool[i])
+                    search(i+1, length + lengths[i], pipes)
+                    pipes.pop()
+
+        search(0, 0, [])
+        found = sorted((-score, pipes) for score, _, pipes in heap)
+        own = {id(pipe) for pipe in self.pipes}
+        if not any({id(pipe) for pipe in pipes} == own for _, pipes in found):
+            found.append((self.score(self.pipes), list(self.pipes)))
+            found.sort(key=lambda candidate: candidate[0])
+        self.candidates = found
+
+    def rebuild(self, pipes):
+        """New done completion with the pipes in the top section, longest first as the solver places them"""
+        solution = self.completion.solution
+        start = len(solution) - 1 - len(self.stands) - len(self.pipes)
+        new_solution = solution[:start] + self.stands + sorted(pipes, key=lambda pipe: pipe.length, reverse=True) + solution[start + len(self.stands) + len(self.pipes):]
+        completion = Completion(self.completion.goal)
+        completion.add_casing_joints(self.completion.casing_joints)
+        for element in new_solution:
+            if type(element) == AssemblyPipe:
+                completion.add_assembly_pipe(element)
+            else:
+                completion.add_normal_pipe(element)
+        completion.done = True
+        return completion
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+from utils import extract, extract_casing_joints, stream_column
+
+
+def read_numbers(csv_path, column_letter, start_row, end_row, sheet=None):
+    """Values in rows start_row to end_row (1-based, inclusive) of one column as a float64 array, NaN where not numeric"""
+    values = [item for chunk in stream_column(csv_path, column_letter, start_row, end_row, sheet=sheet) for item in chunk]
+    return pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=np.float64)
+
+
+def read_reference(csv_path, reference, sheet=None):
+    """Reference depth given as a number or as a cell of the CSV file, e.g. "H18" (column H, row 18 as in stream_column)"""
+    if isinstance(reference, str):
+        value = read_numbers(csv_path, reference[0], int(reference[1:]), int(reference[1:]), sheet)[0]
+        if np.isnan(value):
+            raise ValueError(f"Reference depth in cell {reference} of {csv_path} is not a number")
+        return float(value)
+    return float(reference)
+
+
+def derive_casing_depths(lengths, reference_depth):
+    """Connection depths of a casing string from its joint lengths, listed from the bottom up.
+
+    The first joint sits on reference_depth (e.g. the shoe), each connection is the top of a joint.
+    Rows without a length (NaN) are not joints and give no connection.
+
+    returns (depths, joints): depths rounded to 2 decimals as in extract_casing_joints, and the boolean
+    mask of the rows that are joints
+    """
+    joints = ~np.isnan(lengths)
+    tops = reference_depth - np.cumsum(np.where(joints, lengths, 0.0))
+    return np.round(tops[joints], 2), joints
+
+
+def extract_casing_from_lengths(csv_path, length_column, start_row, end_row, reference, sheet=None):
+    """Casing connection depths derived from the joint length column, see derive_casing_depths"""
+    depths, _ = derive_casing_depths(read_numbers(csv_path, length_column, start_row, end_row, sheet), read_reference(csv_path, reference, sheet))
+    return depths.tolist()
+
+
+def extract_casing_source(source, use_cache=False, sheet=None):
+    """Connection depths of one casing source of loader.default_sources:
+    - (path, depth column, start row, end row): precomputed depths, see extract_casing_joints
+    - (path, length column, start row, end row, reference[, depth column]): derived from the joint lengths
+    """
+    if len(source) == 4:
+        return extract(extract_casing_joints, *source, use_cache=use_cache, sheet=sheet)
+    return extract(extract_casing_from_lengths, *source[:5], use_cache=use_cache, sheet=sheet)
+
+
+def cross_check(source, tolerance=0.01, sheet=None):
+    """Compare the depths derived from the joint lengths with the depth column of the source.
+
+    returns list of dicts, one per row where they disagree by more than tolerance or only one has a depth,
+    with row, derived, tally (None where missing) and difference
+    """
+    if len(source) < 6 or source[5] is None:
+        return []
+    path, length_column, start_row, end_row, reference, depth_column = source
+    lengths = read_numbers(path, length_column, start_row, end_row, sheet)
+    derived = np.full(len(lengths), np.nan)
+    depths, joints = derive_casing_depths(lengths, read_reference(path, reference, sheet))
+    derived[joints] = depths
+    tally = read_numbers(path, depth_column, start_row, end_row, sheet)
+
+    # Rows where exactly one has a depth, or both do and they are too far apart
+    disagree = np.isnan(derived) != np.isnan(tally)
+    disagree |= np.abs(np.nan_to_num(derived) - np.nan_to_num(tally)) > tolerance
+    report = []
+    for i in np.flatnonzero(disagree):
+        report.append({"row": start_row + int(i),
+                       "derived": None if np.isnan(derived[i]) else float(derived[i]),
+                       "tally": None if np.isnan(tally[i]) else round(float(tally[i]), 2),
+                       "difference": None if np.isnan(derived[i] - tally[i]) else round(float(derived[i] - tally[i]), 3)})
+    return report
+
+
+def merge_casing_depths(depth_lists):
+    """One sorted array of the connection depths of all casing sources"""
+    if not depth_lists:
+        return np.zeros(0)
+    return np.sort(np.concatenate([np.asarray(depths, dtype=np.float64) for depths in depth_lists]))
@@ -1,4 +1,6 @@
-from pipes import AssemblyPipe
+import numpy as np
+from pipes import AssemblyPipe, Rack, Pile
+from snapshot import DeckSnapshot
 
 class Completion:
     def __init__(self, goal: float):
@@ -19,6 +21,7 @@ class Completion:
                                "pups": 0,\
                                "assemblies": 0} # Overview of number of each type of pipe
         self.leftover_tally = None      # Tally of unused stands and pipes
+        self.checkpoints = []           # Solver state before each element in the solution was placed
 
     def __repr__(self):
         return f"Completion goal: {self.goal}, done: {self.done}"
@@ -103,15 +106,113 @@ class Completion:
                 solution_depths[pipe.id].append(round(depth-pipe.critical_point, 3))
         return solution_depths
     
+    def get_depth_arrays(self):
+        """Depth table of the solution as NumPy arrays, top->bottom as get_solution_depths, one entry per
+        element (IDs of stands and pipes can be the same). Depths are accumulated in the same order, so
+        the values are the same as in get_solution_depths.
+
+        returns dict with id (object), type (triple/double/single/pup/assembly), length, top and bottom
+        depth, and critical_point depth (NaN for elements without one)
+        """
+        elements = self.solution[::-1]
+        lengths = np.array([element.length for element in elements], dtype=np.float64)
+        bottoms = np.cumsum(lengths)
+        tops = bottoms - lengths
+        tops[1:] = bottoms[:-1]     # Same floating point values as the running sum
+        critical_points = np.array([element.critical_point if type(element) == AssemblyPipe and element.critical_point != None else np.nan
+                                    for element in elements], dtype=np.float64)
+        return {"id": np.array([element.id for element in elements], dtype=object),
+                "type": np.array([element_type(element) for element in elements], dtype=object),
+                "length": lengths,
+                "top": np.round(tops, 3),
+                "bottom": np.round(bottoms, 3),
+                "critical_point": np.round(bottoms - critical_points, 3)}
+
+    def copy(self):
+        """Copy of the completion that can be extended without changing this one"""
+        completion = Completion(self.goal)
+        completion.__dict__.update(self.__dict__)
+        completion.solution = list(self.solution)
+        completion.assy_depth = dict(self.assy_depth)
+        completion.ea_between_assemblies = list(self.ea_between_assemblies)
+        completion.num_pipe_types = dict(self.num_pipe_types)
+        completion.checkpoints = list(self.checkpoints)
+        return completion
+
     def get_length_error(self):
         return self.goal - self.length
     
     def add_leftover_tally(self, tally):
         self.leftover_tally = tally
     
+    def leftover_snapshot(self):
+        """Immutable snapshot of the leftover tally, to be used as the deck of the next well"""
+        return DeckSnapshot.from_deck_tally(self.leftover_tally)
+
     def print_leftover_tally(self):
         for tally in self.leftover_tally:
             if tally.type == "triple stands" or tally.type == "double stands":
                 print(tally.stands)
             else:
                 print(tally.pipes)
+
+    def add_checkpoint(self, deck_tally, assembly_index, iteration):
+        """Store the solver state before the next stand/pipe/assembly is placed.
+        checkpoints[i] is the state before solution[i] was placed."""
+        deck = []
+        for tally in deck_tally:
+            if type(tally) == Rack:
+                deck.append((Rack, tally.type, tuple(tally.stands)))
+            else:
+                deck.append((Pile, tally.type, tuple(tally.pipes)))
+
+        self.checkpoints.append({"deck": deck,
+                                 "assembly_index": assembly_index,
+                                 "iteration": iteration,
+                                 "length": self.length,
+                                 "ea_since_prev": self.ea_since_prev,
+                                 "length_since_prev": self.length_since_prev,
+                                 "num_pipes": self.num_pipes,
+                                 "num_assemblies": self.num_assemblies,
+                                 "num_pipe_types": dict(self.num_pipe_types),
+                                 "ea_between_assemblies": list(self.ea_between_assemblies)})
+
+    def from_checkpoint(self, position):
+        """Create a new completion with the state of this completion before solution[position] was placed.
+        Returns (completion, deck_tally, assembly_index, iteration), which can be passed on to the solver."""
+        if position >= len(self.checkpoints):
+            raise ValueError(f"No checkpoint at position {position}, the completion has {len(self.checkpoints)} checkpoints.")
+        checkpoint = self.checkpoints[position]
+
+        completion = Completion(self.goal)
+        completion.add_casing_joints(self.casing_joints)
+        completion.solution = self.solution[:position]
+        completion.checkpoints = self.checkpoints[:position]
+        completion.length = checkpoint["length"]
+        completion.ea_since_prev = checkpoint["ea_since_prev"]
+        completion.length_since_prev = checkpoint["length_since_prev"]
+        completion.num_pipes = checkpoint["num_pipes"]
+        completion.num_assemblies = checkpoint["num_assemblies"]
+        completion.num_pipe_types = dict(checkpoint["num_pipe_types"])
+        completion.ea_between_assemblies = list(checkpoint["ea_between_assemblies"])
+
+        deck_tally = []
+        for tally_class, tally_type, items in checkpoint["deck"]:
+            tally = tally_class(tally_type)
+            if tally_class == Rack:
+                tally.add_stands(list(items))
+            else:
+                tally.add_pipes(list(items))
+            deck_tally.append(tally)
+
+        return completion, deck_tally, checkpoint["assembly_index"], checkpoint["iteration"]
+
+
+def element_type(element):
+    if type(element) == AssemblyPipe:
+        return "assembly"
+    if element.num_pipes == 3:
+        return "triple"
+    if element.num_pipes == 2:
+        return "double"
+    return "pup" if element.pup else "single"
@@ -0,0 +1,200 @@
+import bisect
+import copy
+import time
+from completion import Completion, element_type
+from pipes import AssemblyPipe, Rack, Pile
+from utils import mm
+
+
+def improve_completion(completion, time_budget=0.5, respect_rack_order=True):
+    """Local search over a finished completion, trading stands and pipes with the leftover tally.
+
+    Moves:
+    - swap: a single/pup (or a stand, see respect_rack_order) in the solution is swapped for a leftover
+      one of the same type. Types are kept, so the number of pipes between assemblies does not change.
+    - insert: a leftover single/pup, or the outermost stand of a leftover rack, is added below the top assembly.
+    The move that lengthens the string the most without passing the goal is made, until no move is left or
+    the time budget is used.
+
+    A move changes the depth of every assembly above it. For each position the shifts that keep all
+    assemblies above it clear are found once per move from prefix sums of the lengths, with the casing
+    connections searched by bisection. A candidate for a position is then found by bisection in the sorted
+    leftover lengths. Lengths are compared in whole millimeters, with the same clear rules as the solver
+    (AssemblyPipe.update_all_clears).
+
+    arguments:
+    - completion: done completion with its leftover tally, not changed
+    - time_budget: seconds
+    - respect_rack_order: if True stands are not swapped, as the racks can only give the outermost stand
+
+    returns a new Completion, or a copy of the completion if no move improves it
+    """
+    if not completion.done or completion.leftover_tally is None:
+        raise ValueError("Only a finished completion with a leftover tally can be improved.")
+
+    deadline = time.perf_counter() + time_budget
+    search = _LocalSearch(completion, respect_rack_order)
+    while time.perf_counter() < deadline:
+        if not search.step():
+            break
+
+    # Moves keep every assembly clear, but a completion that is not valid to begin with (e.g. finished
+    # past the goal) is returned as it is.
+    improved = search.rebuild() if search.moves else None
+    if improved is None:
+        return completion.copy()
+    return improved
+
+
+# Tally type of each element type (see completion.element_type)
+TALLY_TYPES = {"triple": "triple stands", "double": "double stands", "single": "single pipes", "pup": "pups"}
+
+
+class _LocalSearch:
+    def __init__(self, completion, respect_rack_order):
+        self.completion = completion
+        self.goal = mm(completion.goal)
+        self.casing = sorted(mm(joint) for joint in completion.casing_joints)
+        self.solution = list(completion.solution)
+        self.moves = 0
+
+        # Leftover stands and pipes per type. Racks keep their order, piles are sorted by length.
+        self.leftover = {}
+        for tally in completion.leftover_tally:
+            if type(tally) == Rack:
+                self.leftover[tally.type] = list(tally.stands)
+            else:
+                self.leftover[tally.type] = sorted(tally.pipes, key=lambda pipe: pipe.length)
+        self.swap_types = ["single pipes", "pups"]
+        if not respect_rack_order:
+            self.swap_types += ["triple stands", "double stands"]
+            for tally_type in ("triple stands", "double stands"):
+                if tally_type in self.leftover:
+                    self.leftover[tally_type].sort(key=lambda stand: stand.length)
+        self.respect_rack_order = respect_rack_order
+
+    def windows(self):
+        """For each position in the solution, the (lowest, highest) change in length in mm of the element
+        there that keeps every assembly above clear."""
+        n = len(self.solution)
+        windows = [None]*n
+        low, high = float("-inf"), float("inf")
+        length = sum(mm(element.length) for element in self.solution)
+        since_prev = 0      # Length from the position up to the next assembly
+        next_assembly = None
+        for i in range(n-1, -1, -1):
+            element = self.solution[i]
+            length -= mm(element.length)     # Length below element i
+            if type(element) == AssemblyPipe:
+                if not element.is_top_assembly:
+                    assembly_low, assembly_high = self.assembly_window(element, length)
+                    low, high = max(low, assembly_low), min(high, assembly_high)
+                next_assembly = element
+                since_prev = 0
+                continue
+            since_prev += mm(element.length)
+            sep_low = float("-inf")
+            if next_assembly is not None and not next_assembly.is_top_assembly and next_assembly.sep_length:
+                sep_low = mm(next_assembly.sep_length) - since_prev
+            windows[i] = (max(low, sep_low), high)
+        return windows
+
+    def assembly_window(self, assembly, length):
+        """Shifts s in mm of the length below the assembly that keep it clear, see AssemblyPipe.update_all_clears"""
+        low, high = float("-inf"), float("inf")
+        if assembly.lower_lim:  # length + s >= goal - lower_lim
+            low = max(low, self.goal - mm(assembly.lower_lim) - length)
+        if assembly.upper_lim:  # length + s + assembly length < goal - upper_lim
+            high = min(high, self.goal - mm(assembly.upper_lim) - length - mm(assembly.length) - 1)
+        if assembly.critical_point:
+            # Depth of the critical point must stay more than the margin from every casing connection
+            depth = self.goal - length - mm(assembly.critical_point)
+            margin = mm(assembly.critical_margin)
+            i = bisect.bisect_left(self.casing, depth)
+            if i < len(self.casing):    # Connection below: depth - s < connection - margin
+                low = max(low, depth - self.casing[i] + margin + 1)
+            if i > 0:                   # Connection above: depth - s > connection + margin
+                high = min(high, depth - self.casing[i-1] - margin - 1)
+        return low, high
+
+    def step(self):
+        """Make the best move. Returns False if no move lengthens the string."""
+        error = self.goal - sum(mm(element.length) for element in self.solution)
+        best = None     # (change, position, leftover type, leftover index)
+        lengths = {kind: [mm(item.length) for item in items] for kind, items in self.leftover.items()}
+
+        # Swaps
+        for i, window in enumerate(self.windows()):
+            if window is None:
+                continue
+            element = self.solution[i]
+            element_kind = TALLY_TYPES.get(element_type(element))
+            if element_kind not in self.swap_types or not self.leftover.get(element_kind):
+                continue
+            low, high = max(window[0], 1), min(window[1], error)
+            if low > high:
+                continue
+            j = bisect.bisect_right(lengths[element_kind], mm(element.length) + high) - 1
+            if j >= 0:
+                change = lengths[element_kind][j] - mm(element.length)
+                if change >= low and (best is None or change > best[0]):
+                    best = (change, i, element_kind, j)
+
+        # Inserts below the top assembly
+        top = len(self.solution) - 1
+        if type(self.solution[top]) == AssemblyPipe and self.solution[top].is_top_assembly:
+            for kind, items in self.leftover.items():
+                if not items:
+                    continue
+                if kind in ("triple stands", "double stands") and self.respect_rack_order:
+                    candidates = [(mm(items[-1].length), len(items)-1)]
+                else:
+                    j = bisect.bisect_right(lengths[kind], error) - 1
+                    candidates = [(lengths[kind][j], j)] if j >= 0 else []
+                for change, j in candidates:
+                    if 0 < change <= error and (best is None or change > best[0]):
+                        best = (change, None, kind, j)
+
+        if best is None:
+            return False
+
+        change, i, kind, j = best
+        new_element = self.leftover[kind].pop(j)
+        if i is None:
+            self.solution.insert(top, new_element)
+        else:
+            old_element = self.solution[i]
+            self.solution[i] = new_element
+            bisect.insort(self.leftover[kind], old_element, key=lambda item: item.length)
+        self.moves += 1
+        return True
+
+    def rebuild(self):
+        """New completion from the solution, replayed as the solver adds it. None if any assembly is not clear."""
+        new_completion = Completion(self.completion.goal)
+        new_completion.add_casing_joints(self.completion.casing_joints)
+        for element in self.solution:
+            if type(element) == AssemblyPipe:
+                if not element.is_top_assembly:
+                    check = copy.copy(element)
+                    check.update_all_clears(new_completion)
+                    if not check.is_available():
+                        return None
+                new_completion.add_assembly_pipe(element)
+            else:
+                new_completion.add_normal_pipe(element)
+        if new_completion.length > new_completion.goal or new_completion.goal - new_completion.length >= 5:
+            return None
+        new_completion.done = True
+
+        leftover_tally = []
+        for tally in self.completion.leftover_tally:
+            if type(tally) == Rack:
+                new_tally = Rack(tally.type)
+                new_tally.add_stands(list(self.leftover[tally.type]))
+            else:
+                new_tally = Pile(tally.type)
+                new_tally.add_pipes(list(self.leftover[tally.type]))
+            leftover_tally.append(new_tally)
+        new_completion.add_leftover_tally(leftover_tally)
+        return new_completion
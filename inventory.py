@@ -0,0 +1,242 @@
+import sqlite3
+from loader import load_inputs
+from pipes import AssemblyPipe, Stand, new_pipe, value
+from utils import create_deck_tally
+
+STAND_KINDS = {3: "triple", 2: "double"}
+
+# IDs are stored without a column type, so integer, float and text IDs come back as they went in
+SCHEMA = """
+BEGIN;
+CREATE TABLE IF NOT EXISTS pipes (
+    kind TEXT NOT NULL,             -- tubing/pup
+    id NOT NULL,
+    position INTEGER NOT NULL,      -- Order in the tally
+    length REAL NOT NULL,
+    mu_loss REAL,
+    status TEXT NOT NULL DEFAULT 'available',
+    well TEXT,                      -- Well the pipe was consumed in
+    PRIMARY KEY (kind, id)
+);
+CREATE INDEX IF NOT EXISTS pipes_id ON pipes (id);
+CREATE INDEX IF NOT EXISTS pipes_length ON pipes (kind, length);
+CREATE INDEX IF NOT EXISTS pipes_status ON pipes (kind, status, position);
+
+CREATE TABLE IF NOT EXISTS stands (
+    kind TEXT NOT NULL,             -- triple/double
+    id NOT NULL,
+    position INTEGER NOT NULL,      -- Order in the rack, the last is outermost
+    status TEXT NOT NULL DEFAULT 'available',
+    well TEXT,
+    PRIMARY KEY (kind, id)
+);
+CREATE INDEX IF NOT EXISTS stands_id ON stands (id);
+CREATE INDEX IF NOT EXISTS stands_status ON stands (kind, status, position);
+
+CREATE TABLE IF NOT EXISTS stand_pipes (
+    kind TEXT NOT NULL,
+    stand_id NOT NULL,
+    slot INTEGER NOT NULL,
+    pipe_id NOT NULL,
+    PRIMARY KEY (kind, stand_id, slot)
+);
+CREATE INDEX IF NOT EXISTS stand_pipes_pipe ON stand_pipes (pipe_id);
+
+CREATE TABLE IF NOT EXISTS assemblies (
+    well TEXT NOT NULL,
+    position INTEGER NOT NULL,      -- Bottom->top
+    id NOT NULL,
+    length REAL NOT NULL,
+    lower_lim REAL,
+    upper_lim REAL,
+    sep_length REAL,
+    sep_ea REAL,
+    critical_point REAL,
+    is_top_assembly INTEGER NOT NULL,
+    order_group TEXT,
+    PRIMARY KEY (well, position)
+);
+
+CREATE TABLE IF NOT EXISTS casing (
+    well TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    depth REAL NOT NULL,
+    PRIMARY KEY (well, position)
+);
+COMMIT;
+"""
+
+
+class Inventory:
+    """Live inventory of tubing joints, stands and pups shared by all wells, with the assemblies and casing
+    tally of each well, in an embedded SQLite database.
+
+    Stands and pipes are never deleted. When a well is run they are marked consumed (see consume), and
+    only the available ones are loaded. Pipes, stands and their status are indexed by ID and length, so
+    queries take milliseconds however many wells the inventory has served."""
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def __repr__(self):
+        return f"Inventory: {self.path}"
+
+    def close(self):
+        self.connection.close()
+
+    def is_empty(self):
+        return self.connection.execute("SELECT COUNT(*) FROM pipes").fetchone()[0] == 0
+
+    def import_sources(self, sources, well="default", use_cache=False):
+        """Bulk import from the input files, see loader.default_sources"""
+        inputs, _ = load_inputs(sources, use_cache=use_cache)
+        self.import_inputs(inputs, well)
+
+    def import_inputs(self, inputs, well="default"):
+        """Bulk import of loaded inputs (see loader.load_inputs) in one transaction.
+        Stands and pipes already in the inventory keep their status, the assemblies and casing tally of
+        the well are replaced. Nothing is imported, and ValueError is raised, if a stand is not whole or
+        holds a pipe that is not a tubing joint of the inputs or the inventory, or if it has the ID of a stand
+        in the inventory but other pipes (stand IDs are numbered by rack position, see
+        get_triple_stands_from_file)."""
+        with self.connection:
+            self.check_stands(inputs)
+            offset = self.connection.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM pipes").fetchone()[0]
+            rows = [("tubing", value(pipe.id), offset + i, pipe.length, pipe.mu_loss) for i, pipe in enumerate(inputs["deck_tally"])]
+            rows += [("pup", value(pipe.id), offset + len(rows) + i, pipe.length, pipe.mu_loss) for i, pipe in enumerate(inputs["pups"])]
+            self.connection.executemany("INSERT OR IGNORE INTO pipes (kind, id, position, length, mu_loss) VALUES (?, ?, ?, ?, ?)", rows)
+
+            for stands in (inputs["triples"], inputs["doubles"]):
+                offset = self.connection.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM stands").fetchone()[0]
+                self.connection.executemany("INSERT OR IGNORE INTO stands (kind, id, position) VALUES (?, ?, ?)",
+                                            [(STAND_KINDS[stand.num_pipes], value(stand.id), offset + i) for i, stand in enumerate(stands)])
+                self.connection.executemany("INSERT OR IGNORE INTO stand_pipes (kind, stand_id, slot, pipe_id) VALUES (?, ?, ?, ?)",
+                                            [(STAND_KINDS[stand.num_pipes], value(stand.id), slot, value(pipe.id))
+                                             for stand in stands for slot, pipe in enumerate(stand.pipes)])
+
+            self.connection.execute("DELETE FROM assemblies WHERE well = ?", (well,))
+            self.connection.executemany("INSERT INTO assemblies VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                        [(well, i, value(assembly.id), assembly.length, assembly.lower_lim, assembly.upper_lim,
+                                          assembly.sep_length, assembly.sep_ea, assembly.critical_point,
+                                          int(assembly.is_top_assembly), assembly.order_group)
+                                         for i, assembly in enumerate(inputs["assembly_tally"])])
+            self.connection.execute("DELETE FROM casing WHERE well = ?", (well,))
+            self.connection.executemany("INSERT INTO casing VALUES (?, ?, ?)",
+                                        [(well, i, depth) for i, depth in enumerate(inputs["casing_tally"])])
+
+    def check_stands(self, inputs):
+        """Raise ValueError if a stand of the inputs can not be imported, see import_inputs"""
+        tubing = {value(pipe.id) for pipe in inputs["deck_tally"]}
+        tubing |= {id for id, in self.connection.execute("SELECT id FROM pipes WHERE kind = 'tubing'")}
+        existing = {}
+        for kind, stand_id, pipe_id in self.connection.execute("SELECT kind, stand_id, pipe_id FROM stand_pipes ORDER BY kind, stand_id, slot"):
+            existing.setdefault((kind, stand_id), []).append(pipe_id)
+
+        for stands, size in ((inputs["triples"], 3), (inputs["doubles"], 2)):
+            for stand in stands:
+                kind, id = STAND_KINDS[size], value(stand.id)
+                pipes = [value(pipe.id) for pipe in stand.pipes]
+                if len(pipes) != size:
+                    # The stands are built without racked IDs that are not in the tubing tally
+                    missing = [value(pipe_id) for pipe_id in inputs.get("stand_ids", {}).get(kind + "s", []) if value(pipe_id) not in tubing]
+                    raise ValueError(f"The {kind} stand {id} has {len(pipes)} of {size} pipes {pipes}, racked IDs not in the tubing tally: {missing}")
+                unknown = [pipe_id for pipe_id in pipes if pipe_id not in tubing]
+                if unknown:
+                    raise ValueError(f"The {kind} stand {id} holds pipes that are not tubing joints: {unknown}")
+                if existing.get((kind, id), pipes) != pipes:
+                    raise ValueError(f"The {kind} stand {id} is already in the inventory with pipes {existing[(kind, id)]}, "
+                                     f"the imported stand has pipes {pipes}")
+
+    def load_inputs(self, well="default"):
+        """The available stands and pipes, and the assemblies and casing tally of the well, in the same
+        form as loader.load_inputs: dict with assembly_tally, casing_tally, deck_tally, triples, doubles,
+        singles and pups"""
+        tubing = {}
+        for id, length, mu_loss in self.connection.execute(
+                "SELECT id, length, mu_loss FROM pipes WHERE kind = 'tubing' AND status = 'available' ORDER BY position"):
+            tubing[id] = new_pipe(id, length, mu_loss)
+
+        stands = {"triple": [], "double": []}
+        in_stands = set()
+        query = """SELECT s.kind, s.id, sp.pipe_id FROM stands s JOIN stand_pipes sp ON sp.kind = s.kind AND sp.stand_id = s.id
+                   WHERE s.status = 'available' ORDER BY s.position, sp.slot"""
+        current = None
+        for kind, stand_id, pipe_id in self.connection.execute(query):
+            if current != (kind, stand_id):
+                current = (kind, stand_id)
+                stands[kind].append((stand_id, []))
+            if pipe_id not in tubing:
+                raise ValueError(f"The {kind} stand {stand_id} holds pipe {pipe_id}, which is consumed or not in the inventory")
+            stands[kind][-1][1].append(tubing[pipe_id])
+            in_stands.add(pipe_id)
+
+        pups = []
+        for id, length, mu_loss in self.connection.execute(
+                "SELECT id, length, mu_loss FROM pipes WHERE kind = 'pup' AND status = 'available' ORDER BY position"):
+            pups.append(new_pipe(id, length, mu_loss, pup=True))
+
+        return {"assembly_tally": self.assembly_tally(well),
+                "casing_tally": [depth for depth, in self.connection.execute("SELECT depth FROM casing WHERE well = ? ORDER BY position", (well,))],
+                "deck_tally": list(tubing.values()),
+                "triples": [Stand(id, pipes) for id, pipes in stands["triple"]],
+                "doubles": [Stand(id, pipes) for id, pipes in stands["double"]],
+                "singles": [pipe for id, pipe in tubing.items() if id not in in_stands],
+                "pups": pups}
+
+    def assembly_tally(self, well="default"):
+        assemblies = []
+        for row in self.connection.execute("""SELECT id, length, lower_lim, upper_lim, sep_length, sep_ea, critical_point,
+                                              is_top_assembly, order_group FROM assemblies WHERE well = ? ORDER BY position""", (well,)):
+            assembly = AssemblyPipe(*row[:7], is_top_assembly=bool(row[7]))
+            assembly.order_group = row[8]
+            assemblies.append(assembly)
+        return assemblies
+
+    def deck_tally(self):
+        """[triple stand rack, double stand rack, singles, pups] of the available stands and pipes"""
+        inputs = self.load_inputs()
+        return create_deck_tally(inputs["triples"], inputs["doubles"], inputs["singles"], inputs["pups"])
+
+    def consume(self, completion, well):
+        """Mark the stands and pipes run in the completion as consumed in the well, the pipes of a stand too"""
+        stands, pipes = [], []
+        for element in completion.solution:
+            if type(element) == AssemblyPipe:
+                continue
+            if element.num_pipes in STAND_KINDS:
+                stands.append((well, STAND_KINDS[element.num_pipes], value(element.id)))
+            else:
+                pipes.append((well, "pup" if element.pup else "tubing", value(element.id)))
+        with self.connection:
+            self.connection.executemany("UPDATE stands SET status = 'consumed', well = ? WHERE kind = ? AND id = ?", stands)
+            self.connection.executemany("""UPDATE pipes SET status = 'consumed', well = ?1 WHERE kind = 'tubing' AND id IN
+                                           (SELECT pipe_id FROM stand_pipes WHERE kind = ?2 AND stand_id = ?3)""", stands)
+            self.connection.executemany("UPDATE pipes SET status = 'consumed', well = ? WHERE kind = ? AND id = ?", pipes)
+
+    def pipes(self, kind="tubing", status="available", min_length=None, max_length=None):
+        """(id, length) of the pipes of a kind ("tubing"/"pup") with the status, optionally within a length range,
+        by length"""
+        query = "SELECT id, length FROM pipes WHERE kind = ? AND status = ?"
+        parameters = [kind, status]
+        if min_length is not None:
+            query += " AND length >= ?"
+            parameters.append(min_length)
+        if max_length is not None:
+            query += " AND length <= ?"
+            parameters.append(max_length)
+        return self.connection.execute(query + " ORDER BY length", parameters).fetchall()
+
+    def consumed_in(self, well):
+        """IDs of the stands and pipes consumed in the well, as {"stands": [...], "pipes": [...]}"""
+        return {"stands": [id for id, in self.connection.execute("SELECT id FROM stands WHERE well = ? ORDER BY position", (well,))],
+                "pipes": [id for id, in self.connection.execute("SELECT id FROM pipes WHERE well = ? ORDER BY position", (well,))]}
+
+    def counts(self):
+        """{kind: {status: count}} of the stands and pipes"""
+        counts = {}
+        for table in ("stands", "pipes"):
+            for kind, status, count in self.connection.execute(f"SELECT kind, status, COUNT(*) FROM {table} GROUP BY kind, status"):
+                counts.setdefault(kind, {})[status] = count
+        return counts
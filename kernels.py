@@ -0,0 +1,154 @@
+import os
+import warnings
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Kernels of the solver, as plain numeric functions over arrays. Each kernel has a loop version, compiled
+# with Numba when it is installed, and a NumPy version. Both do the same floating point operations in the
+# same order as the methods of AssemblyPipe, so the results are identical.
+# The backend is chosen with set_backend, or the TALLYNOW_KERNELS environment variable ("numba"/"numpy").
+BACKENDS = ["numba", "numpy"] if numba is not None else ["numpy"]
+
+
+def loop_check_clears(lengths, num_pipes, length, length_since_prev, ea_since_prev, goal,
+                      assembly_length, lower_lim, upper_lim, sep_length, sep_ea, critical_point, critical_margin, casing):
+    """Loop version of check_clears"""
+    clear = np.ones(lengths.shape[0], dtype=np.bool_)
+    for i in range(lengths.shape[0]):
+        new_length = length + lengths[i]
+        if lower_lim and new_length < goal - lower_lim:
+            clear[i] = False
+        elif upper_lim and new_length + assembly_length > upper_lim:
+            clear[i] = False
+        elif sep_length and length_since_prev + lengths[i] < sep_length:
+            clear[i] = False
+        elif sep_ea and ea_since_prev + num_pipes[i] < sep_ea:
+            clear[i] = False
+        elif critical_point:
+            depth = goal - (new_length + critical_point)
+            # Closest casing connection, casing is sorted
+            low, high = 0, casing.shape[0]
+            while low < high:
+                middle = (low + high)//2
+                if casing[middle] < depth:
+                    low = middle + 1
+                else:
+                    high = middle
+            distance = np.inf
+            if low > 0:
+                distance = abs(casing[low-1] - depth)
+            if low < casing.shape[0]:
+                distance = min(distance, abs(casing[low] - depth))
+            if distance < critical_margin:
+                clear[i] = False
+    return clear
+
+
+def numpy_check_clears(lengths, num_pipes, length, length_since_prev, ea_since_prev, goal,
+                       assembly_length, lower_lim, upper_lim, sep_length, sep_ea, critical_point, critical_margin, casing):
+    """NumPy version of check_clears"""
+    new_lengths = length + lengths
+    clear = np.ones(lengths.shape[0], dtype=np.bool_)
+    if lower_lim:
+        clear &= ~(new_lengths < goal - lower_lim)
+    if upper_lim:
+        clear &= ~(new_lengths + assembly_length > upper_lim)
+    if sep_length:
+        clear &= ~(length_since_prev + lengths < sep_length)
+    if sep_ea:
+        clear &= ~(ea_since_prev + num_pipes < sep_ea)
+    if critical_point:
+        depths = goal - (new_lengths + critical_point)
+        clear &= ~(numpy_nearest_distance(depths, casing) < critical_margin)
+    return clear
+
+
+def loop_nearest_distance(depths, casing):
+    """Loop version of nearest_distance"""
+    distances = np.empty(depths.shape[0], dtype=np.float64)
+    for i in range(depths.shape[0]):
+        low, high = 0, casing.shape[0]
+        while low < high:
+            middle = (low + high)//2
+            if casing[middle] < depths[i]:
+                low = middle + 1
+            else:
+                high = middle
+        distance = np.inf
+        if low > 0:
+            distance = abs(casing[low-1] - depths[i])
+        if low < casing.shape[0]:
+            distance = min(distance, abs(casing[low] - depths[i]))
+        distances[i] = distance
+    return distances
+
+
+def numpy_nearest_distance(depths, casing):
+    """NumPy version of nearest_distance"""
+    i = np.searchsorted(casing, depths)
+    above = casing[np.clip(i-1, 0, len(casing)-1)]
+    below = casing[np.clip(i, 0, len(casing)-1)]
+    return np.minimum(np.abs(above - depths), np.abs(below - depths))
+
+
+_KERNELS = {"numpy": {"check_clears": numpy_check_clears,
+                      "nearest_distance": numpy_nearest_distance}}
+if numba is not None:
+    _KERNELS["numba"] = {"check_clears": numba.njit(cache=True)(loop_check_clears),
+                         "nearest_distance": numba.njit(cache=True)(loop_nearest_distance)}
+
+
+
+def environment_backend():
+    """Backend named by the TALLYNOW_KERNELS environment variable, the fastest available if it is not set.
+    Numba kernels without Numba installed fall back to the NumPy kernels with a warning."""
+    name = os.environ.get("TALLYNOW_KERNELS") or BACKENDS[0]
+    if name == "numba" and numba is None:
+        warnings.warn("TALLYNOW_KERNELS=numba, but Numba is not installed. The NumPy kernels are used.")
+        return "numpy"
+    if name not in BACKENDS:
+        raise ValueError(f"TALLYNOW_KERNELS={name} is not a kernel backend, available backends: {BACKENDS}")
+    return name
+
+
+_backend = environment_backend()
+
+
+def set_backend(name):
+    """Use the "numba" or "numpy" kernels"""
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"Kernel backend {name} is not available, available backends: {BACKENDS}")
+    _backend = name
+
+
+def get_backend():
+    return _backend
+
+
+def check_clears(lengths, num_pipes, length, length_since_prev, ea_since_prev, goal,
+                 assembly_length, lower_lim, upper_lim, sep_length, sep_ea, critical_point, critical_margin, casing):
+    """AssemblyPipe.check_all_clears_with_pipe for many candidate stands/pipes at once.
+
+    arguments:
+    - lengths, num_pipes: float64 and int64 arrays, one value per candidate
+    - length, length_since_prev, ea_since_prev, goal: state of the completion
+    - assembly_length, ..., critical_margin: the assembly, 0 for a constraint that is not set. sep_ea is
+      compared as it is given, as in AssemblyPipe
+    - casing: sorted float64 array of casing connection depths
+
+    returns bool array, True where the assembly can be placed after the candidate
+    """
+    return _KERNELS[_backend]["check_clears"](lengths, num_pipes, float(length), float(length_since_prev), int(ea_since_prev),
+                                              float(goal), float(assembly_length), float(lower_lim or 0), float(upper_lim or 0),
+                                              float(sep_length or 0), float(sep_ea or 0), float(critical_point or 0),
+                                              float(critical_margin), casing)
+
+
+def nearest_distance(depths, casing):
+    """Distance from each depth to the closest of the sorted casing connections"""
+    return _KERNELS[_backend]["nearest_distance"](np.asarray(depths, dtype=np.float64), casing)
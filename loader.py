@@ -0,0 +1,138 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+from casing import cross_check, extract_casing_source, merge_casing_depths
+from utils import (extract, extract_ids, get_assemblies_from_file, get_deck_tally,
+                   triple_stands_from_ids, double_stands_from_ids, remove_stand_pipes_from_tally)
+
+
+def default_sources(data_path):
+    """Input files in data_path and the columns and rows to read from them, as used by main.py.
+
+    Guide for importing casing joints:
+    Each casing source is (path, length column, start row, end row, reference, depth column). The connection
+    depths are derived from the joint lengths, going up from the reference depth: a number, or the cell holding
+    it. The depth column, if not None, is only used to cross-check the derived depths (see casing.cross_check),
+    load_inputs reports the rows where they disagree.
+    A source can also be (path, depth column, start row, end row) to read precomputed depths.
+    The order of the sources is not important.
+    """
+    # Casing joints
+    c_paths = [data_path+"tieback_tally.csv",\
+               data_path+"liner_tally.csv"]
+    c_length_columns = ['F',\
+                        'E']
+    c_start_rows = [18,\
+                    24]
+    c_end_rows = [131,\
+                  103]
+    c_references = ['H18',\
+                    'G23']      # Bottom of the first joint: below the tieback anchor, top of the liner shoe joint
+    c_depth_columns = ['I',\
+                       'G']
+
+    # Deck tally
+    dt_path = data_path+"tubing_tally.csv"
+    dt_column_lengths = 'D'
+    dt_column_ids = 'A'
+    dt_column_mu_loss = 'C'
+    dt_start = 20
+    dt_end = 200
+
+    # Racked stands
+    stands_pipes_path = data_path+"racked_tubing.csv"
+    t_column = 'F'
+    t_start = 2
+    t_end = 150
+    d_column = 'O'
+    d_start = 2
+    d_end = 9
+
+    # Pups
+    pups_path = data_path+"pups.csv"
+    p_column_lengths = 'E'
+    p_column_ids = 'A'
+    p_column_mu_loss = 'D'
+    p_start = 25
+    p_end = 33
+
+    return {"assemblies": data_path+"assemblies.csv",
+            "casing": list(zip(c_paths, c_length_columns, c_start_rows, c_end_rows, c_references, c_depth_columns)),
+            "tubing": (dt_path, dt_column_ids, dt_column_lengths, dt_start, dt_end),
+            "triples": (stands_pipes_path, t_column, t_start, t_end),
+            "doubles": (stands_pipes_path, d_column, d_start, d_end),
+            "pups": (pups_path, p_column_ids, p_column_lengths, p_start, p_end),
+            "mu_loss": {"tubing": dt_column_mu_loss, "pups": p_column_mu_loss}}
+
+
+def load_inputs(sources, use_cache=False, max_workers=None):
+    """Read and parse all input files concurrently.
+
+    Each source is read in its own thread, as most of the time is spent waiting for the file system
+    (network shares in particular). The stands are assembled as soon as both the tubing tally and the
+    racked stand IDs have been read.
+
+    arguments:
+    - sources: dict with
+        - "assemblies": path
+        - "casing": [(path, length_column, start_row, end_row, reference, depth_column), ...], see default_sources
+        - "tubing": (path, column_ids, column_lengths, start_row, end_row)
+        - "triples": (path, column, start_row, end_row)
+        - "doubles": (path, column, start_row, end_row)
+        - "pups": (path, column_ids, column_lengths, start_row, end_row)
+        - "mu_loss" (optional): {"tubing": column, "pups": column} with the make-up loss of each pipe
+        - "sheets" (optional): {source name: sheet} for sources that are .xlsx workbooks, e.g. {"tubing": "Tally",
+          "casing 1": "Tieback"}. The first sheet is read by default. The rows are the same as in the CSV export.
+    - use_cache: read through the binary input cache (see cache.py)
+    - max_workers: number of threads, defaults to one per source
+
+    returns (inputs, timings):
+    - inputs: dict with assembly_tally, casing_tally (sorted), deck_tally, triples, doubles, singles and pups,
+      stand_ids with the racked IDs as read ({"triples": [...], "doubles": [...]}) and casing_checks with the
+      casing.cross_check report of each source with a depth column ([{"path": .., "report": [...]}, ...]), for
+      validation.validate_inputs
+    - timings: dict of source name -> seconds spent loading it
+    """
+    timings = {}
+
+    def timed(name, function, *args, **kwargs):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        timings[name] = time.perf_counter() - start
+        return result
+
+    num_sources = 5 + len(sources["casing"])
+    sheets = sources.get("sheets", {})
+    with ThreadPoolExecutor(max_workers=max_workers or num_sources) as executor:
+        assemblies = executor.submit(timed, "assemblies", get_assemblies_from_file, sources["assemblies"], use_cache=use_cache, sheet=sheets.get("assemblies"))
+        casing = [executor.submit(timed, f"casing {i+1}", extract_casing_source, source, use_cache=use_cache, sheet=sheets.get(f"casing {i+1}"))
+                  for i, source in enumerate(sources["casing"])]
+        # Derived depths against the depth column, for the sources that still have one
+        casing_checks = [(source[0], executor.submit(cross_check, source, sheet=sheets.get(f"casing {i+1}")))
+                         for i, source in enumerate(sources["casing"]) if len(source) == 6 and source[5] is not None]
+        mu_loss = sources.get("mu_loss", {})
+        tubing = executor.submit(timed, "tubing", get_deck_tally, sources["tubing"][0], sheets.get("tubing"), *sources["tubing"][1:], use_cache=use_cache,
+                                 dt_column_mu_loss=mu_loss.get("tubing"))
+        triple_ids = executor.submit(timed, "triples", extract, extract_ids, *sources["triples"], use_cache=use_cache, sheet=sheets.get("triples"))
+        double_ids = executor.submit(timed, "doubles", extract, extract_ids, *sources["doubles"], use_cache=use_cache, sheet=sheets.get("doubles"))
+        pups = executor.submit(timed, "pups", get_deck_tally, sources["pups"][0], sheets.get("pups"), *sources["pups"][1:], are_pups=True, use_cache=use_cache,
+                               dt_column_mu_loss=mu_loss.get("pups"))
+
+        # Stands depend on the tubing tally
+        deck_tally = tubing.result()
+        stand_ids = {"triples": triple_ids.result(), "doubles": double_ids.result()}
+        triples = triple_stands_from_ids(stand_ids["triples"], deck_tally)
+        doubles = double_stands_from_ids(stand_ids["doubles"], deck_tally)
+        singles = remove_stand_pipes_from_tally(triples+doubles, deck_tally)
+
+        casing_tally = merge_casing_depths([future.result() for future in casing]).tolist()
+
+        inputs = {"assembly_tally": assemblies.result(),
+                  "casing_tally": casing_tally,
+                  "deck_tally": deck_tally,
+                  "triples": triples,
+                  "doubles": doubles,
+                  "singles": singles,
+                  "pups": pups.result(),
+                  "stand_ids": stand_ids,
+                  "casing_checks": [{"path": path, "report": future.result()} for path, future in casing_checks]}
+    return inputs, timings
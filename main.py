@@ -1,6 +1,16 @@
 from pipes import AssemblyPipe, Rack, Pile
-from utils import extract_casing_joints
 from utils import *
+from loader import load_inputs, default_sources
+from inventory import Inventory
+from improve import improve_completion
+from bounds import gap_report
+from portfolio import run_portfolio
+from montecarlo import report as montecarlo_report
+from orders import generate_completion_tally_any_order
+from pareto import pareto_front
+from snapshot import DeckSnapshot
+from validation import check_inputs, format_report
+import parquet
 from pprint import pprint
 import os
 import argparse
@@ -31,7 +41,39 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='TallyNow - Automated Upper Completion Tally System')
     parser.add_argument('--depth', type=float, default=2247, 
                         help='Well depth in meters (default: 2247)')
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false',
+                        help='Re-parse all input files instead of using the binary input cache in data/.tallynow_cache')
+    parser.add_argument('--serial', action='store_true',
+                        help='Load the input files one after another instead of concurrently')
+    parser.add_argument('--inventory', default=None, metavar='PATH',
+                        help='Load the available stands and pipes from this inventory database, imported from the input files if it is empty')
+    parser.add_argument('--well', default=None, metavar='NAME',
+                        help='Mark the stands and pipes of the final completion consumed in this well in the inventory database')
+    # The final completion comes from one of these, or from plan_completion when none is given
+    solver = parser.add_mutually_exclusive_group()
+    solver.add_argument('--improve', type=float, default=0, metavar='SECONDS',
+                        help='Improve the final completion by local search for this many seconds (default: off)')
+    solver.add_argument('--portfolio', type=float, default=0, metavar='SECONDS',
+                        help='Run all solver strategies in parallel for this many seconds and use the best completion (default: off)')
+    parser.add_argument('--gap', action='store_true',
+                        help='Report the landing error and pups of the final completion against their lower bounds')
+    solver.add_argument('--any-order', action='store_true',
+                        help='Search the orders of the assemblies in the same order group for the best completion')
+    parser.add_argument('--pareto', action='store_true',
+                        help='List the completions that trade landing error against pups and connections')
+    parser.add_argument('--deck', default=None, metavar='PATH',
+                        help='Use the stands and pipes of a deck snapshot, e.g. the leftover of the previous well')
+    parser.add_argument('--save-leftover', default=None, metavar='PATH',
+                        help='Save the leftover stands and pipes as a deck snapshot for the next well')
+    parser.add_argument('--parquet-inputs', default=None, metavar='FOLDER',
+                        help='Read the tubing, pup, stand, assembly and casing tables from Parquet files in this folder')
+    parser.add_argument('--parquet', default=None, metavar='PATH',
+                        help='Write the depth table and solver metadata of the final completion as Parquet')
+    parser.add_argument('--montecarlo', type=int, default=0, metavar='SAMPLES',
+                        help='Report the spread of the landing error and critical point clearances over this many samples of the tally lengths (default: off)')
     args = parser.parse_args()
+    if args.well and not args.inventory:
+        parser.error("--well needs --inventory")
     
     step1 = True
     step2 = True
@@ -44,6 +86,46 @@ if __name__ == "__main__":
     print(f"Well Depth: {args.depth} meters")
     print("=" * 50)
     
+    ##############################################
+    ###############     INPUT      ###############
+    ##############################################
+
+    # Input files and the columns/rows to read from them are defined in loader.default_sources
+    sources = default_sources(PATH+"data/")
+
+    if args.parquet_inputs:
+        # Tables exported by the reporting stack or by parquet.write_inputs
+        inputs, load_times = parquet.load_inputs(args.parquet_inputs), {}
+    elif args.inventory:
+        # Available stands and pipes from the inventory store, imported from the input files the first time
+        inventory = Inventory(args.inventory)
+        if inventory.is_empty():
+            inventory.import_sources(sources, use_cache=args.use_cache)
+        inputs, load_times = inventory.load_inputs(), {}
+    else:
+        # Load all input files concurrently. Stands are built once the tubing tally is loaded.
+        inputs, load_times = load_inputs(sources, use_cache=args.use_cache, max_workers=1 if args.serial else None)
+    for source, seconds in load_times.items():
+        label = "Loaded " + source
+        print(f"{label:.<20}: {seconds*1000:.1f} ms")
+
+    if args.deck:
+        # Stands and pipes left by the previous well, the assemblies and casing tally are from the input files
+        inputs.update(DeckSnapshot.load(args.deck).inputs())
+
+    # Broken inputs fail here, before any solve
+    warnings = check_inputs(inputs)
+    if warnings:
+        print(format_report(warnings))
+
+    assembly_tally = inputs["assembly_tally"]
+    casing_tally = inputs["casing_tally"]
+    deck_tally = inputs["deck_tally"]
+    triples = inputs["triples"]
+    doubles = inputs["doubles"]
+    singles = inputs["singles"]
+    pups = inputs["pups"]
+
     ##############################################
     ###############     STEP 1     ###############
     ##############################################
@@ -65,52 +147,6 @@ if __name__ == "__main__":
     ###############     STEP 2     ###############
     ##############################################
     
-    # Step 2 - Input
-    # Assemblies
-    if step2:
-        """ 
-        """
-        
-        assembly_path = PATH+"data/assemblies.csv"
-        assembly_tally = get_assemblies_from_file(assembly_path)
-
-    # Casing joints
-    if step2:
-        """Guide for importing casing joints:
-        Important that the index of all "c_*" lists belong together.
-        i.e. c_end_rows[0] is the ending row of c_columns[0] in the sheet c_sheets[0] in the file c_paths[0].
-        
-        The order is not important.
-        
-        Paths have to be absolute.
-        """
-        c_paths = [PATH+"data/tieback_tally.csv",\
-                   PATH+"data/liner_tally.csv"]
-        # c_sheets no longer needed for CSV files
-        c_columns = ['I',\
-                     'G']
-        c_start_rows = [18,\
-                        24]
-        c_end_rows = [131,\
-                      104]
-
-        casing_tally = []
-        for i in range(len(c_paths)):
-            casing_tally += extract_casing_joints(c_paths[i], c_columns[i], c_start_rows[i], c_end_rows[i])
-                                                  
-    # Deck tally
-    if step2:
-        """
-        Path has to be absolute
-        """
-        dt_path = PATH+"data/tubing_tally.csv"
-        # dt_sheet no longer needed for CSV files
-        dt_column_lengths = 'D'
-        dt_column_ids = 'A'
-        dt_start = 20
-        dt_end = 200
-        deck_tally = get_deck_tally(dt_path, None, dt_column_ids, dt_column_lengths, dt_start, dt_end)
-
     # Step 2 - Solving
     if step2:
         print_step(2)
@@ -127,52 +163,56 @@ if __name__ == "__main__":
     ###############     STEP 3     ###############
     ##############################################
 
-    # Step 3 - Input
-    if step3:
-        stands_pipes_path = PATH+"data/racked_tubing.csv"
-        # pipes_sheet no longer needed for CSV files
-        pups_path = PATH+"data/pups.csv"
-
-    # Define triple stands
-    if step3:
-        t_column = 'F'
-        t_start = 2
-        t_end = 150
-        triples = get_triple_stands_from_file(stands_pipes_path, None, t_column, t_start, t_end, deck_tally)
-
-    # Define double stands
-    if step3:
-        d_column = 'O'
-        d_start = 2
-        d_end = 9
-        doubles = get_double_stands_from_file(stands_pipes_path, None, d_column, d_start, d_end, deck_tally)
-
-    # Define single pipes
-    if step3:
-        used_pipes = triples+doubles
-        singles = remove_stand_pipes_from_tally(used_pipes, deck_tally)
-    
-    # Import pups
-    if step3:
-        p_column_lengths = 'E'
-        p_column_ids = 'A'
-        p_start = 25
-        p_end = 33
-        pups = get_deck_tally(pups_path, None, p_column_ids, p_column_lengths, p_start, p_end, are_pups=True)
-
-    # Setup full deck tallys, one for itermediate step, one for final
-    if step3:
-        intermediate_deck_tally = create_deck_tally(triples, doubles, singles, pups)
-        final_deck_tally = create_deck_tally(triples, doubles, singles, pups)
-
     # Step 3 - Solving
     if step3:
         print_step(3)
 
-        intermediate_completion = generate_completion_tally(well_depth, intermediate_deck_tally, assembly_tally, casing_tally)
-        completion_length = well_depth-intermediate_completion.get_length_error()
-
-        final_completion = generate_completion_tally(completion_length, final_deck_tally, assembly_tally, casing_tally)
+        if args.portfolio:
+            # Best of the strategies in portfolio.py, solved against the well depth
+            final_completion = run_portfolio(well_depth, inputs, deadline=args.portfolio)["completion"]
+            if final_completion is None:
+                # No strategy finished with a valid completion before the deadline
+                print(f"No valid completion from the portfolio within {args.portfolio} s, solving as without --portfolio")
+                final_completion = plan_completion(well_depth, triples, doubles, singles, pups, assembly_tally, casing_tally)
+        elif args.improve:
+            # Improved against the well depth, the second solve of plan_completion would undo the moves
+            first_completion = generate_completion_tally(well_depth, create_deck_tally(triples, doubles, singles, pups), assembly_tally, casing_tally)
+            final_completion = improve_completion(first_completion, time_budget=args.improve)
+        elif args.any_order:
+            # Solved twice as below, each time over the assembly orders
+            final_completion = plan_completion(well_depth, triples, doubles, singles, pups, assembly_tally, casing_tally, solver=generate_completion_tally_any_order)
+        else:
+            # Solved twice, see plan_completion
+            final_completion = plan_completion(well_depth, triples, doubles, singles, pups, assembly_tally, casing_tally)
         print(f"Final solution:\n{final_completion}\n")
         # pprint(final_completion.get_solution_depths(), sort_dicts=False)
-        prettier_print(final_completion.get_solution_depths())
\ No newline at end of file
+        prettier_print(final_completion.get_solution_depths())
+
+        if args.gap:
+            gap = gap_report(well_depth, final_completion, create_deck_tally(triples, doubles, singles, pups), assembly_tally)
+            print()
+            for key, value in gap.items():
+                label = key.replace("_", " ").capitalize()
+                print(f"{label:.<20}: {value}")
+
+        if args.pareto:
+            print("\nPareto front:")
+            for point in pareto_front(well_depth, create_deck_tally(triples, doubles, singles, pups), assembly_tally, casing_tally):
+                print(f"{'Error':.<20}: {point['error']:<8} {'Pups':.<8}: {point['pups']:<4} {'Connections':.<14}: {point['connections']}")
+
+        if args.montecarlo:
+            uncertainty = montecarlo_report(final_completion, samples=args.montecarlo)
+            print()
+            print(f"{'Landing error':.<20}: {uncertainty['landing_error']}")
+            for id, clearance in uncertainty["critical_point_clearances"].items():
+                print(f"{id:.<20}: {clearance}")
+        if args.save_leftover:
+            final_completion.leftover_snapshot().save(args.save_leftover)
+            print(f"\n{'Leftover saved':.<20}: {args.save_leftover}")
+        if args.parquet:
+            parquet.write_completion(final_completion, args.parquet, {"well_depth": well_depth})
+            print(f"\n{'Parquet saved':.<20}: {args.parquet}")
+        if args.well:
+            # The next well loaded from the inventory only sees what is left
+            inventory.consume(final_completion, args.well)
+            print(f"\n{'Consumed in':.<20}: {args.well}")
\ No newline at end of file
@@ -0,0 +1,103 @@
+import numpy as np
+import kernels
+from pipes import AssemblyPipe
+
+PERCENTILES = [5, 50, 95]
+
+
+def simulate(completion, samples=10000, length_sigma=0.002, mu_loss_sigma=0.1, assembly_sigma=0.002, seed=None):
+    """Monte Carlo analysis of the depths of a completion when the tally lengths are uncertain.
+
+    Every joint (each pipe of a stand on its own), pup and assembly gets a random length per sample:
+    - measured length + normal error with standard deviation length_sigma (meters)
+    - minus a normal variation of the make-up loss, with standard deviation mu_loss_sigma times the
+      make-up loss of the pipe (Pipe.mu_loss, pipes without a make-up loss get none)
+    - assemblies: length + normal error with standard deviation assembly_sigma
+    All samples are drawn and summed in one NumPy batch. Depths are measured down from the top of the
+    string, as in Completion.get_solution_depths.
+
+    returns dict with:
+    - landing_error: (samples,) goal - string length
+    - assembly_depths: {assembly id: (samples,) top depth}
+    - critical_point_depths: {assembly id: (samples,) depth of the critical point}
+    - critical_point_clearances: {assembly id: (samples,) distance to the closest casing connection}
+    """
+    rng = np.random.default_rng(seed)
+
+    # One row per joint, bottom->top, and the element each joint belongs to
+    lengths, mu_losses, sigmas, element_index = [], [], [], []
+    for i, element in enumerate(completion.solution):
+        if type(element) == AssemblyPipe:
+            joints = [element]
+        else:
+            joints = getattr(element, "pipes", None) or [element]   # Stands are perturbed joint by joint
+        for joint in joints:
+            lengths.append(joint.length)
+            mu_losses.append(getattr(joint, "mu_loss", None) or 0.0)
+            sigmas.append(assembly_sigma if type(element) == AssemblyPipe else length_sigma)
+            element_index.append(i)
+    lengths = np.array(lengths, dtype=np.float64)
+    mu_losses = np.array(mu_losses, dtype=np.float64)
+    sigmas = np.array(sigmas, dtype=np.float64)
+    element_starts = np.searchsorted(element_index, np.arange(len(completion.solution)))
+
+    joint_samples = lengths + rng.standard_normal((samples, len(lengths)))*sigmas \
+                    - rng.standard_normal((samples, len(lengths)))*(mu_loss_sigma*mu_losses)
+    element_samples = np.add.reduceat(joint_samples, element_starts, axis=1)
+
+    # Depths from the top: the top element starts at 0
+    from_top = element_samples[:, ::-1]
+    top_depths = (np.cumsum(from_top, axis=1) - from_top)[:, ::-1]
+    total_length = element_samples.sum(axis=1)
+
+    casing = np.sort(np.asarray(completion.casing_joints, dtype=np.float64))
+    assembly_depths = {}
+    critical_point_depths = {}
+    critical_point_clearances = {}
+    for i, element in enumerate(completion.solution):
+        if type(element) != AssemblyPipe:
+            continue
+        assembly_depths[element.id] = top_depths[:, i]
+        if element.critical_point is not None:
+            depths = top_depths[:, i] + element_samples[:, i] - element.critical_point
+            critical_point_depths[element.id] = depths
+            if len(casing):
+                critical_point_clearances[element.id] = clearance(depths, casing)
+
+    return {"landing_error": completion.goal - total_length,
+            "assembly_depths": assembly_depths,
+            "critical_point_depths": critical_point_depths,
+            "critical_point_clearances": critical_point_clearances}
+
+
+def clearance(depths, casing):
+    """Distance from each depth to the closest casing connection, casing sorted"""
+    return kernels.nearest_distance(depths, casing)
+
+
+def summarize(values):
+    """Mean, standard deviation, min, max and percentiles of a sample array"""
+    percentiles = np.percentile(values, PERCENTILES)
+    summary = {"mean": round(float(np.mean(values)), 4),
+               "std": round(float(np.std(values)), 4),
+               "min": round(float(np.min(values)), 4),
+               "max": round(float(np.max(values)), 4)}
+    for p, value in zip(PERCENTILES, percentiles):
+        summary[f"p{p}"] = round(float(value), 4)
+    return summary
+
+
+def report(completion, samples=10000, **kwargs):
+    """Summary of simulate(completion, samples, **kwargs).
+    For each critical point, the share of samples within the critical margin of the assembly from a casing
+    connection is reported too."""
+    result = simulate(completion, samples, **kwargs)
+    margins = {element.id: element.critical_margin for element in completion.solution if type(element) == AssemblyPipe}
+    clearances = {}
+    for id, values in result["critical_point_clearances"].items():
+        clearances[id] = summarize(values)
+        clearances[id]["p_within_margin"] = round(float(np.mean(values <= margins[id])), 4)
+    return {"samples": samples,
+            "landing_error": summarize(result["landing_error"]),
+            "assembly_depths": {id: summarize(values) for id, values in result["assembly_depths"].items()},
+            "critical_point_clearances": clearances}
@@ -0,0 +1,190 @@
+import copy
+import itertools
+import math
+import time
+from bounds import Bounds
+from completion import Completion
+from pipes import AssemblyPipe
+from utils import completion_score, continue_completion_tally, copy_deck_tally, deck_signature, select_default
+
+
+def order_segments(assembly_tally):
+    """Split the assembly tally into segments, bottom->top. A segment is a run of assemblies with the same
+    order group, which may be placed in any order, or a single assembly without a group."""
+    segments = []
+    seen_groups = set()
+    for assembly in assembly_tally:
+        group = getattr(assembly, "order_group", None)
+        if group is not None and assembly.is_top_assembly:
+            raise ValueError(f"The top assembly {assembly.id} can not be in an order group.")
+        if group is not None and segments and segments[-1][0].order_group == group:
+            segments[-1].append(assembly)
+            continue
+        if group is not None:
+            if group in seen_groups:
+                raise ValueError(f"The assemblies of order group {group} must be next to each other in the assembly tally.")
+            seen_groups.add(group)
+        segments.append([assembly])
+    return segments
+
+
+def assembly_orders(assembly_tally):
+    """All permissible orders of the assembly tally. Orders sharing the longest start come one after another."""
+    segments = order_segments(assembly_tally)
+    for choice in itertools.product(*(itertools.permutations(segment) for segment in segments)):
+        yield [assembly for segment in choice for assembly in segment]
+
+
+def search_assembly_orders(goal, deck_tally, assembly_tally, casing_tally, selector=select_default, time_budget=None):
+    """Step 3 over all permissible orders of the assemblies, see the 'order group' column of the assembly file.
+
+    The orders are searched depth first, one assembly position at a time, so that orders with the same
+    start share its solve: the solver continues from the checkpoint after the last shared assembly. The first
+    order below each position is the one solved on the way down, and costs no extra solve. Also:
+    - window pruning: an order is dropped as soon as an assembly can no longer be placed deeper than its upper
+      limit, as the length below it only grows
+    - memoization: a solver state (next assembly, assemblies left, deck and length) that has been searched
+      from before, by another order of the assemblies below, is not searched again
+    - the search stops when a completion meets the lower bounds of bounds.py on the error and pups
+    Without order groups this is a single solve, as generate_completion_tally.
+
+    arguments:
+    - goal: well depth
+    - deck_tally: [triple stand rack, double stand rack, singles, pups], not changed
+    - assembly_tally: [assy_1, ..., assy_n], not changed
+    - casing_tally: casing connection depths
+    - selector: see select_default
+    - time_budget: seconds, the best completion found so far is returned when it is used (default: no limit)
+
+    returns dict with:
+    - completion: best valid completion, None if no order gives one
+    - order: assembly ids of the best completion, bottom->top
+    - orders: number of permissible orders
+    - solves, pruned, memo_hits: search statistics
+    """
+    search = _OrderSearch(goal, deck_tally, assembly_tally, casing_tally, selector, time_budget)
+    search.run()
+    return {"completion": search.best,
+            "order": [assembly.id for assembly in search.best_order] if search.best_order else None,
+            "orders": search.num_orders,
+            "solves": search.solves,
+            "pruned": search.pruned,
+            "memo_hits": search.memo_hits}
+
+
+def generate_completion_tally_any_order(goal, deck_tally, assembly_tally, casing_tally, selector=select_default):
+    """Solver mode with the same arguments as generate_completion_tally, searching the assembly orders"""
+    completion = search_assembly_orders(goal, deck_tally, assembly_tally, casing_tally, selector)["completion"]
+    if completion is None:
+        raise RuntimeError("No valid assembly order!")
+    return completion
+
+
+class _OrderSearch:
+    def __init__(self, goal, deck_tally, assembly_tally, casing_tally, selector, time_budget):
+        self.goal = goal
+        self.deck_tally = deck_tally
+        self.casing_tally = casing_tally
+        self.selector = selector
+        self.segments = order_segments(assembly_tally)
+        self.num_assemblies = len(assembly_tally)
+        self.num_orders = math.prod(math.factorial(len(segment)) for segment in self.segments)
+        self.deadline = time.perf_counter() + time_budget if time_budget is not None else None
+
+        self.bounds = Bounds(goal, deck_tally, assembly_tally)
+
+        self.best = None
+        self.best_order = None
+        self.memo = set()
+        self.solves = 0
+        self.pruned = 0
+        self.memo_hits = 0
+        self.stop = False
+
+    def run(self):
+        completion = Completion(self.goal)
+        completion.add_casing_joints(self.casing_tally)
+        self.search(completion, copy_deck_tally(self.deck_tally), 0, [], None)
+
+    def remaining(self, order):
+        """Assemblies of the segment at position len(order) that are not placed yet, and the default order of
+        the segments after it"""
+        position = 0
+        for i, segment in enumerate(self.segments):
+            if position + len(segment) > len(order):
+                placed = order[position:]
+                candidates = [assembly for assembly in segment if assembly not in placed]
+                rest = [assembly for later in self.segments[i+1:] for assembly in later]
+                return candidates, rest
+            position += len(segment)
+        return [], []
+
+    def search(self, completion, deck_tally, iteration, order, solved):
+        """Search the orders starting with order, from the solver state after its last assembly was placed.
+        solved is the completion of order followed by the default order, if it has been solved already."""
+        candidates, rest = self.remaining(order)
+        for k, candidate in enumerate(candidates):
+            if self.stop or (self.deadline is not None and time.perf_counter() > self.deadline):
+                self.stop = True
+                return
+            new_order = order + [candidate]
+            full_order = new_order + [assembly for assembly in candidates if assembly is not candidate] + rest
+
+            if not self.within_windows(completion.length, full_order[len(order):]):
+                self.pruned += 1
+                continue
+            key = (candidate.id, frozenset(assembly.id for assembly in full_order[len(order):]),
+                   deck_signature(deck_tally), round(completion.length, 3))
+            if key in self.memo:
+                self.memo_hits += 1
+                continue
+            self.memo.add(key)
+
+            if k == 0 and solved is not None:
+                result = solved
+            else:
+                result = self.solve(completion, deck_tally, iteration, full_order, len(order))
+                self.evaluate(result, full_order)
+
+            # Continue below the next position from the checkpoint after the candidate was placed
+            placed = [i for i, element in enumerate(result.solution) if type(element) == AssemblyPipe and element.id == candidate.id]
+            if len(new_order) == self.num_assemblies or not placed or placed[0] + 1 >= len(result.checkpoints):
+                continue
+            next_completion, next_deck_tally, _, next_iteration = result.from_checkpoint(placed[0] + 1)
+            self.search(next_completion, next_deck_tally, next_iteration, new_order, result)
+
+    def within_windows(self, length, assemblies):
+        """False if an assembly with an upper limit can not be placed, even with nothing but the assemblies
+        before it in between"""
+        for assembly in assemblies:
+            length += assembly.length
+            if assembly.upper_lim and length > self.goal - assembly.upper_lim:
+                return False
+        return True
+
+    def solve(self, completion, deck_tally, iteration, full_order, assembly_index):
+        """Solve from the given state, on copies. A solve that fails still keeps its checkpoints."""
+        completion = completion.copy()
+        deck_tally = copy_deck_tally(deck_tally)
+        # The solver updates the constraint flags of the assemblies
+        assembly_tally = [copy.copy(assembly) for assembly in full_order]
+        self.solves += 1
+        try:
+            continue_completion_tally(completion, deck_tally, assembly_tally, assembly_index, iteration,
+                                      checkpoints=True, selector=self.selector)
+        except (RuntimeError, IndexError):
+            completion.done = False
+        return completion
+
+    def evaluate(self, completion, full_order):
+        if not completion.done or completion.num_assemblies != self.num_assemblies:
+            return
+        if not 0 <= completion.get_length_error() < 5:
+            return
+        if self.best is None or completion_score(completion) < completion_score(self.best):
+            self.best = completion
+            self.best_order = full_order
+            # No order can do better than the lower bounds
+            report = self.bounds.report(completion)
+            if report["error_gap"] == 0 and report["pup_gap"] == 0:
+                self.stop = True
@@ -0,0 +1,200 @@
+import copy
+import itertools
+from completion import Completion
+from pipes import AssemblyPipe
+from utils import continue_completion_tally, copy_deck_tally, mm, select_default
+
+
+def pareto_front(goal, deck_tally, assembly_tally, casing_tally, selector=select_default):
+    """Completions that trade landing error against pups used and connections made up, none better than
+    another on all three.
+
+    The string below the top assembly is solved as in generate_completion_tally, as it is decided by the
+    clear rules of the assemblies. The top section, between the last assembly and the top assembly, is where
+    the string is filled up to the goal and the only place pups are used, so the trade-offs are made there.
+    Its stands (from the outside of each rack), singles and pups are searched with bitsets of the lengths
+    that can be reached, bit i meaning i mm as in bounds.py:
+    - the stands and singles in layers by the number of connections, the pups in layers by the number of pups
+    - dominance pruning: a length is dropped from a layer when it can be reached with fewer connections
+      (or pups), as a plan with more can never be on the front
+    - the two are combined for each number of pups and connections within 5 m of the goal, and the points
+      that are not dominated are built into completions
+
+    arguments:
+    - goal: well depth
+    - deck_tally: [triple stand rack, double stand rack, singles, pups], not changed
+    - assembly_tally: [assy_1, ..., assy_n], the last one the top assembly, not changed
+    - casing_tally: casing connection depths
+    - selector: see select_default, for the string below the top assembly
+
+    returns list of dicts sorted by error, with:
+    - error: landing error in meters
+    - pups: pups used
+    - connections: stands, pipes and pups made up in the string
+    - completion: done completion with its leftover tally
+    """
+    completion, deck_tally, assembly_index, iteration = solve_to_top(goal, deck_tally, assembly_tally, casing_tally, selector)
+    top_assembly = copy.copy(assembly_tally[assembly_index])
+    room = mm(goal) - mm(completion.length) - mm(top_assembly.length)
+    if room < 0:
+        return []
+    below = sum(1 for element in completion.solution if type(element) != AssemblyPipe)
+
+    racks, singles, pups = deck_tally[:2], deck_tally[2].pipes, deck_tally[3].pipes
+
+    # Connection layers: stands from the outside of the racks first, then any of the singles
+    prefixes = [rack_prefixes(rack, room) for rack in racks]
+    layers = [1]
+    for rack_prefix in prefixes:
+        new_layers = [0]*(len(layers) + len(rack_prefix) - 1)
+        for c, layer in enumerate(layers):
+            for j, length in enumerate(rack_prefix):
+                new_layers[c+j] |= layer << length
+        layers = prune(new_layers, room)
+    history = [layers]
+    for pipe in singles:
+        layers = add_item(layers, mm(pipe.length), room)
+        history.append(layers)
+
+    pup_layers = [1]
+    for pup in pups:
+        pup_layers = add_item(pup_layers, mm(pup.length), room)
+
+    # Longest top section for each number of pups and connections, within 5 m of the goal
+    points = []
+    for p, pup_layer in enumerate(pup_layers):
+        for b in set_bits(pup_layer):
+            for c, layer in enumerate(layers):
+                a = highest_bit(layer, max(room - b - 4999, 0), room - b)
+                if a is not None:
+                    points.append((room - a - b, p, c, a, b))
+
+    front = []
+    for error, p, c, a, b in sorted(points):
+        if any(other[1] <= p and other[2] <= c for other in front):
+            continue
+        front.append((error, p, c, a, b))
+
+    results = []
+    for error, p, c, a, b in front:
+        new_completion, new_deck_tally = completion.copy(), copy_deck_tally(deck_tally)
+        counts, chosen_singles = reconstruct(history, prefixes, singles, c, a)
+        chosen_pups = find_subset(pups, p, b)
+        for tally, count in zip(new_deck_tally[:2], counts):
+            for _ in range(count):
+                new_completion.add_normal_pipe(tally.remove_stand())
+        for pipe in sorted(chosen_singles, key=lambda pipe: pipe.length, reverse=True):
+            new_completion.add_normal_pipe(new_deck_tally[2].remove_pipe(pipe.id))
+        for pipe in sorted(chosen_pups, key=lambda pipe: pipe.length, reverse=True):
+            new_completion.add_normal_pipe(new_deck_tally[3].remove_pipe(pipe.id))
+        new_completion.add_assembly_pipe(top_assembly)
+        if not 0 <= new_completion.get_length_error() < 5:
+            continue
+        new_completion.done = True
+        new_completion.add_leftover_tally(new_deck_tally)
+        results.append({"error": round(new_completion.get_length_error(), 3),
+                        "pups": p,
+                        "connections": below + c + p,
+                        "completion": new_completion})
+    return results
+
+
+def solve_to_top(goal, deck_tally, assembly_tally, casing_tally, selector):
+    """Solve with checkpoints and return the state before the first stand/pipe of the top section, as
+    (completion, deck_tally, assembly_index, iteration). The top section of the solve is left out, so a
+    solve that fails there can still be used."""
+    completion = Completion(goal)
+    completion.add_casing_joints(casing_tally)
+    # The solver updates the constraint flags of the assemblies
+    assemblies = [copy.copy(assembly) for assembly in assembly_tally]
+    try:
+        continue_completion_tally(completion, copy_deck_tally(deck_tally), assemblies, checkpoints=True, selector=selector)
+    except (RuntimeError, IndexError):
+        pass
+    top_index = len(assembly_tally) - 1
+    for position, checkpoint in enumerate(completion.checkpoints):
+        if checkpoint["assembly_index"] == top_index:
+            return completion.from_checkpoint(position)
+    raise RuntimeError("The solver did not reach the top assembly!")
+
+
+def rack_prefixes(rack, room):
+    """Lengths in mm of the 0, 1, 2, .. outermost stands of the rack, up to room"""
+    prefixes = [0]
+    for stand in reversed(rack.stands):
+        length = prefixes[-1] + mm(stand.length)
+        if length > room:
+            break
+        prefixes.append(length)
+    return prefixes
+
+
+def add_item(layers, length, room):
+    """Layers after the item may be added: layer k+1 gets the lengths of layer k plus the item"""
+    new_layers = layers + [0]
+    for k in range(len(layers)-1, -1, -1):
+        new_layers[k+1] |= layers[k] << length
+    return prune(new_layers, room)
+
+
+def prune(layers, room):
+    """Keep lengths up to room, each in the lowest layer it can be reached in"""
+    mask = (1 << (room + 1)) - 1
+    reached = 0
+    pruned = []
+    for layer in layers:
+        layer &= mask & ~reached
+        reached |= layer
+        pruned.append(layer)
+    while len(pruned) > 1 and pruned[-1] == 0:
+        pruned.pop()
+    return pruned
+
+
+def set_bits(bits):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def highest_bit(bits, low, high):
+    """Highest bit set from low to high, None if there is none"""
+    if high < low:
+        return None
+    bits = (bits & ((1 << (high + 1)) - 1)) >> low
+    if bits == 0:
+        return None
+    return low + bits.bit_length() - 1
+
+
+def reconstruct(history, prefixes, singles, c, a):
+    """Stands per rack and the singles that give a length of a mm with c connections"""
+    chosen = []
+    for i in range(len(singles), 0, -1):
+        if c < len(history[i-1]) and (history[i-1][c] >> a) & 1:
+            continue
+        chosen.append(singles[i-1])
+        c -= 1
+        a -= mm(singles[i-1].length)
+    for counts in itertools.product(*(range(len(rack_prefix)) for rack_prefix in prefixes)):
+        if sum(counts) == c and sum(rack_prefix[count] for rack_prefix, count in zip(prefixes, counts)) == a:
+            return list(counts), chosen
+    raise RuntimeError("No stands found for the top section.")
+
+
+def find_subset(pipes, count, length):
+    """count pipes with a total length of length mm"""
+    def search(start, count, length):
+        if count == 0:
+            return [] if length == 0 else None
+        for i in range(start, len(pipes)):
+            if mm(pipes[i].length) <= length:
+                rest = search(i+1, count-1, length - mm(pipes[i].length))
+                if rest is not None:
+                    return [pipes[i]] + rest
+        return None
+    subset = search(0, count, length)
+    if subset is None:
+        raise RuntimeError("No pups found for the top section.")
+    return subset
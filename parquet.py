@@ -0,0 +1,138 @@
+import json
+import os
+from casing import merge_casing_depths
+from pipes import AssemblyPipe, new_pipe
+from utils import triple_stands_from_ids, double_stands_from_ids, remove_stand_pipes_from_tally
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Input tables and their files in a folder, see write_inputs and load_inputs
+TABLES = {"tubing": "tubing.parquet",           # id, length, mu_loss
+          "pups": "pups.parquet",               # id, length, mu_loss
+          "stands": "stands.parquet",           # kind (triple/double), pipe: pipe IDs in rack order, as in racked_tubing.csv
+          "assemblies": "assemblies.parquet",   # id, length, lower_lim, upper_lim, sep_length, sep_ea, critical_point, is_top_assembly, order_group
+          "casing": "casing.parquet"}           # depth
+
+ASSEMBLY_COLUMNS = ["id", "length", "lower_lim", "upper_lim", "sep_length", "sep_ea", "critical_point", "is_top_assembly", "order_group"]
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError("Parquet input and output requires pyarrow (pip install pyarrow)")
+
+
+def read_pipes(path, are_pups=False):
+    """Tubing joints or pups from a table with id, length and optionally mu_loss"""
+    require_pyarrow()
+    table = pq.read_table(path)
+    mu_losses = table.column("mu_loss").to_pylist() if "mu_loss" in table.column_names else [None]*table.num_rows
+    return [new_pipe(id, length, mu_loss, are_pups)
+            for id, length, mu_loss in zip(table.column("id").to_pylist(), table.column("length").to_pylist(), mu_losses)]
+
+
+def read_stand_ids(path):
+    """Racked pipe IDs as {"triples": [...], "doubles": [...]}, from a table with kind and pipe"""
+    require_pyarrow()
+    table = pq.read_table(path)
+    stand_ids = {"triples": [], "doubles": []}
+    for kind, pipe in zip(table.column("kind").to_pylist(), table.column("pipe").to_pylist()):
+        stand_ids[kind + "s"].append(pipe)
+    return stand_ids
+
+
+def read_assemblies(path):
+    require_pyarrow()
+    rows = pq.read_table(path).to_pylist()
+    assemblies = []
+    for row in rows:
+        assembly = AssemblyPipe(*(row[column] for column in ASSEMBLY_COLUMNS[:7]), is_top_assembly=row["is_top_assembly"])
+        assembly.order_group = row.get("order_group")
+        assemblies.append(assembly)
+    return assemblies
+
+
+def read_casing(path):
+    require_pyarrow()
+    return pq.read_table(path).column("depth").to_numpy()
+
+
+def load_inputs(folder):
+    """Inputs from the Parquet tables in folder (see TABLES), in the same form as loader.load_inputs"""
+    path = lambda name: f"{folder}/{TABLES[name]}"
+    deck_tally = read_pipes(path("tubing"))
+    stand_ids = read_stand_ids(path("stands"))
+    triples = triple_stands_from_ids(stand_ids["triples"], deck_tally)
+    doubles = double_stands_from_ids(stand_ids["doubles"], deck_tally)
+    return {"assembly_tally": read_assemblies(path("assemblies")),
+            "casing_tally": merge_casing_depths([read_casing(path("casing"))]).tolist(),
+            "deck_tally": deck_tally,
+            "triples": triples,
+            "doubles": doubles,
+            "singles": remove_stand_pipes_from_tally(triples+doubles, deck_tally),
+            "pups": read_pipes(path("pups"), are_pups=True),
+            "stand_ids": stand_ids}
+
+
+def write_inputs(inputs, folder):
+    """Write loaded inputs (see loader.load_inputs) as the Parquet tables of load_inputs"""
+    require_pyarrow()
+    os.makedirs(folder, exist_ok=True)
+    path = lambda name: f"{folder}/{TABLES[name]}"
+    for name, pipes in (("tubing", inputs["deck_tally"]), ("pups", inputs["pups"])):
+        pq.write_table(pa.table({"id": [pipe.id for pipe in pipes],
+                                 "length": pa.array([pipe.length for pipe in pipes], type=pa.float64()),
+                                 "mu_loss": pa.array([pipe.mu_loss for pipe in pipes], type=pa.float64())}), path(name))
+
+    stand_ids = inputs.get("stand_ids") or {kind: [pipe.id for stand in inputs[kind] for pipe in stand.pipes] for kind in ("triples", "doubles")}
+    pq.write_table(pa.table({"kind": ["triple"]*len(stand_ids["triples"]) + ["double"]*len(stand_ids["doubles"]),
+                             "pipe": list(stand_ids["triples"]) + list(stand_ids["doubles"])}), path("stands"))
+
+    assemblies = inputs["assembly_tally"]
+    columns = {column: [getattr(assembly, column) for assembly in assemblies] for column in ASSEMBLY_COLUMNS}
+    columns["is_top_assembly"] = [bool(value) for value in columns["is_top_assembly"]]
+    schema = pa.schema([("id", pa.string()), ("length", pa.float64()), ("lower_lim", pa.float64()), ("upper_lim", pa.float64()),
+                        ("sep_length", pa.float64()), ("sep_ea", pa.float64()), ("critical_point", pa.float64()),
+                        ("is_top_assembly", pa.bool_()), ("order_group", pa.string())])
+    pq.write_table(pa.table(columns, schema=schema), path("assemblies"))
+
+    pq.write_table(pa.table({"depth": pa.array(inputs["casing_tally"], type=pa.float64())}), path("casing"))
+
+
+def completion_table(completion, metadata=None):
+    """Depth table of the completion (see Completion.get_depth_arrays) as an Arrow table, with the solver
+    metadata (goal, length, error, done, pipe counts and the given metadata) as JSON in the schema metadata.
+    The numeric columns are handed to Arrow without copying."""
+    require_pyarrow()
+    arrays = completion.get_depth_arrays()
+    solver = {"goal": completion.goal,
+              "length": completion.length,
+              "error": round(completion.get_length_error(), 3),
+              "done": completion.done,
+              "num_pipes": completion.num_pipes,
+              "num_assemblies": completion.num_assemblies,
+              "num_pipe_types": completion.get_number_of_pipe_types()}
+    solver.update(metadata or {})
+    return pa.table({"id": pa.array([str(id) for id in arrays["id"]], type=pa.string()),
+                     "type": pa.array(arrays["type"].tolist(), type=pa.string()),
+                     "length": pa.array(arrays["length"]),
+                     "top": pa.array(arrays["top"]),
+                     "bottom": pa.array(arrays["bottom"]),
+                     "critical_point": pa.array(arrays["critical_point"], from_pandas=True)},
+                    metadata={"tallynow": json.dumps(solver)})
+
+
+def write_completion(completion, path, metadata=None):
+    """Write the depth table and solver metadata of the completion as Parquet, see completion_table"""
+    pq.write_table(completion_table(completion, metadata), path)
+
+
+def read_completion(path):
+    """(table, solver metadata) of a file written by write_completion"""
+    require_pyarrow()
+    table = pq.read_table(path)
+    return table, json.loads(table.schema.metadata[b"tallynow"])
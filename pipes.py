@@ -1,9 +1,13 @@
+import numpy as np
+import kernels
+
 class Pipe:
     def __init__(self, id, length, pup=False):
         self.id = id
         self.length = length
         self.num_pipes = 1
         self.pup = pup # Boolean for specifying whether the pipe is a pup
+        self.mu_loss = None # Make-up loss in meters, if given in the tally
     
     def __repr__(self):
         return f"{self.id}"
@@ -51,6 +55,9 @@ class AssemblyPipe:
         self.critical_point_clear = True    # Flag describing whether the constraint is clear
         self.critical_margin = 1.5          # meters margin above and below critical point
 
+        # Assemblies next to each other with the same order group may be placed in any order, see orders.py
+        self.order_group = None
+
         # Update constraints if the AssemblyPipe is initialized with values for constraints.
         self.set_lower_limit(lower_lim)
         self.set_upper_limit(upper_lim)
@@ -250,6 +257,19 @@ class AssemblyPipe:
         cp = self.check_critical_point_clear(completion, pipe)
         return ll and ul and sl and se and cp
 
+    def check_all_clears_with_pipes(self, completion, pipes):
+        """check_all_clears_with_pipe for all the pipes at once, with the kernels in kernels.py.
+        Returns a list with a bool per pipe."""
+        if self.critical_point and completion.casing_joints == []:
+            raise RuntimeError("No casing joints in completion.")
+        clear = kernels.check_clears(np.array([pipe.length for pipe in pipes], dtype=np.float64),
+                                     np.array([pipe.num_pipes for pipe in pipes], dtype=np.int64),
+                                     completion.length, completion.length_since_prev, completion.ea_since_prev, completion.goal,
+                                     self.length, self.lower_lim, self.upper_lim, self.sep_length, self.sep_ea,
+                                     self.critical_point, self.critical_margin,
+                                     np.sort(np.asarray(completion.casing_joints, dtype=np.float64)))
+        return clear.tolist()
+
     def is_available(self):
         """Checks status of all clear flags"""
         return self.ll_clear and self.ul_clear and self.sep_length_clear and self.sep_ea_clear and self.critical_point_clear
@@ -296,6 +316,7 @@ class Stand:
 
     def __update_length(self):
         self.length = 0
+        self.num_pipes = 0
         for pipe in self.pipes:
             self.length += pipe.length
             self.num_pipes += 1 # Number of pipes is also updated when length is updated.
@@ -359,3 +380,23 @@ class Pile:
             if pipe.id == id:
                 return self.pipes.pop(i) # Remove the specific pipe.
         return None
+
+
+
+def pipe_id_key(id):
+    """Pipe IDs are read as floats from the tallies, give 232.0 as '232'"""
+    if isinstance(id, float) and id.is_integer():
+        return str(int(id))
+    return str(id)
+
+
+def new_pipe(id, length, mu_loss=None, pup=False):
+    """Pipe with its make-up loss, as stored in a snapshot, table or database"""
+    pipe = Pipe(id, length, pup)
+    pipe.mu_loss = mu_loss
+    return pipe
+
+
+def value(x):
+    """Plain Python value of a NumPy scalar, which JSON and sqlite3 can not store"""
+    return x.item() if hasattr(x, "item") else x
\ No newline at end of file
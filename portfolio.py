@@ -0,0 +1,160 @@
+import copy
+import multiprocessing
+import queue
+import random
+import time
+from bounds import Bounds
+from improve import improve_completion
+from utils import completion_score, create_deck_tally, generate_completion_tally, select_default, select_longest, select_shortest
+
+
+class RandomSelector:
+    """Like select_default, but chooses at random among the width best stands/pipes"""
+
+    def __init__(self, seed, width=3):
+        self.random = random.Random(seed)
+        self.width = width
+
+    def __call__(self, pipes, phase):
+        if phase == "clear":
+            return self.random.choice(pipes[:self.width])
+        return self.random.choice(pipes[-self.width:])
+
+
+def solve(goal, inputs, selector=select_default, warm_start=None):
+    # The solver removes stands/pipes from the deck tally and updates the flags of the assemblies
+    deck_tally = create_deck_tally(inputs["triples"], inputs["doubles"], inputs["singles"], inputs["pups"])
+    assembly_tally = [copy.copy(assembly) for assembly in inputs["assembly_tally"]]
+    return generate_completion_tally(goal, deck_tally, assembly_tally, inputs["casing_tally"], selector=selector, warm_start=warm_start)
+
+
+def is_valid(completion):
+    return completion is not None and completion.done and 0 <= completion.get_length_error() < 5
+
+
+def greedy_strategy(goal, inputs, seconds, warm_start=None):
+    return solve(goal, inputs, warm_start=warm_start)
+
+
+def longest_strategy(goal, inputs, seconds, warm_start=None):
+    return solve(goal, inputs, select_longest, warm_start)
+
+
+def shortest_strategy(goal, inputs, seconds, warm_start=None):
+    return solve(goal, inputs, select_shortest, warm_start)
+
+
+def random_strategy(goal, inputs, seconds, warm_start=None):
+    """Randomized restarts until 90% of the time is used, the best valid completion is kept"""
+    deadline = time.perf_counter() + 0.9*seconds
+    best = None
+    seed = 0
+    while time.perf_counter() < deadline:
+        try:
+            completion = solve(goal, inputs, RandomSelector(seed), warm_start)
+        except (RuntimeError, IndexError):
+            completion = None
+        if is_valid(completion) and (best is None or completion_score(completion) < completion_score(best)):
+            best = completion
+        seed += 1
+    return best
+
+
+def local_strategy(goal, inputs, seconds, warm_start=None):
+    """Greedy, then the local search of improve.py for half of the time"""
+    start = time.perf_counter()
+    completion = solve(goal, inputs, warm_start=warm_start)
+    return improve_completion(completion, time_budget=max(0.5*seconds - (time.perf_counter() - start), 0))
+
+
+# Strategies that can be run, each is called as strategy(goal, inputs, seconds, warm_start) and returns a Completion
+STRATEGIES = {"greedy": greedy_strategy,
+              "longest": longest_strategy,
+              "shortest": shortest_strategy,
+              "random": random_strategy,
+              "local": local_strategy}
+
+
+def run_strategy(name, goal, inputs, seconds, warm_start, results):
+    """Runs in a worker process, puts (name, completion, seconds, error message) on the results queue"""
+    start = time.perf_counter()
+    try:
+        completion = STRATEGIES[name](goal, inputs, seconds, warm_start)
+        results.put((name, completion, time.perf_counter() - start, None))
+    except Exception as e:
+        results.put((name, None, time.perf_counter() - start, f"{type(e).__name__}: {e}"))
+
+
+def run_portfolio(goal, inputs, strategies=None, deadline=2.0, tolerance=None, warm_start=None):
+    """Run several Step 3 strategies in parallel processes, and return the best completion found in time.
+
+    arguments:
+    - goal: well depth
+    - inputs: dict with triples, doubles, singles, pups, assembly_tally and casing_tally, see loader.load_inputs
+    - strategies: names in STRATEGIES, all by default
+    - deadline: seconds, strategies that have not finished are stopped
+    - tolerance: stop all strategies as soon as a completion is within tolerance meters of the lower
+      bound on the landing error (see bounds.py)
+    - warm_start: completion from a previous solve, passed on to every strategy (see generate_completion_tally)
+
+    returns dict with:
+    - best: name of the strategy with the best valid completion, None if there is none
+    - completion: the best valid completion
+    - results: {name: {"status": "done"/"invalid"/"failed"/"timeout"/"stopped", "completion": .., "error": .., "seconds": ..}}
+    - seconds: wall-clock time used
+    """
+    start = time.perf_counter()
+    strategies = list(strategies or STRATEGIES)
+    for name in strategies:
+        if name not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {name}, available strategies: {list(STRATEGIES)}")
+
+    bounds = None
+    if tolerance is not None:
+        deck_tally = create_deck_tally(inputs["triples"], inputs["doubles"], inputs["singles"], inputs["pups"])
+        bounds = Bounds(goal, deck_tally, inputs["assembly_tally"])
+
+    results = {name: {"status": "timeout", "completion": None, "error": None, "seconds": None} for name in strategies}
+    result_queue = multiprocessing.Queue()
+    workers = {name: multiprocessing.Process(target=run_strategy, args=(name, goal, inputs, deadline, warm_start, result_queue), daemon=True)
+               for name in strategies}
+    for worker in workers.values():
+        worker.start()
+
+    pending = set(strategies)
+    stopped_early = False
+    while pending and not stopped_early:
+        remaining = start + deadline - time.perf_counter()
+        if remaining <= 0:
+            break
+        try:
+            name, completion, seconds, message = result_queue.get(timeout=remaining)
+        except queue.Empty:
+            break
+        pending.discard(name)
+        if message is not None:
+            status = "failed"
+        elif is_valid(completion):
+            status = "done"
+        else:
+            status = "invalid"
+        results[name] = {"status": status,
+                         "completion": completion,
+                         "error": round(completion.get_length_error(), 3) if completion is not None else message,
+                         "seconds": round(seconds, 3)}
+        if status == "done" and bounds is not None and bounds.within_tolerance(completion, tolerance):
+            stopped_early = True
+
+    for name, worker in workers.items():
+        if worker.is_alive():
+            worker.terminate()
+            if stopped_early:
+                results[name]["status"] = "stopped"
+        worker.join()
+
+    valid = [name for name in strategies if results[name]["status"] == "done"]
+    best = min(valid, key=lambda name: completion_score(results[name]["completion"])) if valid else None
+    return {"best": best,
+            "completion": results[best]["completion"] if best else None,
+            "results": results,
+            "seconds": round(time.perf_counter() - start, 3)}
@@ -0,0 +1,202 @@
+import argparse
+import copy
+import os
+import time
+from loader import load_inputs, default_sources
+from utils import continue_completion_tally, create_deck_tally, generate_completion_tally, plan_completion, write_racked_tubing
+
+
+def optimize_racking(goal, triples, doubles, singles, pups, assembly_tally, casing_tally,
+                     beam_width=3, max_candidates=6, time_budget=5.0):
+    """Find the order to rack the triple and double stands in, for the least landing error.
+
+    The racks are 'first in, last out', so the solver can only choose the outermost stand of each rack.
+    The order of the racks therefore decides which stand the solver gets at each point of the string.
+    This function searches the order in which the stands should be used, and racks them so they come
+    out in that order. Stands that are not used are racked innermost.
+
+    The triple rack is searched first, then the double rack. See search_rack_order for the search.
+    Racking orders are compared by the completion main.py finds with them, solved twice with plan_completion.
+
+    arguments:
+    - goal: well depth
+    - triples, doubles: the stands to rack, as read from the racked tubing file
+    - singles, pups: the pipes on deck
+    - beam_width, max_candidates: see search_rack_order
+    - time_budget: seconds for the whole search
+
+    returns (triples, doubles, completion):
+    - triples, doubles: the stands in racking order, first racked first, as in the racked tubing file
+    - completion: the completion plan_completion finds with this racking order, None if there is none
+    """
+    deadline = time.perf_counter() + time_budget
+    for rack_index in (0, 1):
+        triples, doubles = search_rack_order(goal, triples, doubles, singles, pups, assembly_tally, casing_tally, rack_index,
+                                             beam_width, max_candidates, deadline)
+    completion = plan(goal, triples, doubles, singles, pups, assembly_tally, casing_tally)
+    return triples, doubles, completion
+
+
+def search_rack_order(goal, triples, doubles, singles, pups, assembly_tally, casing_tally, rack_index,
+                      beam_width=3, max_candidates=6, deadline=None):
+    """Beam search over the order the stands of one rack are used in.
+
+    Level k of the search decides which stand is the k-th one used from the rack. A candidate is placed
+    outermost at the point where the previous stand was taken, and the solve is continued from the
+    checkpoint there, so the part of the string below is not solved again. Stands of equal length give
+    the same solve, so only one of them is tried. Per level, the candidates are the max_candidates stands
+    closest in length to the stand used now, plus the shortest and the longest. Each order is scored by
+    the completion plan_completion finds with it, and the beam_width best orders are kept for the next level.
+
+    returns the triples and doubles, with the stands of the searched rack in the best order found, or
+    as given if no completion is found with them
+    """
+    deck_tally = create_deck_tally(triples, doubles, singles, pups)
+    start = solve(goal, deck_tally, assembly_tally, casing_tally)
+    if start is None:
+        # Nothing to search, optimize_racking reports that no completion is found
+        return triples, doubles
+
+    # Nodes are (score, completion, (triples, doubles)), the completion is the single solve that is expanded
+    beam = [evaluate(goal, start, (triples, doubles), singles, pups, assembly_tally, casing_tally)]
+    level = 0
+    while level < max(len(used_stands(completion, rack_index)) for _, completion, _ in beam):
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+        children = {}
+        for node in beam:
+            children[consumption_key(node[1], rack_index)] = node
+            for child in expand(node[1], level, rack_index, assembly_tally, max_candidates):
+                key = consumption_key(child, rack_index)
+                if key not in children:
+                    order = racking_order(child, rack_index)
+                    racks = (order, doubles) if rack_index == 0 else (triples, order)
+                    children[key] = evaluate(goal, child, racks, singles, pups, assembly_tally, casing_tally)
+        beam = sorted(children.values(), key=lambda node: node[0])[:beam_width]
+        level += 1
+
+    return beam[0][2]
+
+
+def evaluate(goal, completion, racks, singles, pups, assembly_tally, casing_tally):
+    """Beam node of a completion, scored by the completion plan_completion finds with its racking order"""
+    return (score(goal, plan(goal, *racks, singles, pups, assembly_tally, casing_tally)), completion, racks)
+
+
+def solve(goal, deck_tally, assembly_tally, casing_tally):
+    """Solve with checkpoints, None if no completion is found"""
+    try:
+        completion = generate_completion_tally(goal, deck_tally, copy_assemblies(assembly_tally), casing_tally, checkpoints=True)
+    except (RuntimeError, IndexError): # IndexError: the deck runs out of stands and pipes
+        return None
+    return completion
+
+
+def plan(goal, triples, doubles, singles, pups, assembly_tally, casing_tally):
+    """Solve as main.py does, None if no completion is found"""
+    try:
+        return plan_completion(goal, triples, doubles, singles, pups, copy_assemblies(assembly_tally), casing_tally)
+    except (RuntimeError, IndexError):
+        return None
+
+
+def score(goal, completion):
+    """Lower is better: finished completions first, then by landing error against the goal and number of pups.
+    The goal is given since the second solve of plan_completion has the reached length as its goal."""
+    if completion is None:
+        return (True, float("inf"), float("inf"))
+    return (not completion.done, round(abs(goal - completion.length), 3), completion.num_pipe_types["pups"])
+
+
+def copy_assemblies(assembly_tally):
+    # The solver updates the constraint flags of the assemblies, every solve gets its own copies.
+    return [copy.copy(assembly) for assembly in assembly_tally]
+
+
+def used_stands(completion, rack_index):
+    """Stands of the rack in the order they are used in the completion"""
+    rack_stands = {id(stand) for stand in completion.checkpoints[0]["deck"][rack_index][2]}
+    return [element for element in completion.solution if id(element) in rack_stands]
+
+
+def consumption_key(completion, rack_index):
+    """Orders that use stands of the same lengths give the same completion"""
+    return tuple(stand.length for stand in used_stands(completion, rack_index))
+
+
+def expand(completion, level, rack_index, assembly_tally, max_candidates):
+    """Completions where another stand is the level-th one used from the rack"""
+    # The first checkpoint where level stands have been taken from the rack
+    num_stands = len(completion.checkpoints[0]["deck"][rack_index][2])
+    position = None
+    for i, checkpoint in enumerate(completion.checkpoints):
+        if len(checkpoint["deck"][rack_index][2]) == num_stands - level:
+            position = i
+            break
+    if position is None:
+        return []
+
+    stands = list(completion.checkpoints[position]["deck"][rack_index][2])
+    current = stands[-1]
+    distinct = {}
+    for stand in stands:
+        distinct.setdefault(stand.length, stand)
+    del distinct[current.length]
+    candidates = sorted(distinct.values(), key=lambda stand: abs(stand.length - current.length))[:max_candidates]
+    if distinct:
+        candidates += [min(distinct.values()), max(distinct.values())]
+
+    children = []
+    for candidate in dict.fromkeys(candidates):
+        new_completion, new_deck_tally, assembly_index, iteration = completion.from_checkpoint(position)
+        new_deck_tally[rack_index].stands = [stand for stand in stands if stand is not candidate] + [candidate]
+        try:
+            child = continue_completion_tally(new_completion, new_deck_tally, copy_assemblies(assembly_tally),
+                                              assembly_index, iteration, checkpoints=True)
+        except (RuntimeError, IndexError):
+            continue
+        children.append(child)
+    return children
+
+
+def racking_order(completion, rack_index):
+    """Racking order (first racked first) that makes the rack give its stands in the order they are used.
+    The stands that are not used are racked innermost, in the order they are left in the rack, since the
+    outermost of them is still seen by the solver."""
+    used = used_stands(completion, rack_index)
+    if completion.leftover_tally is not None:
+        unused = list(completion.leftover_tally[rack_index].stands)
+    else:
+        used_ids = {id(stand) for stand in used}
+        unused = [stand for stand in completion.checkpoints[0]["deck"][rack_index][2] if id(stand) not in used_ids]
+    return unused + list(reversed(used))
+
+
+if __name__ == "__main__":
+    """
+    Usage:
+        python racking.py --depth 2247 --output data/racked_tubing_optimized.csv
+    The output has the layout and row range of data/racked_tubing.csv, and can replace it as input to main.py.
+    """
+    parser = argparse.ArgumentParser(description='TallyNow - Racking order optimizer')
+    parser.add_argument('--depth', type=float, default=2247, help='Well depth in meters (default: 2247)')
+    parser.add_argument('--output', default=None, help='Racked tubing file to write (default: data/racked_tubing_optimized.csv)')
+    parser.add_argument('--time-budget', type=float, default=5.0, help='Seconds for the search (default: 5)')
+    args = parser.parse_args()
+
+    PATH = os.path.dirname(os.path.abspath(__file__)) + "/"
+    sources = default_sources(PATH+"data/")
+    inputs, _ = load_inputs(sources)
+    initial = plan(args.depth, inputs["triples"], inputs["doubles"], inputs["singles"], inputs["pups"], inputs["assembly_tally"], inputs["casing_tally"])
+    triples, doubles, completion = optimize_racking(args.depth, inputs["triples"], inputs["doubles"], inputs["singles"], inputs["pups"],
+                                                    inputs["assembly_tally"], inputs["casing_tally"], time_budget=args.time_budget)
+
+    error = lambda completion: "no completion found" if completion is None else round(args.depth - completion.length, 3)
+    print(f"{'Error before':.<20}: {error(initial)}")
+    print(f"{'Error after':.<20}: {error(completion)}")
+    if completion is None:
+        print("No completion can be found with the optimized racking order, nothing is written.")
+    else:
+        output = args.output or PATH+"data/racked_tubing_optimized.csv"
+        write_racked_tubing(output, triples, doubles, start_row=sources["triples"][2], end_row=max(sources["triples"][3], sources["doubles"][3]))
+        print(f"{'Racking order':.<20}: {output}")
@@ -0,0 +1,150 @@
+import copy
+import time
+from completion import Completion
+from pipes import AssemblyPipe, Rack
+from utils import continue_completion_tally, copy_deck_tally
+
+
+class RunningTally:
+    """Live tally while the completion is being run.
+
+    The as-run completion is built from events reported from the drill floor, bottom->top:
+    - run: a stand/pipe/pup/assembly is run, optionally with its measured length
+    - laid_out: a stand/pipe/pup is rejected and will not be used
+    - measured: the measured length of a stand/pipe/pup differs from the tally
+    After each event the remaining string is planned again from the as-run state and the deck
+    tally that is left, and the projected landing error and assembly depths are reported.
+
+    latency_budget is the time in seconds an update should take. It is not enforced: the time of each update
+    is measured and reported as elapsed_ms, with within_budget telling whether it stayed within the budget.
+    """
+
+    def __init__(self, goal, deck_tally, assembly_tally, casing_tally, latency_budget=0.05):
+        self.goal = goal
+        self.deck_tally = deck_tally            # Stands and pipes not yet run or laid out
+        self.assembly_tally = [copy.copy(assembly) for assembly in assembly_tally]  # Replans update the clear flags
+        self.assembly_index = 0                 # Index of the next assembly to run
+        self.latency_budget = latency_budget    # Seconds an update should take, reported only
+        self.as_run = Completion(goal)
+        self.as_run.add_casing_joints(casing_tally)
+        self.plan = None                        # Projected completion, as_run + remaining string
+        self.replan()
+
+    def __repr__(self):
+        return f"RunningTally goal: {self.goal}, run: {len(self.as_run.solution)}"
+
+    def handle_event(self, event):
+        """Handle one event, e.g. {"type": "run", "id": 12, "length": 35.1}, and return the report."""
+        start = time.perf_counter()
+        if event["type"] == "run":
+            self.joint_run(event["id"], event.get("length"))
+        elif event["type"] == "laid_out":
+            self.joint_laid_out(event["id"])
+        elif event["type"] == "measured":
+            self.length_measured(event["id"], event["length"])
+        else:
+            raise ValueError(f"Unknown event type {event['type']}")
+        report = self.replan()
+        report["event"] = event
+        report["elapsed_ms"] = round((time.perf_counter() - start)*1000, 3)
+        report["within_budget"] = report["elapsed_ms"] <= self.latency_budget*1000
+        return report
+
+    def handle_events(self, events):
+        """Handle a stream of events, yields one report per event"""
+        for event in events:
+            yield self.handle_event(event)
+
+    def joint_run(self, id, length=None):
+        """Add a stand/pipe/pup/assembly to the as-run completion"""
+        if self.as_run.done:
+            raise RuntimeError("The completion is already landed.")
+
+        if self.assembly_index < len(self.assembly_tally) and self.assembly_tally[self.assembly_index].id == id:
+            assembly = self.assembly_tally[self.assembly_index]
+            if length is not None:
+                assembly = with_length(assembly, length)
+            self.as_run.add_assembly_pipe(assembly)
+            self.assembly_index += 1
+            if assembly.is_top_assembly:
+                self.as_run.done = True
+                self.as_run.add_leftover_tally(self.deck_tally)
+            return
+
+        element = self.__take(id)
+        if length is not None:
+            element = with_length(element, length)
+        self.as_run.add_normal_pipe(element)
+
+    def joint_laid_out(self, id):
+        """Remove a rejected stand/pipe/pup from the deck tally"""
+        self.__take(id)
+
+    def length_measured(self, id, length):
+        """Update the length of a stand/pipe/pup that is still on deck"""
+        tally, index = self.__find(id)
+        if type(tally) == Rack:
+            tally.stands[index] = with_length(tally.stands[index], length)
+        else:
+            tally.pipes[index] = with_length(tally.pipes[index], length)
+
+    def __find(self, id):
+        """Find a stand/pipe/pup on deck. The next element of the plan is preferred, as IDs of stands and pipes can overlap."""
+        planned = self.next_planned()
+        for tally in self.deck_tally:
+            items = tally.stands if type(tally) == Rack else tally.pipes
+            for i, item in enumerate(items):
+                if item is planned and item.id == id:
+                    return tally, i
+        for tally in self.deck_tally:
+            items = tally.stands if type(tally) == Rack else tally.pipes
+            for i, item in enumerate(items):
+                if item.id == id:
+                    return tally, i
+        raise ValueError(f"{id} is not on deck")
+
+    def __take(self, id):
+        tally, index = self.__find(id)
+        if type(tally) == Rack:
+            return tally.stands.pop(index)
+        return tally.pipes.pop(index)
+
+    def next_planned(self):
+        """Next stand/pipe/assembly to run according to the current plan"""
+        position = len(self.as_run.solution)
+        if self.plan is None or position >= len(self.plan.solution):
+            return None
+        return self.plan.solution[position]
+
+    def replan(self):
+        """Plan the rest of the string from the as-run state. Returns the report."""
+        if self.as_run.done:
+            self.plan = self.as_run
+        else:
+            try:
+                self.plan = continue_completion_tally(self.as_run.copy(), copy_deck_tally(self.deck_tally), self.assembly_tally,
+                                                      self.assembly_index, iteration=len(self.as_run.solution))
+            except (RuntimeError, IndexError): # IndexError: the deck runs out of stands and pipes
+                self.plan = None
+
+        report = {"run": len(self.as_run.solution),
+                  "run_length": self.as_run.length,
+                  "landed": self.as_run.done}
+        if self.plan is None or not self.plan.done:
+            report.update({"plan_found": False, "projected_error": None, "assembly_depths": {}, "remaining": []})
+            return report
+
+        depths = self.plan.get_solution_depths()
+        report.update({"plan_found": True,
+                       "projected_length": self.plan.length,
+                       "projected_error": round(self.goal - self.plan.length, 3),
+                       "assembly_depths": {assembly.id: depths[assembly.id] for assembly in self.plan.solution if type(assembly) == AssemblyPipe},
+                       "remaining": [element.id for element in self.plan.solution[len(self.as_run.solution):]]})
+        return report
+
+
+def with_length(element, length):
+    """Copy of a stand/pipe/assembly with a measured length. The original may be part of other tallies."""
+    new_element = copy.copy(element)
+    new_element.length = round(length, 3)
+    return new_element
@@ -0,0 +1,193 @@
+import argparse
+import asyncio
+import copy
+import json
+from functools import partial
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from loader import load_inputs, default_sources
+from orders import generate_completion_tally_any_order
+from validation import check_inputs
+from utils import generate_completion_tally, plan_completion, select_longest, select_shortest
+
+# Solver modes that can be requested
+SOLVER_MODES = {"greedy": generate_completion_tally,
+                "longest": partial(generate_completion_tally, selector=select_longest),
+                "shortest": partial(generate_completion_tally, selector=select_shortest),
+                "any_order": generate_completion_tally_any_order}
+
+# Inputs loaded once per worker, see init_worker
+_inputs = None
+_invalid = None     # Report of validation.check_inputs if the inputs are broken
+
+
+def init_worker(sources, use_cache=True):
+    """Load, parse and validate all inputs once. Runs in every worker process, or once for a thread pool."""
+    global _inputs, _invalid
+    _inputs, _ = load_inputs(sources, use_cache=use_cache)
+    try:
+        check_inputs(_inputs)
+        _invalid = None
+    except ValueError as e:
+        _invalid = str(e)
+
+
+def solve_request(request):
+    """Solve one plan request against the inputs loaded by init_worker.
+
+    request (dict):
+    - depth: well depth in meters
+    - mode: solver mode, see SOLVER_MODES (default "greedy")
+    - overrides (optional):
+        - exclude_stands: IDs of triple/double stands that must not be used
+        - exclude_pipes: IDs of tubing joints and pups that must not be used. Stands holding an excluded
+          joint are not used either.
+        - assemblies: {assembly id: {"lower_lim": .., "upper_lim": .., "sep_length": .., "sep_ea": .., "critical_point": ..}}
+        - casing_tally: casing connection depths to use instead of the loaded ones
+    """
+    if _invalid:
+        raise ValueError(_invalid)
+    start = time.perf_counter()
+    depth = float(request["depth"])
+    mode = request.get("mode", "greedy")
+    if mode not in SOLVER_MODES:
+        raise ValueError(f"Unknown solver mode {mode}, available modes: {list(SOLVER_MODES)}")
+    overrides = request.get("overrides", {})
+
+    # The solver updates the constraint flags of the assemblies, every request gets its own copies.
+    assembly_tally = [copy.copy(assembly) for assembly in _inputs["assembly_tally"]]
+    for assembly in assembly_tally:
+        for name, value in overrides.get("assemblies", {}).get(str(assembly.id), {}).items():
+            setter = {"lower_lim": assembly.set_lower_limit,
+                      "upper_lim": assembly.set_upper_limit,
+                      "sep_length": assembly.set_sep_length,
+                      "sep_ea": assembly.set_sep_ea,
+                      "critical_point": assembly.set_critical_point}[name]
+            setter(value)
+    casing_tally = overrides.get("casing_tally", _inputs["casing_tally"])
+
+    # Stand IDs are numbered per rack (1, 2, .. and Dbl1, ..) and overlap the pipe IDs, so the two are excluded separately
+    excluded_stands = set(overrides.get("exclude_stands", []))
+    excluded_pipes = set(overrides.get("exclude_pipes", []))
+    usable = lambda stand: stand.id not in excluded_stands and not any(pipe.id in excluded_pipes for pipe in stand.pipes)
+    triples = [stand for stand in _inputs["triples"] if usable(stand)]
+    doubles = [stand for stand in _inputs["doubles"] if usable(stand)]
+    singles = [pipe for pipe in _inputs["singles"] if pipe.id not in excluded_pipes]
+    pups = [pipe for pipe in _inputs["pups"] if pipe.id not in excluded_pipes]
+
+    completion = plan_completion(depth, triples, doubles, singles, pups, assembly_tally, casing_tally, solver=SOLVER_MODES[mode])
+    return completion_to_dict(completion, depth, time.perf_counter() - start)
+
+
+def completion_to_dict(completion, well_depth, seconds):
+    depths = completion.get_solution_depths()
+    return {"ok": True,
+            "goal": well_depth,
+            "length": completion.length,
+            "error": round(well_depth - completion.length, 3),
+            "done": completion.done,
+            "num_pipe_types": completion.get_number_of_pipe_types(),
+            "solution": [element.id for element in completion.solution],
+            "depths": [[key] + value for key, value in depths.items()],
+            "solve_ms": round(seconds*1000, 3)}
+
+
+class PlanningServer:
+    """Long-running planning service with a JSON API over TCP (localhost) or a Unix socket.
+
+    The protocol is one JSON request per line, answered by one JSON reply per line. Parsed inputs are kept
+    in memory by the workers, so a request only costs the solve. Requests from different connections are
+    solved concurrently in the worker pool."""
+
+    def __init__(self, sources, workers=None, use_cache=True, use_processes=True):
+        self.sources = sources
+        if use_processes:
+            self.executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(sources, use_cache))
+        else:
+            init_worker(sources, use_cache)
+            self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.server = None
+
+    def __repr__(self):
+        return f"PlanningServer: {self.server.sockets[0].getsockname() if self.server else None}"
+
+    async def start(self, host="127.0.0.1", port=8765, path=None):
+        """Start listening on host:port, or on the Unix socket at path if given."""
+        if path:
+            self.server = await asyncio.start_unix_server(self.handle_client, path=path)
+        else:
+            self.server = await asyncio.start_server(self.handle_client, host=host, port=port)
+        return self.server
+
+    async def handle_client(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                reply = await self.handle_request(line)
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def handle_request(self, line):
+        request = None
+        try:
+            request = json.loads(line)
+            loop = asyncio.get_running_loop()
+            reply = await loop.run_in_executor(self.executor, solve_request, request)
+        except Exception as e:
+            reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        if isinstance(request, dict) and "request_id" in request:
+            reply["request_id"] = request["request_id"]
+        return reply
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown()
+
+
+async def request_plan(request, host="127.0.0.1", port=8765, path=None):
+    """Send one plan request to a running PlanningServer and return the reply"""
+    if path:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    writer.write(json.dumps(request).encode() + b"\n")
+    await writer.drain()
+    reply = json.loads(await reader.readline())
+    writer.close()
+    await writer.wait_closed()
+    return reply
+
+
+async def serve(args):
+    PATH = os.path.dirname(os.path.abspath(__file__)) + "/"
+    server = PlanningServer(default_sources(PATH+"data/"), workers=args.workers, use_cache=args.use_cache)
+    await server.start(host=args.host, port=args.port, path=args.socket)
+    print(f"TallyNow planning server listening on {args.socket or f'{args.host}:{args.port}'}")
+    try:
+        await server.server.serve_forever()
+    finally:
+        await server.close()
+
+
+if __name__ == "__main__":
+    """
+    Usage:
+        python server.py                            # Listen on 127.0.0.1:8765
+        python server.py --socket /tmp/tallynow.sock
+    Request (one JSON object per line):
+        {"depth": 2247, "mode": "greedy", "overrides": {"exclude_pipes": [232]}}
+    """
+    parser = argparse.ArgumentParser(description='TallyNow - Planning server')
+    parser.add_argument('--host', default='127.0.0.1', help='Host to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default: 8765)')
+    parser.add_argument('--socket', default=None, help='Listen on this Unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, default=None, help='Number of solver processes')
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false',
+                        help='Re-parse all input files instead of using the binary input cache')
+    asyncio.run(serve(parser.parse_args()))
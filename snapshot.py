@@ -0,0 +1,96 @@
+import json
+from pipes import Stand, Rack, Pile, new_pipe, value
+
+
+class DeckSnapshot:
+    """Immutable snapshot of a deck tally, e.g. the leftover tally of a completion (see
+    Completion.leftover_snapshot), used as the deck of the next well.
+
+    Stands and pipes are kept as nested tuples of plain values, so the snapshot is cheap to keep, can be
+    hashed and compared, and is never changed by the solver. The solver gets new racks and piles built from it
+    (see deck_tally), generate_completion_tally does this when it is given a snapshot.
+
+    - stand: (id, (pipe, pipe, ..))
+    - pipe: (id, length, mu_loss, pup)
+    """
+
+    def __init__(self, tallies):
+        """tallies: ((kind, type, items), ...), kind "rack" with stands or "pile" with pipes, in deck tally order"""
+        object.__setattr__(self, "tallies", tuple((kind, type, tuple(items)) for kind, type, items in tallies))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("DeckSnapshot is immutable.")
+
+    def __repr__(self):
+        return f"DeckSnapshot: {self.counts()}"
+
+    def __eq__(self, other):
+        return type(other) == DeckSnapshot and self.tallies == other.tallies
+
+    def __hash__(self):
+        return hash(self.tallies)
+
+    @classmethod
+    def from_deck_tally(cls, deck_tally):
+        tallies = []
+        for tally in deck_tally:
+            if type(tally) == Rack:
+                tallies.append(("rack", tally.type, [(value(stand.id), tuple(pipe_record(pipe) for pipe in stand.pipes)) for stand in tally.stands]))
+            else:
+                tallies.append(("pile", tally.type, [pipe_record(pipe) for pipe in tally.pipes]))
+        return cls(tallies)
+
+    def deck_tally(self):
+        """New racks and piles of new stands and pipes, for the solver to use up"""
+        deck_tally = []
+        for kind, type, items in self.tallies:
+            if kind == "rack":
+                tally = Rack(type)
+                tally.add_stands([Stand(id, [new_pipe(*pipe) for pipe in pipes]) for id, pipes in items])
+            else:
+                tally = Pile(type)
+                tally.add_pipes([new_pipe(*pipe) for pipe in items])
+            deck_tally.append(tally)
+        return deck_tally
+
+    def inputs(self):
+        """Triples, doubles, singles and pups as in loader.load_inputs, deck_tally with all tubing joints and stand_ids"""
+        triples, doubles, singles, pups = (tally.get_available() if type(tally) == Pile else tally.stands for tally in self.deck_tally())
+        return {"triples": triples,
+                "doubles": doubles,
+                "singles": singles,
+                "pups": pups,
+                "deck_tally": [pipe for stand in triples + doubles for pipe in stand.pipes] + singles,
+                "stand_ids": {"triples": [pipe.id for stand in triples for pipe in stand.pipes],
+                              "doubles": [pipe.id for stand in doubles for pipe in stand.pipes]}}
+
+    def counts(self):
+        """{tally type: number of stands/pipes}"""
+        return {type: len(items) for kind, type, items in self.tallies}
+
+    def to_dict(self):
+        return {"tallies": [{"kind": kind, "type": type, "items": items} for kind, type, items in self.tallies]}
+
+    @classmethod
+    def from_dict(cls, data):
+        tallies = []
+        for tally in data["tallies"]:
+            if tally["kind"] == "rack":
+                items = [(id, tuple(tuple(pipe) for pipe in pipes)) for id, pipes in tally["items"]]
+            else:
+                items = [tuple(pipe) for pipe in tally["items"]]
+            tallies.append((tally["kind"], tally["type"], items))
+        return cls(tallies)
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def pipe_record(pipe):
+    return (value(pipe.id), float(pipe.length), pipe.mu_loss if pipe.mu_loss is None else float(pipe.mu_loss), bool(pipe.pup))
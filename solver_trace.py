@@ -0,0 +1,148 @@
+import copy
+import numpy as np
+from completion import Completion, element_type
+from utils import continue_completion_tally, copy_deck_tally, select_default
+
+PHASES = ["assembly", "clear", "fill", "top"]
+CONSTRAINTS = ["ll", "ul", "sep_length", "sep_ea", "critical_point"]    # Bits of the failed mask
+
+
+class SolverTrace:
+    """Ring buffer of the decisions of the solver, see generate_completion_tally(..., trace=SolverTrace()).
+
+    One record per decision: an assembly placed, or a stand/pipe chosen by the selector in the
+    "clear", "fill" or "top" phase (see select_default). The records are kept in preallocated NumPy
+    arrays, so tracing costs a few array writes per decision. When the buffer is full the oldest records
+    are overwritten. Chosen stands/pipes are stored as codes into a table of (kind, id).
+
+    Fields of a record:
+    - iteration: solver iteration
+    - assembly: index of the active assembly in the assembly tally
+    - phase: one of PHASES
+    - candidates: stands/pipes available, cleared: those that let the assembly be placed (or fit below
+      the goal in the "top" phase)
+    - failed: constraints of the active assembly not clear before the decision, bits as in CONSTRAINTS
+    - chosen: the assembly placed or the stand/pipe chosen, placed: False if it passed the goal and the
+      solve ended instead
+    - length: length of the completion after the decision
+    """
+
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.iteration = np.zeros(capacity, dtype=np.int32)
+        self.assembly = np.zeros(capacity, dtype=np.int16)
+        self.phase = np.zeros(capacity, dtype=np.uint8)
+        self.candidates = np.zeros(capacity, dtype=np.int32)
+        self.cleared = np.zeros(capacity, dtype=np.int32)
+        self.failed = np.zeros(capacity, dtype=np.uint8)
+        self.chosen = np.zeros(capacity, dtype=np.int32)
+        self.placed = np.zeros(capacity, dtype=np.bool_)
+        self.length = np.zeros(capacity, dtype=np.float64)
+        self.count = 0      # Records made, including overwritten ones
+        self.items = []     # (kind, id) per code
+        self.codes = {}
+
+    def __repr__(self):
+        return f"SolverTrace records: {len(self)}, dropped: {self.dropped}"
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    @property
+    def dropped(self):
+        """Records overwritten when the buffer was full"""
+        return max(self.count - self.capacity, 0)
+
+    def record(self, iteration, assembly_index, phase, assembly, candidates, cleared, chosen, length, placed=True):
+        i = self.count % self.capacity
+        self.iteration[i] = iteration
+        self.assembly[i] = assembly_index
+        self.phase[i] = PHASES.index(phase)
+        self.candidates[i] = candidates
+        self.cleared[i] = cleared
+        self.failed[i] = ((not assembly.ll_clear) | (not assembly.ul_clear) << 1 | (not assembly.sep_length_clear) << 2
+                          | (not assembly.sep_ea_clear) << 3 | (not assembly.critical_point_clear) << 4)
+        key = (element_type(chosen), chosen.id)
+        code = self.codes.get(key)
+        if code is None:
+            code = self.codes[key] = len(self.items)
+            self.items.append(key)
+        self.chosen[i] = code
+        self.placed[i] = placed
+        self.length[i] = length
+        self.count += 1
+
+    def order(self):
+        """Buffer indexes of the records, oldest first"""
+        if self.count <= self.capacity:
+            return np.arange(self.count)
+        return (np.arange(self.capacity) + self.count) % self.capacity
+
+    def records(self):
+        """The records, oldest first, as dicts"""
+        records = []
+        for i in self.order():
+            records.append({"iteration": int(self.iteration[i]),
+                            "assembly": int(self.assembly[i]),
+                            "phase": PHASES[self.phase[i]],
+                            "candidates": int(self.candidates[i]),
+                            "cleared": int(self.cleared[i]),
+                            "failed": [name for bit, name in enumerate(CONSTRAINTS) if self.failed[i] >> bit & 1],
+                            "chosen": self.items[self.chosen[i]],
+                            "placed": bool(self.placed[i]),
+                            "length": float(self.length[i])})
+        return records
+
+    def choices(self):
+        """(kind, id) chosen by the selector, in order"""
+        return [self.items[self.chosen[i]] for i in self.order() if self.phase[i] != 0]
+
+
+class ReplaySelector:
+    """Makes the recorded choices for the first steps selector calls, then leaves the choice to selector"""
+
+    def __init__(self, choices, steps, selector=select_default):
+        self.choices = choices[:steps]
+        self.selector = selector
+        self.calls = 0
+
+    def __call__(self, pipes, phase):
+        self.calls += 1
+        if self.calls > len(self.choices):
+            return self.selector(pipes, phase)
+        kind, id = self.choices[self.calls-1]
+        for pipe in pipes:
+            if pipe.id == id and element_type(pipe) == kind:
+                return pipe
+        raise RuntimeError(f"Replay diverged at choice {self.calls}: {kind} {id} is not among the candidates.")
+
+
+def replay(trace, goal, deck_tally, assembly_tally, casing_tally, steps=None, selector=select_default):
+    """Re-run a traced solve with the same inputs. The first steps choices of the selector (all by default) are
+    taken from the trace, the rest are left to selector, so a change of selector or solver can be compared with
+    the traced solve from any step on (see diff). deck_tally and assembly_tally are not changed.
+
+    returns (completion, trace of the new solve)
+    """
+    if trace.dropped:
+        raise ValueError(f"The trace has dropped {trace.dropped} records, only a complete trace can be replayed.")
+    choices = trace.choices()
+    completion = Completion(goal)
+    completion.add_casing_joints(casing_tally)
+    new_trace = SolverTrace(trace.capacity)
+    # The solver updates the constraint flags of the assemblies
+    assemblies = [copy.copy(assembly) for assembly in assembly_tally]
+    steps = len(choices) if steps is None else steps
+    continue_completion_tally(completion, copy_deck_tally(deck_tally), assemblies, selector=ReplaySelector(choices, steps, selector), trace=new_trace)
+    return completion, new_trace
+
+
+def diff(trace, other):
+    """Index of the first record where the traces differ and the two records, None if they are the same"""
+    records, other_records = trace.records(), other.records()
+    for i in range(max(len(records), len(other_records))):
+        record = records[i] if i < len(records) else None
+        other_record = other_records[i] if i < len(other_records) else None
+        if record != other_record:
+            return {"index": i, "trace": record, "other": other_record}
+    return None
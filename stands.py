@@ -0,0 +1,169 @@
+import argparse
+import os
+from loader import load_inputs, default_sources
+from pipes import AssemblyPipe, Stand
+from utils import get_num_stands_required, write_racked_tubing
+
+
+def build_stands(tally, num_triples, num_doubles, max_sweeps=50, windows=None):
+    """Choose which tubing joints to make up into triple and double stands.
+
+    Step 2 plans the string with joints of average length, and gives the length of each run of joints
+    between two assemblies (see stand_windows). The closer the stands of a run come to that length, the
+    closer the assemblies land to where Step 2 planned them. The joints are partitioned toward these
+    lengths:
+    1. The joints closest to the median length are used in stands, or with windows the joints next in length
+       that add up closest to the length of all runs. The shortest and longest are kept as singles, as they
+       are the most useful for adjusting the length at the top of the string.
+    2. The joints are split over the runs: longest first, each into the run furthest below its length,
+       then swapped between runs while that lowers the sum of squared deviations from the run lengths.
+    3. The joints of each run are split over its stands in the same way, toward stands of equal length.
+    The swaps make at most max_sweeps passes over all pairs of runs or stands. Without windows all stands
+    are one run, and the stand lengths are only evened out.
+
+    arguments:
+    - tally: tubing joints (Pipe)
+    - num_triples, num_doubles: stands to make up, e.g. from Step 2
+    - max_sweeps: maximum number of passes of the swap search
+    - windows: [(triples, doubles, length), ...] of the runs from the bottom up, see stand_windows
+
+    returns (triples, doubles, singles):
+    - triples, doubles: Stands numbered as when read from the racked tubing file. The stands of the
+      lowest run are racked outermost, as they are run first.
+    - singles: the joints that are not used in stands
+    """
+    num_joints = 3*num_triples + 2*num_doubles
+    if num_joints > len(tally):
+        raise ValueError(f"{num_triples} triples and {num_doubles} doubles need {num_joints} joints, the tally has {len(tally)}")
+
+    if windows is not None and (sum(window[0] for window in windows), sum(window[1] for window in windows)) != (num_triples, num_doubles):
+        raise ValueError(f"The windows hold {sum(window[0] for window in windows)} triples and {sum(window[1] for window in windows)} doubles, "
+                         f"not {num_triples} and {num_doubles}")
+
+    # 1. Joints closest to the median length, or the run of joints by length closest to the length of the windows
+    joints = sorted(tally, key=lambda pipe: pipe.length)
+    first = (len(joints) - num_joints)//2
+    if windows is not None:
+        target = sum(length for _, _, length in windows)
+        sums = [sum(pipe.length for pipe in joints[:num_joints])]
+        for i in range(len(joints) - num_joints):
+            sums.append(sums[-1] - joints[i].length + joints[i+num_joints].length)
+        first = min(range(len(sums)), key=lambda i: (abs(sums[i] - target), abs(i - first)))
+    selected = joints[first:first+num_joints]
+    singles = joints[:first] + joints[first+num_joints:]
+    if windows is None:
+        windows = [(num_triples, num_doubles, sum(pipe.length for pipe in selected))]
+
+    # 2. Joints over the runs
+    runs = partition(selected, [3*triples + 2*doubles for triples, doubles, _ in windows],
+                     [length for _, _, length in windows], max_sweeps)
+
+    # 3. Joints of each run over its stands
+    triples, doubles = [], []
+    for (num_run_triples, num_run_doubles, _), run in zip(windows, runs):
+        if not run:
+            continue
+        sizes = [3]*num_run_triples + [2]*num_run_doubles
+        average_length = sum(pipe.length for pipe in run)/len(run)
+        groups = partition(sorted(run, key=lambda pipe: pipe.length), sizes, [size*average_length for size in sizes], max_sweeps)
+        triples.append(groups[:num_run_triples])
+        doubles.append(groups[num_run_triples:])
+
+    # The racks are 'first in, last out', so the lowest run is racked last
+    triples = [group for run in reversed(triples) for group in run]
+    doubles = [group for run in reversed(doubles) for group in run]
+    triples = [Stand(i+1, group) for i, group in enumerate(triples)]
+    doubles = [Stand("Dbl"+str(i+1), group) for i, group in enumerate(doubles)]
+    return triples, doubles, singles
+
+
+def partition(joints, sizes, targets, max_sweeps):
+    """Split joints (sorted by length) into groups of the given sizes, with sums close to the targets:
+    longest joint first into the open group furthest below its target, then swaps (see swap_pass)"""
+    groups = [[] for _ in sizes]
+    sums = [0]*len(groups)
+    for pipe in reversed(joints):
+        open_groups = [i for i in range(len(groups)) if len(groups[i]) < sizes[i]]
+        i = max(open_groups, key=lambda i: targets[i] - sums[i])
+        groups[i].append(pipe)
+        sums[i] += pipe.length
+    for _ in range(max_sweeps):
+        if not swap_pass(groups, sums, targets):
+            break
+    return groups
+
+
+def stand_windows(completion):
+    """(triples, doubles, length) of each run of joints between assemblies in a Step 2 completion (see
+    get_num_stands_required), from the bottom up. The runs are split into stands as update_pipe_numbers
+    counts them, and length is the part of the run the stands make up, the rest is left to singles."""
+    windows, run = [], []
+    for element in completion.solution + [None]:
+        if element is not None and type(element) != AssemblyPipe:
+            run.append(element)
+            continue
+        if run:
+            triples, doubles = len(run)//3, len(run) % 3//2
+            if triples or doubles:
+                windows.append((triples, doubles, sum(pipe.length for pipe in run)*(3*triples + 2*doubles)/len(run)))
+        run = []
+    return windows
+
+
+def swap_pass(groups, sums, targets):
+    """One pass over all pairs of stands, making every swap of two joints that lowers the squared deviation.
+    Returns True if any swap was made."""
+    improved = False
+    for a in range(len(groups)):
+        for b in range(a+1, len(groups)):
+            deviation_a = sums[a] - targets[a]
+            deviation_b = sums[b] - targets[b]
+            current = deviation_a**2 + deviation_b**2
+            best = None
+            for i, pipe_a in enumerate(groups[a]):
+                for j, pipe_b in enumerate(groups[b]):
+                    delta = pipe_b.length - pipe_a.length
+                    new = (deviation_a + delta)**2 + (deviation_b - delta)**2
+                    if new < current - 1e-9:
+                        current = new
+                        best = (i, j, delta)
+            if best is not None:
+                i, j, delta = best
+                groups[a][i], groups[b][j] = groups[b][j], groups[a][i]
+                sums[a] += delta
+                sums[b] -= delta
+                improved = True
+    return improved
+
+
+if __name__ == "__main__":
+    """
+    Usage:
+        python stands.py --depth 2247 --output data/racked_tubing_built.csv
+    The stand counts are found as in Step 2 of main.py. The output has the layout and row range of
+    data/racked_tubing.csv, see utils.write_racked_tubing.
+    """
+    parser = argparse.ArgumentParser(description='TallyNow - Stand building optimizer')
+    parser.add_argument('--depth', type=float, default=2247, help='Well depth in meters (default: 2247)')
+    parser.add_argument('--output', default=None, help='Racked tubing file to write (default: data/racked_tubing_built.csv)')
+    args = parser.parse_args()
+
+    PATH = os.path.dirname(os.path.abspath(__file__)) + "/"
+    sources = default_sources(PATH+"data/")
+    inputs, _ = load_inputs(sources)
+
+    # Step 2, as in main.py
+    intermediate_completion = get_num_stands_required(args.depth, inputs["deck_tally"], inputs["assembly_tally"], inputs["casing_tally"])
+    completion_length = args.depth - intermediate_completion.get_length_error()
+    step_2_completion = get_num_stands_required(completion_length, inputs["deck_tally"], inputs["assembly_tally"], inputs["casing_tally"])
+    counts = step_2_completion.get_number_of_pipe_types()
+
+    triples, doubles, singles = build_stands(inputs["deck_tally"], counts["triples"], counts["doubles"], windows=stand_windows(step_2_completion))
+    num_rows = max(3*len(triples), 2*len(doubles))
+    output = args.output or PATH+"data/racked_tubing_built.csv"
+    write_racked_tubing(output, triples, doubles, start_row=sources["triples"][2],
+                        end_row=max(sources["triples"][3], sources["doubles"][3], sources["triples"][2] + num_rows - 1))
+    print(f"{'Required stands':.<20}: {counts}")
+    print(f"{'Stands':.<20}: {output}")
+    print(f"{'Triple rows':.<20}: {sources['triples'][2]}-{sources['triples'][2] + 3*len(triples) - 1}")
+    print(f"{'Double rows':.<20}: {sources['doubles'][2]}-{sources['doubles'][2] + 2*len(doubles) - 1}")
@@ -4,7 +4,16 @@ Pytest configuration and fixtures
 
 import sys
 import os
+import pytest
 
 # Add the project root directory to Python path so we can import our modules
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-sys.path.insert(0, project_root)
\ No newline at end of file
+sys.path.insert(0, project_root)
+
+
+@pytest.fixture(scope="session")
+def data_inputs():
+    """Inputs from the data/ folder, loaded as in main.py"""
+    from loader import load_inputs, default_sources
+    inputs, _ = load_inputs(default_sources(os.path.join(project_root, "data") + "/"))
+    return inputs
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""
+Tests for the columnar well archive in archive.py
+"""
+
+import numpy as np
+import pytest
+from archive import WellArchive
+from completion import Completion
+from pipes import Pipe, Stand, AssemblyPipe, Rack, Pile
+
+
+def make_completion():
+    """Bottom->top: assembly, triple stand, single, pup, top assembly"""
+    completion = Completion(60.0)
+    completion.add_assembly_pipe(AssemblyPipe('assy_1', 5.0))
+    completion.add_normal_pipe(Stand(1, [Pipe(1.0, 11.0), Pipe(2.0, 12.0), Pipe(3.0, 11.5)]))
+    completion.add_normal_pipe(Pipe(4.0, 11.8))
+    pup = Pipe('P1', 2.0, pup=True)
+    completion.add_normal_pipe(pup)
+    completion.add_assembly_pipe(AssemblyPipe('hanger', 1.5, is_top_assembly=True))
+
+    singles = Pile("single pipes")
+    singles.add_pipes([Pipe(5.0, 12.1)])
+    pups = Pile("pups")
+    pups.add_pipes([Pipe('P2', 3.0, pup=True)])
+    completion.add_leftover_tally([Rack("triple stands"), Rack("double stands"), singles, pups])
+    return completion
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = WellArchive(str(tmp_path / "archive"))
+    archive.append_well("W1", make_completion(), suppliers={1.0: "Acme", 5.0: "Acme"})
+    archive.append_well("W2", make_completion())
+    return archive
+
+
+class TestWellArchive:
+    """Test appending, reopening and querying the archive"""
+
+    def test_rows_per_well(self, archive):
+        # 2 assemblies + 3 stand joints + 1 single + 1 pup + 2 leftovers
+        assert len(archive) == 18
+        assert archive.wells == ["W1", "W2"]
+
+    def test_duplicate_well_rejected(self, archive):
+        with pytest.raises(ValueError, match="already archived"):
+            archive.append_well("W1", make_completion())
+
+    def test_reopen_uses_memory_map(self, archive):
+        reopened = WellArchive(archive.folder)
+        assert len(reopened) == 18
+        assert isinstance(reopened.column("length"), np.memmap)
+        np.testing.assert_array_equal(reopened.column("length"), archive.column("length"))
+
+    def test_depths_and_positions(self, archive):
+        rows = archive.scan(wells=["W1"], run_only=True)
+        ids = archive.pipe_ids(rows)
+        depths = dict(zip(ids, archive.column("depth")[rows]))
+        assert depths["hanger"] == 0.0
+        assert depths["P1"] == 1.5
+        assert depths["4"] == 3.5
+        assert depths["assy_1"] == 49.8
+        positions = dict(zip(ids, archive.column("position")[rows]))
+        assert positions["assy_1"] == 0
+        assert positions["1"] == positions["3"] == 1
+
+    def test_scan_filters(self, archive):
+        assert archive.pipe_ids(archive.scan(wells=["W2"], types=["pup"])) == ["P1", "P2"]
+        assert len(archive.scan(length_range=(12.0, 12.1))) == 4
+        assert len(archive.scan(depth_range=(0.0, 2.0))) == 4
+        assert archive.pipe_ids(archive.scan(suppliers=["Acme"])) == ["1", "5"]
+
+    def test_length_distribution(self, archive):
+        distribution = archive.length_distribution([10.0, 11.9, 12.5], by="supplier")
+        assert distribution["Acme"].tolist() == [1, 1]
+        assert distribution[""].tolist() == [5, 3]
+
+    def test_pup_usage_by_depth(self, archive):
+        assert archive.usage_by_depth_band(band=10.0, kind="pup") == {0.0: 2}
+
+    def test_interrupted_append_is_discarded(self, archive):
+        with open(f"{archive.folder}/length.bin", "ab") as f:
+            f.write(b"\0" * 8)
+        reopened = WellArchive(archive.folder)
+        assert len(reopened.column("length")) == 18
+        reopened.append_well("W3", make_completion())
+        assert reopened.well_ids(reopened.scan(wells=["W3"]))[0] == "W3"
+        assert len(reopened.scan(wells=["W3"])) == 9
@@ -0,0 +1,78 @@
+"""
+Tests for the lower bounds in bounds.py
+"""
+
+import pytest
+from bounds import Bounds, gap_report
+from pipes import AssemblyPipe, Pipe, Stand
+from utils import create_deck_tally, copy_deck_tally, generate_completion_tally
+
+
+@pytest.fixture
+def small_deck():
+    triples = [Stand(1, [Pipe(1, 10.0), Pipe(2, 10.0), Pipe(3, 10.0)]),    # Innermost
+               Stand(2, [Pipe(4, 10.0), Pipe(5, 10.0), Pipe(6, 10.2)])]    # Outermost
+    singles = [Pipe(7, 9.5), Pipe(8, 9.9)]
+    pups = [Pipe("P1", 0.3, pup=True), Pipe("P2", 0.6, pup=True)]
+    return create_deck_tally(triples, [], singles, pups)
+
+
+@pytest.fixture
+def small_assemblies():
+    return [AssemblyPipe("shoe", 1.0), AssemblyPipe("hanger", 0.5, is_top_assembly=True)]
+
+
+def small_completion(goal, deck_tally, assembly_tally):
+    return generate_completion_tally(goal, copy_deck_tally(deck_tally), assembly_tally, [])
+
+
+class TestBounds:
+    """Test reachable lengths and the bounds from them"""
+
+    def test_exact_length_reachable(self, small_deck, small_assemblies):
+        # 1.5 assemblies + 30.2 outermost stand + 9.9 single + 0.3 pup
+        assert Bounds(41.9, small_deck, small_assemblies).error_bound() == 0.0
+
+    def test_rack_order(self, small_deck, small_assemblies):
+        # 31.5 needs the innermost stand alone, the closest length is 1.5 + 9.9 + 9.5 + 0.6 + 0.3
+        assert Bounds(31.5, small_deck, small_assemblies).error_bound() == round(31.5 - 21.8, 3)
+
+    def test_no_string_fits(self, small_deck, small_assemblies):
+        bounds = Bounds(1.0, small_deck, small_assemblies)
+        assert bounds.error_bound() is None
+        assert bounds.pup_bound(0.5) is None
+
+    def test_pup_bound(self, small_deck, small_assemblies):
+        bounds = Bounds(42.2, small_deck, small_assemblies)    # 41.6 without pups, 42.2 with both
+        assert bounds.pup_bound(0.6) == 0
+        assert bounds.pup_bound(0.1) == 1
+        assert Bounds(42.5, small_deck, small_assemblies).pup_bound(0.0) == 2
+
+    def test_deck_tally_not_changed(self, small_deck, small_assemblies):
+        Bounds(41.9, small_deck, small_assemblies)
+        assert [len(small_deck[0].stands), len(small_deck[2].pipes), len(small_deck[3].pipes)] == [2, 2, 2]
+
+
+class TestGapReport:
+    """Test reports of solver completions against the bounds"""
+
+    @pytest.mark.parametrize("goal", [674, 1451, 2247])
+    def test_bounds_below_completion(self, data_inputs, goal):
+        deck_tally = create_deck_tally(data_inputs["triples"], data_inputs["doubles"], data_inputs["singles"], data_inputs["pups"])
+        bounds = Bounds(goal, deck_tally, data_inputs["assembly_tally"])
+        completion = generate_completion_tally(goal, deck_tally, data_inputs["assembly_tally"], data_inputs["casing_tally"])
+        report = bounds.report(completion)
+        assert report["error"] == round(goal - completion.length, 3)
+        assert report["error_gap"] >= 0
+        assert report["pups"] == completion.num_pipe_types["pups"]
+        assert 0 <= report["pup_bound"] <= report["pups"]
+
+    def test_gap_report(self, small_deck, small_assemblies):
+        report = gap_report(41.9, small_completion(41.9, small_deck, small_assemblies), small_deck, small_assemblies)
+        assert report["error_bound"] == 0.0
+        assert report["error_gap"] == report["error"]
+
+    def test_empty_deck(self, small_deck, small_assemblies):
+        report = gap_report(41.9, small_completion(41.9, small_deck, small_assemblies), create_deck_tally([], [], [], []), small_assemblies)
+        assert report["error_bound"] == 40.4    # Only the assemblies
+        assert report["error_gap"] < 0          # The completion used stands and pipes the bound was not given
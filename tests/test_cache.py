@@ -0,0 +1,104 @@
+"""
+Tests for the binary input cache in cache.py
+"""
+
+import os
+import time
+import pandas as pd
+import pytest
+import cache
+from cache import cached_extract, get_cache_path, encode_values, decode_values
+from utils import extract_deck_tally, extract_ids, extract_csv_rows_to_list
+
+
+@pytest.fixture
+def sample_csv_file(tmp_path):
+    data = {
+        'A': [1, 2, 3, 4, 5],
+        'B': [11.5, 12.0, None, 'invalid', 12.3],
+        'C': ['P1', 'P2', 'P3', 'P4', 'P5']
+    }
+    path = tmp_path / "tally.csv"
+    pd.DataFrame(data).to_csv(path, index=False)
+    return str(path)
+
+
+class TestEncoding:
+    """Test that values survive the round trip through the cache arrays"""
+
+    def test_mixed_values_round_trip(self):
+        values = [1.5, 2, 'P1', None, True]
+        result = decode_values(encode_values(values))
+        assert result == values
+        assert [type(v) for v in result] == [float, int, str, type(None), bool]
+
+    def test_rows_round_trip(self):
+        rows = [['assy_1', 8.318, None, 1], ['assy_2', 9.302, 3.0, 0]]
+        assert decode_values(encode_values(rows)) == rows
+
+    def test_empty_round_trip(self):
+        assert decode_values(encode_values([])) == []
+
+
+class TestCachedExtract:
+    """Test cache hits and invalidation"""
+
+    def test_cached_result_matches_direct_extract(self, sample_csv_file):
+        direct = extract_deck_tally(sample_csv_file, 'C', 1, 5)
+        first = cached_extract(extract_deck_tally, sample_csv_file, 'C', 1, 5)
+        second = cached_extract(extract_deck_tally, sample_csv_file, 'C', 1, 5)
+        assert first == direct
+        assert second == direct
+        assert os.path.exists(get_cache_path(extract_deck_tally, sample_csv_file, 'C', 1, 5))
+
+    def test_nan_values_are_kept(self, sample_csv_file):
+        cached_extract(extract_deck_tally, sample_csv_file, 'B', 1, 5)
+        result = cached_extract(extract_deck_tally, sample_csv_file, 'B', 1, 5)
+        assert result[:2] == [11.5, 12.0]
+        assert pd.isna(result[2])
+        assert result[3] == 'invalid'
+
+    def test_assembly_rows(self, tmp_path):
+        path = tmp_path / "assemblies.csv"
+        pd.DataFrame([['assy_1', 8.3, None, None, None, 3.0, 4.6, 0]]).to_csv(path, index=False)
+        cached_extract(extract_csv_rows_to_list, str(path))
+        assert cached_extract(extract_csv_rows_to_list, str(path)) == extract_csv_rows_to_list(str(path))
+
+    def test_changed_source_invalidates_cache(self, sample_csv_file):
+        assert cached_extract(extract_ids, sample_csv_file, 'A', 1, 3) == [1, 2, 3]
+
+        pd.DataFrame({'A': [7, 8, 9, 10, 11]}).to_csv(sample_csv_file, index=False)
+        stat = os.stat(sample_csv_file)
+        os.utime(sample_csv_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        assert cached_extract(extract_ids, sample_csv_file, 'A', 1, 3) == [7, 8, 9]
+
+    def test_touched_source_with_same_content_uses_cache(self, sample_csv_file, monkeypatch):
+        cached_extract(extract_ids, sample_csv_file, 'A', 1, 3)
+        os.utime(sample_csv_file, (time.time() + 10, time.time() + 10))
+
+        def fail(*args):
+            raise AssertionError("Source should not be re-parsed")
+        fail.__name__ = extract_ids.__name__
+
+        assert cached_extract(fail, sample_csv_file, 'A', 1, 3) == [1, 2, 3]
+
+    def test_touched_source_refreshes_stat(self, sample_csv_file, monkeypatch):
+        cached_extract(extract_ids, sample_csv_file, 'A', 1, 3)
+        os.utime(sample_csv_file, (time.time() + 10, time.time() + 10))
+        cached_extract(extract_ids, sample_csv_file, 'A', 1, 3)
+
+        def fail(path):
+            raise AssertionError("Source should not be hashed again")
+        monkeypatch.setattr(cache, "hash_file", fail)
+        assert cached_extract(extract_ids, sample_csv_file, 'A', 1, 3) == [1, 2, 3]
+
+    def test_unwritable_cache_folder(self, sample_csv_file, monkeypatch):
+        def fail(*args):
+            raise PermissionError("Read-only file system")
+        monkeypatch.setattr(cache, "write_cache", fail)
+        assert cached_extract(extract_ids, sample_csv_file, 'A', 1, 3) == [1, 2, 3]
+        assert not os.path.exists(get_cache_path(extract_ids, sample_csv_file, 'A', 1, 3))
+
+    def test_format_version_in_cache_path(self, sample_csv_file):
+        assert get_cache_path(extract_ids, sample_csv_file, 'A', 1, 3).endswith(f".v{cache.CACHE_FORMAT}.npz")
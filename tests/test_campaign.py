@@ -0,0 +1,81 @@
+"""
+Tests for multi-well planning in campaign.py
+"""
+
+import copy
+import pytest
+from campaign import plan_wells, well_score
+from pipes import AssemblyPipe, Stand
+from utils import create_deck_tally, copy_deck_tally, generate_completion_tally
+
+
+@pytest.fixture
+def deck_tally(data_inputs):
+    return create_deck_tally(data_inputs["triples"], data_inputs["doubles"], data_inputs["singles"], data_inputs["pups"])
+
+
+@pytest.fixture
+def well_specs(data_inputs):
+    return [{"name": name, "depth": depth, "assembly_tally": data_inputs["assembly_tally"], "casing_tally": data_inputs["casing_tally"]}
+            for name, depth in [("A", 900), ("B", 700), ("C", 600)]]
+
+
+def deck_size(deck_tally):
+    return [len(tally.stands) if tally.type.endswith("stands") else len(tally.pipes) for tally in deck_tally]
+
+
+class TestPlanWells:
+    """Test planning wells over a shared deck"""
+
+    def test_all_wells_planned(self, well_specs, deck_tally):
+        result = plan_wells(well_specs, deck_tally)
+        assert sorted(result["order"]) == ["A", "B", "C"]
+        assert all(completion.done for completion in result["completions"].values())
+
+    def test_no_element_used_twice(self, well_specs, deck_tally):
+        result = plan_wells(well_specs, deck_tally)
+        used = [id(element) for completion in result["completions"].values()
+                for element in completion.solution if type(element) != AssemblyPipe]
+        assert len(used) == len(set(used))
+
+    def test_deck_tally_not_changed(self, well_specs, deck_tally):
+        before = deck_size(deck_tally)
+        result = plan_wells(well_specs, deck_tally)
+        assert deck_size(deck_tally) == before
+        used = sum(len(completion.solution) - completion.num_assemblies for completion in result["completions"].values())
+        assert sum(deck_size(result["leftover_tally"])) == sum(before) - used
+
+    def test_no_wells(self, deck_tally):
+        result = plan_wells([], deck_tally)
+        assert result["completions"] == {} and result["solves"] == 0
+        assert deck_size(result["leftover_tally"]) == deck_size(deck_tally)
+
+    def test_one_solve_per_well(self, well_specs, deck_tally):
+        result = plan_wells(well_specs, deck_tally)
+        assert result["order"] == ["A", "B", "C"]
+        assert result["solves"] == len(well_specs)
+
+    def test_not_worse_than_one_after_another(self, well_specs, deck_tally):
+        result = plan_wells(well_specs, deck_tally, pup_weight=1.0)
+        deck = copy_deck_tally(deck_tally)
+        score = 0
+        for spec in well_specs:
+            completion = generate_completion_tally(spec["depth"], deck, [copy.copy(assembly) for assembly in spec["assembly_tally"]], spec["casing_tally"])
+            score += well_score(completion, 1.0)
+        assert result["score"] <= round(score, 3)
+        for completion in result["completions"].values():
+            assert completion.get_length_error() < 5
+
+    def test_racks_taken_in_well_order(self, well_specs, deck_tally):
+        result = plan_wells(well_specs, deck_tally)
+        deck = copy_deck_tally(deck_tally)
+        for spec in well_specs:
+            completion = generate_completion_tally(spec["depth"], deck, [copy.copy(assembly) for assembly in spec["assembly_tally"]], spec["casing_tally"])
+            stands = [element.id for element in completion.solution if type(element) == Stand]
+            assert [element.id for element in result["completions"][spec["name"]].solution if type(element) == Stand] == stands
+
+    def test_deck_too_small(self, well_specs, deck_tally):
+        for spec in well_specs:
+            spec["depth"] = 2000
+        with pytest.raises(RuntimeError):
+            plan_wells(well_specs, deck_tally)
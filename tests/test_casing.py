@@ -0,0 +1,73 @@
+"""
+Tests for the casing connection depths derived from joint lengths in casing.py
+"""
+
+import os
+import numpy as np
+import pytest
+from casing import cross_check, derive_casing_depths, extract_casing_from_lengths, merge_casing_depths, read_reference
+from loader import default_sources, load_inputs
+from utils import extract_casing_joints
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+
+class TestDeriveCasingDepths:
+    """Test the depths derived from the joint lengths"""
+
+    def test_derive(self):
+        depths, joints = derive_casing_depths(np.array([12.0, np.nan, 10.5, 11.25]), 1000.0)
+        assert depths.tolist() == [988.0, 977.5, 966.25]
+        assert joints.tolist() == [True, False, True, True]
+
+    def test_reference(self):
+        path = os.path.join(DATA, "liner_tally.csv")
+        assert read_reference(path, "G23") == 2382.403
+        assert read_reference(path, 2396.5) == 2396.5
+        with pytest.raises(ValueError):
+            read_reference(path, "D23")
+
+    def test_same_as_depth_columns(self):
+        for source in default_sources(DATA + "/")["casing"]:
+            path, length_column, start_row, end_row, reference, depth_column = source
+            derived = extract_casing_from_lengths(path, length_column, start_row, end_row, reference)
+            tally = extract_casing_joints(path, depth_column, start_row, end_row)
+            assert len(derived) == len(tally)
+            # The tally rounds its own sums, the last decimal can differ
+            assert np.allclose(derived, tally, atol=0.011)
+            assert cross_check(source) == []
+
+
+class TestCrossCheck:
+    """Test the report of rows where the depths disagree"""
+
+    def test_total_row(self):
+        # Row 104 of the liner tally is the total length, it has no depth in the tally
+        path, length_column, start_row, _, reference, depth_column = default_sources(DATA + "/")["casing"][1]
+        report = cross_check((path, length_column, start_row, 104, reference, depth_column))
+        assert [row["row"] for row in report] == [104]
+        assert report[0]["tally"] is None
+
+    def test_wrong_reference(self):
+        path, length_column, start_row, end_row, _, depth_column = default_sources(DATA + "/")["casing"][1]
+        report = cross_check((path, length_column, start_row, end_row, 2396.5, depth_column))
+        assert len(report) == end_row - start_row + 1
+        assert all(row["difference"] == pytest.approx(14.097, abs=0.01) for row in report)
+
+    def test_reported_on_load(self):
+        sources = default_sources(DATA + "/")
+        path, length_column, start_row, _, reference, depth_column = sources["casing"][1]
+        sources["casing"][1] = (path, length_column, start_row, 104, reference, depth_column)
+        sources["casing"].append((path, depth_column, start_row, 103))   # Precomputed depths, nothing to check
+        inputs, _ = load_inputs(sources)
+        assert [[row["row"] for row in check["report"]] for check in inputs["casing_checks"]] == [[], [104]]
+
+    def test_no_depth_column(self):
+        path, length_column, start_row, end_row, reference, _ = default_sources(DATA + "/")["casing"][1]
+        assert cross_check((path, length_column, start_row, end_row, reference, None)) == []
+
+
+def test_merge():
+    merged = merge_casing_depths([[3.0, 1.0], np.array([2.0, 0.5])])
+    assert merged.tolist() == [0.5, 1.0, 2.0, 3.0]
+    assert merge_casing_depths([]).tolist() == []
@@ -142,6 +142,22 @@ class TestCompletion:
         # P2: 30 to 45
         assert depths['P2'][0] == 30.0
         assert depths['P2'][1] == 45.0
+
+    def test_get_depth_arrays(self):
+        """Test the depth table as arrays, same values as get_solution_depths"""
+        completion = Completion(50.0)
+        completion.add_normal_pipe(Pipe('P1', 20.0))
+        completion.add_assembly_pipe(AssemblyPipe('assy1', 10.0, critical_point=4.0))
+        completion.add_normal_pipe(Pipe('P2', 15.0, pup=True))
+
+        arrays = completion.get_depth_arrays()
+        depths = completion.get_solution_depths()
+        assert list(arrays['id']) == list(depths)
+        assert list(arrays['top']) == [depth[0] for depth in depths.values()]
+        assert list(arrays['bottom']) == [depth[1] for depth in depths.values()]
+        assert arrays['critical_point'][list(depths).index('assy1')] == depths['assy1'][2]
+        assert sum(arrays['critical_point'] == arrays['critical_point']) == 1  # NaN for the pipes
+        assert 'assembly' in arrays['type'] and 'pup' in arrays['type']
     
     def test_string_representation(self):
         """Test completion string representation"""
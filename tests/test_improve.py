@@ -0,0 +1,85 @@
+"""
+Tests for the local search in improve.py
+"""
+
+import copy
+import pytest
+from completion import Completion
+from improve import improve_completion
+from pipes import AssemblyPipe
+from utils import create_deck_tally, generate_completion_tally
+
+
+def solve(goal, data_inputs):
+    deck_tally = create_deck_tally(data_inputs["triples"], data_inputs["doubles"], data_inputs["singles"], data_inputs["pups"])
+    assembly_tally = [copy.copy(assembly) for assembly in data_inputs["assembly_tally"]]
+    return generate_completion_tally(goal, deck_tally, assembly_tally, data_inputs["casing_tally"])
+
+
+def all_clear(completion):
+    """Replay the completion and check every assembly with the solver's clear rules"""
+    replay = Completion(completion.goal)
+    replay.add_casing_joints(completion.casing_joints)
+    for element in completion.solution:
+        if type(element) == AssemblyPipe:
+            if not element.is_top_assembly:
+                check = copy.copy(element)
+                check.update_all_clears(replay)
+                if not check.is_available():
+                    return False
+            replay.add_assembly_pipe(element)
+        else:
+            replay.add_normal_pipe(element)
+    return True
+
+
+class TestImproveCompletion:
+    """Test swap and insert moves against the leftover tally"""
+
+    @pytest.mark.parametrize("goal", [674, 1451, 2154, 2247])
+    def test_error_reduced(self, data_inputs, goal):
+        completion = solve(goal, data_inputs)
+        improved = improve_completion(completion)
+        assert improved.done
+        assert 0 <= improved.get_length_error() < completion.get_length_error()
+        assert all_clear(improved)
+
+    def test_types_kept(self, data_inputs):
+        completion = solve(2154, data_inputs)
+        improved = improve_completion(completion)
+        for kind in ("triples", "doubles", "assemblies"):
+            assert improved.num_pipe_types[kind] == completion.num_pipe_types[kind]
+        assert [element.id for element in improved.solution if type(element) == AssemblyPipe] == \
+               [element.id for element in completion.solution if type(element) == AssemblyPipe]
+
+    def test_rack_order_kept(self, data_inputs):
+        completion = solve(1451, data_inputs)
+        improved = improve_completion(completion)
+        stands = lambda c: [element for element in c.solution if type(element) != AssemblyPipe and element.num_pipes > 1]
+        assert stands(improved) == stands(completion)
+
+    def test_stand_swaps_without_rack_order(self, data_inputs):
+        completion = solve(1044, data_inputs)
+        improved = improve_completion(completion, respect_rack_order=False)
+        assert improved.get_length_error() < improve_completion(completion).get_length_error()
+        assert all_clear(improved)
+
+    def test_leftover_tally_updated(self, data_inputs):
+        completion = solve(2154, data_inputs)
+        improved = improve_completion(completion)
+        used = {id(element) for element in improved.solution}
+        for tally in improved.leftover_tally:
+            items = tally.stands if tally.type.endswith("stands") else tally.pipes
+            assert not any(id(item) in used for item in items)
+        count = lambda c: len(c.solution) + sum(len(t.stands) if t.type.endswith("stands") else len(t.pipes) for t in c.leftover_tally)
+        assert count(improved) == count(completion)
+
+    def test_completion_not_changed(self, data_inputs):
+        completion = solve(2154, data_inputs)
+        solution = list(completion.solution)
+        improve_completion(completion)
+        assert completion.solution == solution
+
+    def test_unfinished_completion(self):
+        with pytest.raises(ValueError):
+            improve_completion(Completion(1000))
@@ -0,0 +1,113 @@
+"""
+Tests for the SQLite inventory store in inventory.py
+"""
+
+import copy
+import pytest
+from inventory import Inventory
+from pipes import Pipe, Stand
+from utils import create_deck_tally, generate_completion_tally
+
+
+@pytest.fixture
+def inventory(tmp_path, data_inputs):
+    inventory = Inventory(str(tmp_path / "inventory.db"))
+    inventory.import_inputs(data_inputs)
+    yield inventory
+    inventory.close()
+
+
+def ids(items):
+    return [item.id for item in items]
+
+
+def solve(inputs, goal=2247):
+    deck_tally = create_deck_tally(inputs["triples"], inputs["doubles"], inputs["singles"], inputs["pups"])
+    return generate_completion_tally(goal, deck_tally, [copy.copy(assembly) for assembly in inputs["assembly_tally"]], inputs["casing_tally"])
+
+
+class TestInventory:
+    """Test import, loading and consumption"""
+
+    def test_load_same_as_files(self, inventory, data_inputs):
+        inputs = inventory.load_inputs()
+        for key in ("deck_tally", "triples", "doubles", "singles", "pups"):
+            assert ids(inputs[key]) == ids(data_inputs[key])
+            assert [item.length for item in inputs[key]] == [item.length for item in data_inputs[key]]
+        assert [pipe.mu_loss for pipe in inputs["pups"]] == [pipe.mu_loss for pipe in data_inputs["pups"]]
+        assert all(pipe.pup for pipe in inputs["pups"])
+        assert inputs["casing_tally"] == data_inputs["casing_tally"]
+        attributes = lambda assembly: (assembly.id, assembly.length, assembly.lower_lim, assembly.upper_lim, assembly.sep_length,
+                                       assembly.sep_ea, assembly.critical_point, assembly.is_top_assembly, assembly.order_group)
+        assert [attributes(assembly) for assembly in inputs["assembly_tally"]] == [attributes(assembly) for assembly in data_inputs["assembly_tally"]]
+        # Stands are made of the pipes of the deck tally
+        assert inputs["triples"][0].pipes[0] is next(pipe for pipe in inputs["deck_tally"] if pipe.id == inputs["triples"][0].pipes[0].id)
+
+        completion = solve(inputs)
+        assert [element.id for element in completion.solution] == [element.id for element in solve(data_inputs).solution]
+
+    def test_deck_tally(self, inventory):
+        deck_tally = inventory.deck_tally()
+        assert [tally.type for tally in deck_tally] == ["triple stands", "double stands", "single pipes", "pups"]
+        assert len(deck_tally[0].stands) == 49
+
+    def test_consume(self, inventory, data_inputs):
+        completion = solve(inventory.load_inputs(), goal=1500)
+        inventory.consume(completion, "well A")
+
+        counts = inventory.counts()
+        used = completion.get_number_of_pipe_types()
+        assert counts["triple"] == {"consumed": used["triples"], "available": 49 - used["triples"]}
+        assert counts["pup"]["consumed"] == used["pups"]
+        assert counts["tubing"]["consumed"] == 3*used["triples"] + 2*used["doubles"] + used["singles"]
+
+        inputs = inventory.load_inputs()
+        assert not set(ids(inputs["triples"])) & {element.id for element in completion.solution if getattr(element, "num_pipes", 0) == 3}
+        assert len(inputs["deck_tally"]) == 181 - counts["tubing"]["consumed"]
+        assert len(inventory.consumed_in("well A")["stands"]) == used["triples"] + used["doubles"]
+
+        # A second import keeps the status
+        inventory.import_inputs(data_inputs)
+        assert inventory.counts() == counts
+
+    def test_queries(self, inventory, data_inputs):
+        long_pipes = inventory.pipes(min_length=12.1)
+        assert [id for id, _ in long_pipes] and all(length >= 12.1 for _, length in long_pipes)
+        assert len(long_pipes) == sum(1 for pipe in data_inputs["deck_tally"] if pipe.length >= 12.1)
+        assert [length for _, length in inventory.pipes("pup")] == sorted(pipe.length for pipe in data_inputs["pups"])
+        indexes = {row[1] for row in inventory.connection.execute("PRAGMA index_list(pipes)")}
+        assert {"pipes_id", "pipes_length", "pipes_status"} <= indexes
+
+    def test_wells(self, inventory, data_inputs):
+        other = dict(data_inputs, casing_tally=[100.0, 200.0], assembly_tally=data_inputs["assembly_tally"][-1:])
+        inventory.import_inputs(other, well="B")
+        assert inventory.load_inputs("B")["casing_tally"] == [100.0, 200.0]
+        assert ids(inventory.assembly_tally("B")) == ["assy_11_tubinghanger"]
+        assert len(inventory.assembly_tally()) == 11
+
+    def test_stand_id_with_other_pipes(self, inventory, data_inputs):
+        # A new racked file numbers its stands from 1 again
+        triples = [Stand(data_inputs["triples"][0].id, data_inputs["triples"][1].pipes)]
+        counts = inventory.counts()
+        with pytest.raises(ValueError, match="already in the inventory"):
+            inventory.import_inputs(dict(data_inputs, triples=triples), well="C")
+        assert inventory.counts() == counts
+        assert inventory.assembly_tally("C") == []
+
+    def test_stand_with_unknown_pipe(self, inventory, data_inputs):
+        triples = data_inputs["triples"][:1] + [Stand(50, [Pipe(9001, 12.0), Pipe(9002, 12.0), Pipe(9003, 12.0)])]
+        with pytest.raises(ValueError, match="not tubing joints: \\[9001, 9002, 9003\\]"):
+            inventory.import_inputs(dict(data_inputs, triples=triples))
+
+    def test_incomplete_stand(self, inventory, data_inputs):
+        pipes = data_inputs["triples"][0].pipes[1:]
+        stand_ids = {"triples": [9001] + [pipe.id for pipe in pipes], "doubles": []}    # Racked IDs as read
+        triples = [Stand(50, pipes)]
+        with pytest.raises(ValueError, match="has 2 of 3 pipes.*\\[9001\\]"):
+            inventory.import_inputs(dict(data_inputs, triples=triples, stand_ids=stand_ids))
+
+    def test_stand_with_consumed_pipe(self, inventory):
+        stand_id, pipe_id = inventory.connection.execute("SELECT stand_id, pipe_id FROM stand_pipes WHERE kind = 'triple' LIMIT 1").fetchone()
+        inventory.connection.execute("UPDATE pipes SET status = 'consumed' WHERE kind = 'tubing' AND id = ?", (pipe_id,))
+        with pytest.raises(ValueError, match=f"stand {stand_id} holds pipe {pipe_id}"):
+            inventory.load_inputs()
@@ -0,0 +1,113 @@
+"""
+Tests for the kernels in kernels.py
+"""
+
+import numpy as np
+import pytest
+import kernels
+from completion import Completion
+from pipes import AssemblyPipe, Pipe, Stand
+
+
+@pytest.fixture
+def random_state():
+    rng = np.random.default_rng(7)
+    casing = np.sort(np.round(rng.uniform(0, 2300, 200), 3))
+    lengths = np.round(rng.uniform(1, 37, 500), 3)
+    num_pipes = rng.integers(1, 4, 500)
+    return casing, lengths, num_pipes
+
+
+ASSEMBLIES = [dict(lower_lim=1480.0),
+              dict(upper_lim=1300.0),
+              dict(sep_length=100.0),
+              dict(sep_ea=5.0),
+              dict(critical_point=8.114),
+              dict(lower_lim=280.0, sep_length=20.0, critical_point=4.651),
+              dict()]
+
+
+class TestKernels:
+    """Test that the loop (Numba) and NumPy versions give the same results as AssemblyPipe"""
+
+    @pytest.mark.parametrize("constraints", ASSEMBLIES)
+    def test_check_clears_versions(self, random_state, constraints):
+        casing, lengths, num_pipes = random_state
+        arguments = dict(lower_lim=0.0, upper_lim=0.0, sep_length=0.0, sep_ea=0.0, critical_point=0.0)
+        arguments.update(constraints)
+        for length in (0.0, 750.5, 2200.0):
+            values = (lengths, num_pipes, length, 35.2, 2, 2247.0, 16.228, arguments["lower_lim"], arguments["upper_lim"],
+                      arguments["sep_length"], arguments["sep_ea"], arguments["critical_point"], 1.5, casing)
+            assert np.array_equal(kernels.loop_check_clears(*values), kernels.numpy_check_clears(*values))
+
+    @pytest.mark.parametrize("constraints", ASSEMBLIES)
+    def test_same_as_assembly_methods(self, random_state, constraints):
+        casing, lengths, num_pipes = random_state
+        pipes = [Pipe(i, length) for i, length in enumerate(lengths)]
+        pipes.append(Stand(1, [Pipe(1000, 11.9), Pipe(1001, 12.1), Pipe(1002, 12.0)]))
+        completion = Completion(2247.0)
+        completion.add_casing_joints(list(casing[::-1]))    # Any order
+        assembly = AssemblyPipe("assy", 16.228, **constraints)
+        for length in (0.0, 750.5, 2200.0):
+            completion.length = length
+            completion.length_since_prev = 35.2
+            completion.ea_since_prev = 2
+            expected = [assembly.check_all_clears_with_pipe(completion, pipe) for pipe in pipes]
+            original = kernels.get_backend()
+            try:
+                for backend in kernels.BACKENDS:
+                    kernels.set_backend(backend)
+                    assert assembly.check_all_clears_with_pipes(completion, pipes) == expected
+            finally:
+                kernels.set_backend(original)
+
+    def test_margin_edge(self):
+        # Critical point exactly at the margin from a connection is clear, as in check_critical_point_clear
+        completion = Completion(100.0)
+        completion.add_casing_joints([50.0])
+        assembly = AssemblyPipe("assy", 10.0, critical_point=5.0)
+        pipes = [Pipe(1, 43.5), Pipe(2, 44.0), Pipe(3, 46.5)]
+        expected = [assembly.check_all_clears_with_pipe(completion, pipe) for pipe in pipes]
+        assert assembly.check_all_clears_with_pipes(completion, pipes) == expected == [True, False, True]
+
+    def test_no_casing(self):
+        assembly = AssemblyPipe("assy", 10.0, critical_point=5.0)
+        with pytest.raises(RuntimeError):
+            assembly.check_all_clears_with_pipes(Completion(100.0), [Pipe(1, 10.0)])
+
+    def test_nearest_distance_versions(self, random_state):
+        casing = random_state[0]
+        depths = np.linspace(-50, 2400, 5001)
+        expected = np.array([min(abs(joint - depth) for joint in casing) for depth in depths])
+        assert np.array_equal(kernels.loop_nearest_distance(depths, casing), expected)
+        assert np.array_equal(kernels.numpy_nearest_distance(depths, casing), expected)
+
+    def test_backend(self):
+        assert kernels.get_backend() in kernels.BACKENDS
+        with pytest.raises(ValueError):
+            kernels.set_backend("fortran")
+
+    def test_environment_backend(self, monkeypatch):
+        monkeypatch.setenv("TALLYNOW_KERNELS", "numpy")
+        assert kernels.environment_backend() == "numpy"
+        monkeypatch.setenv("TALLYNOW_KERNELS", "fortran")
+        with pytest.raises(ValueError, match="TALLYNOW_KERNELS"):
+            kernels.environment_backend()
+        monkeypatch.delenv("TALLYNOW_KERNELS")
+        assert kernels.environment_backend() == kernels.BACKENDS[0]
+
+    def test_environment_numba_missing(self, monkeypatch):
+        monkeypatch.setattr(kernels, "numba", None)
+        monkeypatch.setattr(kernels, "BACKENDS", ["numpy"])
+        monkeypatch.setenv("TALLYNOW_KERNELS", "numba")
+        with pytest.warns(UserWarning, match="Numba is not installed"):
+            assert kernels.environment_backend() == "numpy"
+
+    def test_fractional_sep_ea_kept(self):
+        # 1 pipe since the previous assembly, a 2.5 pipe separation needs a stand, as in AssemblyPipe
+        completion = Completion(2247.0)
+        completion.ea_since_prev = 1
+        assembly = AssemblyPipe("assy", 10.0, sep_ea=2.5)
+        pipes = [Pipe(1, 12.0), Stand(1, [Pipe(2, 12.0), Pipe(3, 12.0)]), Stand(2, [Pipe(4, 12.0), Pipe(5, 12.0), Pipe(6, 12.0)])]
+        expected = [assembly.check_all_clears_with_pipe(completion, pipe) for pipe in pipes]
+        assert assembly.check_all_clears_with_pipes(completion, pipes) == expected == [False, True, True]
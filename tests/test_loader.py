@@ -0,0 +1,58 @@
+"""
+Tests for concurrent input loading in loader.py
+"""
+
+import os
+import pytest
+from loader import load_inputs
+from utils import (get_assemblies_from_file, get_deck_tally, extract_casing_joints,
+                   get_triple_stands_from_file, get_double_stands_from_file)
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+
+@pytest.fixture
+def sources():
+    return {"assemblies": os.path.join(DATA, "assemblies.csv"),
+            "casing": [(os.path.join(DATA, "tieback_tally.csv"), 'I', 18, 131),
+                       (os.path.join(DATA, "liner_tally.csv"), 'G', 24, 104)],
+            "tubing": (os.path.join(DATA, "tubing_tally.csv"), 'A', 'D', 20, 200),
+            "triples": (os.path.join(DATA, "racked_tubing.csv"), 'F', 2, 150),
+            "doubles": (os.path.join(DATA, "racked_tubing.csv"), 'O', 2, 9),
+            "pups": (os.path.join(DATA, "pups.csv"), 'A', 'E', 25, 33)}
+
+
+class TestLoadInputs:
+    """Test that concurrent loading gives the same inputs as loading one by one"""
+
+    def test_matches_serial_loading(self, sources):
+        inputs, timings = load_inputs(sources)
+
+        deck_tally = get_deck_tally(sources["tubing"][0], None, *sources["tubing"][1:])
+        assert [(p.id, p.length) for p in inputs["deck_tally"]] == [(p.id, p.length) for p in deck_tally]
+
+        casing = []
+        for source in sources["casing"]:
+            casing += extract_casing_joints(*source)
+        assert inputs["casing_tally"] == sorted(casing)
+
+        triples = get_triple_stands_from_file(sources["triples"][0], None, *sources["triples"][1:], deck_tally)
+        doubles = get_double_stands_from_file(sources["doubles"][0], None, *sources["doubles"][1:], deck_tally)
+        assert [(s.id, s.length) for s in inputs["triples"]] == [(s.id, s.length) for s in triples]
+        assert [(s.id, s.length) for s in inputs["doubles"]] == [(s.id, s.length) for s in doubles]
+
+        assemblies = get_assemblies_from_file(sources["assemblies"])
+        assert [a.id for a in inputs["assembly_tally"]] == [a.id for a in assemblies]
+        assert all(pup.pup for pup in inputs["pups"])
+
+    def test_stands_use_deck_tally_pipes(self, sources):
+        inputs, timings = load_inputs(sources, max_workers=1)
+        deck_ids = {id(pipe) for pipe in inputs["deck_tally"]}
+        assert all(id(pipe) in deck_ids for stand in inputs["triples"] for pipe in stand.pipes)
+        stand_pipes = {id(pipe) for stand in inputs["triples"]+inputs["doubles"] for pipe in stand.pipes}
+        assert not any(id(pipe) in stand_pipes for pipe in inputs["singles"])
+
+    def test_timings_per_source(self, sources):
+        inputs, timings = load_inputs(sources)
+        assert set(timings) == {"assemblies", "casing 1", "casing 2", "tubing", "triples", "doubles", "pups"}
+        assert all(seconds >= 0 for seconds in timings.values())
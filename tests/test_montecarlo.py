@@ -0,0 +1,72 @@
+"""
+Tests for the Monte Carlo analysis in montecarlo.py
+"""
+
+import numpy as np
+import pytest
+from completion import Completion
+from montecarlo import clearance, report, simulate
+from pipes import AssemblyPipe, Pipe, Stand
+from utils import plan_completion
+
+
+@pytest.fixture
+def completion(data_inputs):
+    return plan_completion(2247, data_inputs["triples"], data_inputs["doubles"], data_inputs["singles"], data_inputs["pups"],
+                           data_inputs["assembly_tally"], data_inputs["casing_tally"])
+
+
+class TestSimulate:
+    """Test sampling of joint lengths and the depths from them"""
+
+    def test_mu_loss_loaded(self, data_inputs):
+        assert all(pipe.mu_loss == 0.124 for pipe in data_inputs["deck_tally"])
+        assert all(pipe.mu_loss == 0.124 for pipe in data_inputs["pups"])
+
+    def test_no_uncertainty_gives_planned_depths(self, completion):
+        result = simulate(completion, samples=4, length_sigma=0, mu_loss_sigma=0, assembly_sigma=0)
+        depths = completion.get_solution_depths()
+        np.testing.assert_allclose(result["landing_error"], completion.goal - completion.length, atol=1e-9)
+        for id, samples in result["assembly_depths"].items():
+            np.testing.assert_allclose(samples, depths[id][0], atol=1e-9)
+        for id, samples in result["critical_point_depths"].items():
+            np.testing.assert_allclose(samples, depths[id][2], atol=1e-9)
+
+    def test_spread_grows_with_joints(self):
+        completion = Completion(100)
+        completion.add_assembly_pipe(AssemblyPipe("shoe", 1.0))
+        completion.add_normal_pipe(Stand(1, [Pipe(i, 10.0) for i in range(3)]))
+        completion.add_normal_pipe(Pipe(4, 10.0))
+        result = simulate(completion, samples=200000, length_sigma=0.01, mu_loss_sigma=0, assembly_sigma=0, seed=1)
+        # Four joints below the top of the string at the shoe
+        assert np.std(result["assembly_depths"]["shoe"]) == pytest.approx(0.02, rel=0.02)
+        assert np.std(result["landing_error"]) == pytest.approx(0.02, rel=0.02)
+
+    def test_mu_loss_variation(self):
+        completion = Completion(100)
+        pipe = Pipe(1, 10.0)
+        pipe.mu_loss = 0.2
+        completion.add_normal_pipe(pipe)
+        completion.add_normal_pipe(Pipe(2, 10.0))   # No make-up loss given
+        result = simulate(completion, samples=200000, length_sigma=0, mu_loss_sigma=0.1, seed=1)
+        assert np.std(result["landing_error"]) == pytest.approx(0.02, rel=0.02)
+
+    def test_seed(self, completion):
+        first = simulate(completion, samples=10, seed=3)["landing_error"]
+        assert np.array_equal(first, simulate(completion, samples=10, seed=3)["landing_error"])
+
+
+class TestClearance:
+    """Test distance to the closest casing connection"""
+
+    def test_clearance(self):
+        casing = np.array([10.0, 20.0, 30.0])
+        np.testing.assert_allclose(clearance(np.array([5.0, 12.0, 19.0, 30.0, 41.0]), casing), [5.0, 2.0, 1.0, 0.0, 11.0])
+
+    def test_report(self, completion):
+        summary = report(completion, samples=1000, seed=1)
+        assert summary["samples"] == 1000
+        assert summary["landing_error"]["p5"] <= summary["landing_error"]["p50"] <= summary["landing_error"]["p95"]
+        assert set(summary["critical_point_clearances"]) == {"assy_2_packer", "assy_7_valve"}
+        for values in summary["critical_point_clearances"].values():
+            assert 0 <= values["p_within_margin"] <= 1
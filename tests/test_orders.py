@@ -0,0 +1,115 @@
+"""
+Tests for the search over assembly orders in orders.py
+"""
+
+import copy
+import pytest
+from orders import assembly_orders, generate_completion_tally_any_order, order_segments, search_assembly_orders
+from pipes import AssemblyPipe, Pipe
+from utils import create_deck_tally, generate_completion_tally, get_assemblies_from_file
+
+
+def deck(inputs):
+    return create_deck_tally(inputs["triples"], inputs["doubles"], inputs["singles"], inputs["pups"])
+
+
+def grouped(assembly, group):
+    assembly.order_group = group
+    return assembly
+
+
+@pytest.fixture
+def grouped_inputs(data_inputs):
+    """The data inputs with the gauges (assy_3, assy_4) and the mandrels (assy_5, assy_6) in order groups"""
+    groups = {"assy_3_gauge": "gauges", "assy_4_gauge": "gauges", "assy_5_mandrel": "mandrels", "assy_6_mandrel": "mandrels"}
+    assembly_tally = [grouped(copy.copy(assembly), groups.get(assembly.id)) for assembly in data_inputs["assembly_tally"]]
+    return dict(data_inputs, assembly_tally=assembly_tally)
+
+
+class TestOrderSegments:
+    """Test order groups of the assembly tally"""
+
+    def test_groups_from_file(self, tmp_path):
+        path = tmp_path / "assemblies.csv"
+        path.write_text("id,length,lower limit,upper limit,separation length,separation pipes,critical point,top assembly,order group\n"
+                        "assy_1,8.0,,,,,,0,\n"
+                        "assy_2,9.0,,,,,,0, gauges\n"
+                        "assy_3,10.0,,,,,,0,gauges\n"
+                        "assy_4,150.0,,,,,,1,\n")
+        assert [assembly.order_group for assembly in get_assemblies_from_file(str(path))] == [None, "gauges", "gauges", None]
+
+    def test_data_has_no_groups(self, data_inputs):
+        # Which assemblies may swap is decided per well, the shipped file leaves the column empty
+        assert all(assembly.order_group is None for assembly in data_inputs["assembly_tally"])
+
+    def test_segments(self, grouped_inputs):
+        segments = order_segments(grouped_inputs["assembly_tally"])
+        assert [len(segment) for segment in segments] == [1, 1, 2, 2, 1, 1, 1, 1, 1]
+        assert len(list(assembly_orders(grouped_inputs["assembly_tally"]))) == 4
+
+    def test_file_without_group_column(self, tmp_path):
+        path = tmp_path / "assemblies.csv"
+        path.write_text("id,length,lower limit,upper limit,separation length,separation pipes,critical point,top assembly\n"
+                        "assy_1,8.0,,,,,,0\n"
+                        "assy_2,150.0,,,,,,1\n")
+        assert [assembly.order_group for assembly in get_assemblies_from_file(str(path))] == [None, None]
+
+    def test_group_not_next_to_each_other(self):
+        tally = [grouped(AssemblyPipe("a", 1.0), "g"), AssemblyPipe("b", 1.0), grouped(AssemblyPipe("c", 1.0), "g")]
+        with pytest.raises(ValueError):
+            order_segments(tally)
+
+    def test_top_assembly_in_group(self):
+        tally = [grouped(AssemblyPipe("a", 1.0), "g"), grouped(AssemblyPipe("top", 5.0, is_top_assembly=True), "g")]
+        with pytest.raises(ValueError):
+            order_segments(tally)
+
+
+class TestSearchAssemblyOrders:
+    """Test the search against solving every order"""
+
+    def test_best_of_all_orders(self, grouped_inputs):
+        for goal in (2247, 1500):
+            result = search_assembly_orders(goal, deck(grouped_inputs), grouped_inputs["assembly_tally"], grouped_inputs["casing_tally"])
+            scores = []
+            for order in assembly_orders(grouped_inputs["assembly_tally"]):
+                completion = generate_completion_tally(goal, deck(grouped_inputs), [copy.copy(assembly) for assembly in order], grouped_inputs["casing_tally"])
+                scores.append((round(completion.get_length_error(), 3), completion.num_pipe_types["pups"]))
+            completion = result["completion"]
+            assert (round(completion.get_length_error(), 3), completion.num_pipe_types["pups"]) == min(scores)
+            assert result["orders"] == 4
+            assert result["solves"] < result["orders"]
+
+    def test_without_groups_is_one_solve(self, data_inputs):
+        assembly_tally = [copy.copy(assembly) for assembly in data_inputs["assembly_tally"]]
+        for assembly in assembly_tally:
+            assembly.order_group = None
+        result = search_assembly_orders(2247, deck(data_inputs), assembly_tally, data_inputs["casing_tally"])
+        completion = generate_completion_tally(2247, deck(data_inputs), [copy.copy(assembly) for assembly in assembly_tally], data_inputs["casing_tally"])
+        assert result["solves"] == 1
+        assert [element.id for element in result["completion"].solution] == [element.id for element in completion.solution]
+
+    def test_only_one_order_is_valid(self):
+        # a must be no deeper than 150 m, b must be below 240 m: in the given order b can not be placed
+        assembly_tally = [grouped(AssemblyPipe("a", 1.0, lower_lim=150), "g"),
+                          grouped(AssemblyPipe("b", 1.0, upper_lim=240), "g"),
+                          AssemblyPipe("hanger", 5.0, is_top_assembly=True)]
+        pups = [Pipe(100+i, length) for i, length in enumerate([10, 5, 3, 2, 1])]
+        for pup in pups:
+            pup.set_pup()
+        deck_tally = create_deck_tally([], [], [Pipe(i, 30.0) for i in range(12)], pups)
+        result = search_assembly_orders(300, deck_tally, assembly_tally, [])
+        assert result["order"] == ["b", "a", "hanger"]
+        assert result["completion"].num_assemblies == 3
+        assert result["pruned"] == 1        # b after a
+        assert len(deck_tally[2].pipes) == 12     # The deck tally is not changed
+        assert generate_completion_tally_any_order(300, deck_tally, assembly_tally, []).solution[0].id == "b"
+
+    def test_no_valid_order(self):
+        assembly_tally = [grouped(AssemblyPipe("a", 1.0, lower_lim=50), "g"),
+                          grouped(AssemblyPipe("b", 1.0, lower_lim=50), "g"),
+                          AssemblyPipe("hanger", 5.0, is_top_assembly=True)]
+        deck_tally = create_deck_tally([], [], [Pipe(i, 10.0) for i in range(3)], [])
+        assert search_assembly_orders(100, deck_tally, assembly_tally, [])["completion"] is None
+        with pytest.raises(RuntimeError):
+            generate_completion_tally_any_order(100, deck_tally, assembly_tally, [])
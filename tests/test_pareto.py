@@ -0,0 +1,72 @@
+"""
+Tests for the Pareto front of pareto.py
+"""
+
+import copy
+import itertools
+from pareto import pareto_front
+from pipes import AssemblyPipe, Pipe, Stand
+from utils import create_deck_tally, generate_completion_tally
+
+
+def dominates(a, b):
+    return all(x <= y for x, y in zip(a, b)) and a != b
+
+
+def objectives(point):
+    return (round(point["error"], 3), point["pups"], point["connections"])
+
+
+class TestParetoFront:
+    """Test the front against all plans of the top section"""
+
+    def test_small_deck_against_all_plans(self):
+        triples = [Stand(1, [Pipe(1, 10.0), Pipe(2, 10.1), Pipe(3, 9.9)]), Stand(2, [Pipe(4, 10.2), Pipe(5, 10.0), Pipe(6, 10.0)])]
+        singles = [Pipe(10+i, length) for i, length in enumerate([12.0, 11.5, 11.0, 10.2])]
+        pups = [Pipe(20+i, length) for i, length in enumerate([1.0, 2.0, 3.1])]
+        for pup in pups:
+            pup.set_pup()
+        assembly_tally = [AssemblyPipe("shoe", 1.0), AssemblyPipe("hanger", 5.0, is_top_assembly=True)]
+        goal = 80
+
+        # Every plan: stands from the outside of the rack, any singles and pups
+        plans = set()
+        for num_stands in range(3):
+            stands = sum(stand.length for stand in triples[::-1][:num_stands])
+            for k in range(len(singles)+1):
+                for chosen_singles in itertools.combinations(singles, k):
+                    for p in range(len(pups)+1):
+                        for chosen_pups in itertools.combinations(pups, p):
+                            length = 6.0 + stands + sum(pipe.length for pipe in chosen_singles + chosen_pups)
+                            if 0 <= goal - length < 5:
+                                plans.add((round(goal - length, 3), p, num_stands + k + p))
+        expected = {plan for plan in plans if not any(dominates(other, plan) for other in plans)}
+
+        deck_tally = create_deck_tally(triples, [], singles, pups)
+        front = pareto_front(goal, deck_tally, assembly_tally, [])
+        assert {objectives(point) for point in front} == expected
+        assert len(deck_tally[2].pipes) == 4    # The deck tally is not changed
+
+    def test_front(self, data_inputs):
+        for goal in (2247, 1500):
+            deck = lambda: create_deck_tally(data_inputs["triples"], data_inputs["doubles"], data_inputs["singles"], data_inputs["pups"])
+            front = pareto_front(goal, deck(), data_inputs["assembly_tally"], data_inputs["casing_tally"])
+            points = [objectives(point) for point in front]
+            assert len(front) > 1
+            assert not any(dominates(a, b) for a in points for b in points)
+
+            for point in front:
+                completion = point["completion"]
+                assert completion.done and 0 <= completion.get_length_error() < 5
+                assert completion.num_pipe_types["pups"] == point["pups"]
+                assert completion.solution[-1].is_top_assembly
+                # Every stand and pipe is used once, the rest is left on deck (stand and pipe IDs overlap)
+                used = [id(element) for element in completion.solution if type(element) != AssemblyPipe]
+                left = [id(item) for tally in completion.leftover_tally for item in (tally.stands if hasattr(tally, "stands") else tally.pipes)]
+                assert len(set(used)) == len(used) and not set(used) & set(left)
+
+            # The greedy solver gives one of the plans, none on the front is worse on all counts
+            greedy = generate_completion_tally(goal, deck(), [copy.copy(assembly) for assembly in data_inputs["assembly_tally"]], data_inputs["casing_tally"])
+            greedy_point = (round(greedy.get_length_error(), 3), greedy.num_pipe_types["pups"],
+                            sum(1 for element in greedy.solution if type(element) != AssemblyPipe))
+            assert any(point == greedy_point or dominates(point, greedy_point) for point in points)
@@ -0,0 +1,78 @@
+"""
+Tests for the Parquet input tables and completion output in parquet.py
+"""
+
+import copy
+import numpy as np
+import pytest
+import parquet
+from utils import create_deck_tally, generate_completion_tally
+
+pa = pytest.importorskip("pyarrow")
+
+
+def solve(goal, inputs):
+    deck_tally = create_deck_tally(inputs["triples"], inputs["doubles"], inputs["singles"], inputs["pups"])
+    return generate_completion_tally(goal, deck_tally, [copy.copy(assembly) for assembly in inputs["assembly_tally"]], inputs["casing_tally"])
+
+
+def stands(stands):
+    return [(stand.id, [(pipe.id, pipe.length) for pipe in stand.pipes]) for stand in stands]
+
+
+def pipes(pipes):
+    return [(pipe.id, pipe.length, pipe.mu_loss, pipe.pup) for pipe in pipes]
+
+
+class TestParquetInputs:
+    """Test reading the input tables from Parquet"""
+
+    def test_round_trip(self, data_inputs, tmp_path):
+        parquet.write_inputs(data_inputs, tmp_path)
+        inputs = parquet.load_inputs(tmp_path)
+        for kind in ("triples", "doubles"):
+            assert stands(inputs[kind]) == stands(data_inputs[kind])
+        for kind in ("deck_tally", "singles", "pups"):
+            assert pipes(inputs[kind]) == pipes(data_inputs[kind])
+        assert inputs["stand_ids"] == data_inputs["stand_ids"]
+        assert inputs["casing_tally"] == sorted(data_inputs["casing_tally"])
+        for assembly, original in zip(inputs["assembly_tally"], data_inputs["assembly_tally"]):
+            assert [getattr(assembly, column) for column in parquet.ASSEMBLY_COLUMNS] == [getattr(original, column) for column in parquet.ASSEMBLY_COLUMNS]
+            # Constraints are set as when the assemblies are loaded from the CSV file
+            assert (assembly.ll_clear, assembly.sep_length_clear, assembly.sep_ea_clear) == (assembly.lower_lim is None, assembly.sep_length is None, assembly.sep_ea is None)
+
+    def test_same_solution(self, data_inputs, tmp_path):
+        parquet.write_inputs(data_inputs, tmp_path)
+        completion = solve(2247, parquet.load_inputs(tmp_path))
+        expected = solve(2247, data_inputs)
+        assert completion.get_solution_depths() == expected.get_solution_depths()
+
+
+class TestParquetCompletion:
+    """Test writing the completion depth table and solver metadata"""
+
+    def test_depth_table(self, data_inputs, tmp_path):
+        completion = solve(2247, data_inputs)
+        parquet.write_completion(completion, tmp_path / "completion.parquet", {"well_depth": 2247})
+        table, metadata = parquet.read_completion(tmp_path / "completion.parquet")
+
+        assert table.num_rows == len(completion.solution)
+        assert table.column("id").to_pylist() == [str(element.id) for element in reversed(completion.solution)]
+        depths = list(completion.get_solution_depths().values())
+        assert table.column("top").to_pylist()[-1] == depths[-1][0]
+        assert table.column("bottom").to_pylist()[-1] == depths[-1][1]
+        critical_points = [depth[2] for depth in depths if len(depth) == 3]
+        assert [value for value in table.column("critical_point").to_pylist() if value is not None] == critical_points
+
+        assert metadata["goal"] == 2247
+        assert metadata["length"] == completion.length
+        assert metadata["done"] == completion.done
+        assert metadata["num_assemblies"] == completion.num_assemblies
+        assert metadata["well_depth"] == 2247
+
+    def test_zero_copy(self, data_inputs):
+        completion = solve(1000, data_inputs)
+        arrays = completion.get_depth_arrays()
+        column = pa.array(arrays["bottom"])
+        assert np.shares_memory(column.to_numpy(zero_copy_only=True), arrays["bottom"])
+        assert parquet.completion_table(completion).column("bottom").to_pylist() == arrays["bottom"].tolist()
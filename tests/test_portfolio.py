@@ -0,0 +1,61 @@
+"""
+Tests for the solver portfolio in portfolio.py
+"""
+
+import pytest
+from portfolio import RandomSelector, run_portfolio, solve
+from utils import completion_score, select_default, select_longest, select_shortest
+
+
+class TestSelectors:
+    """Test the choice of the next stand/pipe"""
+
+    def test_default_selector(self):
+        assert select_default([1, 2, 3], "clear") == 1
+        assert select_default([1, 2, 3], "fill") == 3
+        assert select_default([1, 2, 3], "top") == 3
+
+    def test_longest_and_shortest(self):
+        assert all(select_longest([1, 2, 3], phase) == 3 for phase in ("clear", "fill", "top"))
+        assert all(select_shortest([1, 2, 3], phase) == 1 for phase in ("clear", "fill", "top"))
+
+    def test_random_selector_is_seeded(self):
+        pipes = list(range(10))
+        first = [RandomSelector(7)(pipes, "clear") for _ in range(5)]
+        assert first == [RandomSelector(7)(pipes, "clear") for _ in range(5)]
+        assert all(RandomSelector(seed)(pipes, "top") >= 7 for seed in range(20))
+
+    def test_selector_changes_solution(self, data_inputs):
+        greedy = solve(1451, data_inputs)
+        longest = solve(1451, data_inputs, select_longest)
+        assert [e.id for e in greedy.solution] != [e.id for e in longest.solution]
+
+
+class TestRunPortfolio:
+    """Test running the strategies in parallel processes"""
+
+    def test_best_of_strategies(self, data_inputs):
+        result = run_portfolio(1451, data_inputs, strategies=["greedy", "longest", "local"], deadline=10.0)
+        done = [name for name, r in result["results"].items() if r["status"] == "done"]
+        assert set(done) == {"greedy", "longest", "local"}
+        assert result["best"] == min(done, key=lambda name: completion_score(result["results"][name]["completion"]))
+        assert result["completion"].get_length_error() <= solve(1451, data_inputs).get_length_error()
+
+    def test_failed_strategy_reported(self, data_inputs):
+        result = run_portfolio(2247, data_inputs, strategies=["greedy", "shortest"], deadline=10.0)
+        assert result["results"]["shortest"]["status"] == "failed"
+        assert result["best"] == "greedy"
+
+    def test_deadline(self, data_inputs):
+        result = run_portfolio(1451, data_inputs, strategies=["greedy", "random"], deadline=0.5)
+        assert result["seconds"] < 1.5
+        assert result["results"]["greedy"]["status"] == "done"
+
+    def test_stops_within_tolerance(self, data_inputs):
+        result = run_portfolio(1451, data_inputs, strategies=["greedy", "random"], deadline=20.0, tolerance=5.0)
+        assert result["seconds"] < 10.0
+        assert result["results"]["random"]["status"] == "stopped"
+
+    def test_unknown_strategy(self, data_inputs):
+        with pytest.raises(ValueError, match="Unknown strategy"):
+            run_portfolio(1451, data_inputs, strategies=["exhaustive"])
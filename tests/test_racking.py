@@ -0,0 +1,49 @@
+"""
+Tests for the racking order optimizer in racking.py
+"""
+
+import pytest
+from racking import optimize_racking
+from utils import plan_completion
+
+
+def solve(goal, triples, doubles, data_inputs):
+    return plan_completion(goal, triples, doubles, data_inputs["singles"], data_inputs["pups"], data_inputs["assembly_tally"], data_inputs["casing_tally"])
+
+
+def optimize(goal, data_inputs, **kwargs):
+    return optimize_racking(goal, data_inputs["triples"], data_inputs["doubles"], data_inputs["singles"], data_inputs["pups"],
+                            data_inputs["assembly_tally"], data_inputs["casing_tally"], **kwargs)
+
+
+class TestOptimizeRacking:
+    """Test the search over rack orders"""
+
+    def test_same_stands_racked(self, data_inputs):
+        triples, doubles, _ = optimize(1000, data_inputs, time_budget=1.0)
+        assert sorted(id(stand) for stand in triples) == sorted(id(stand) for stand in data_inputs["triples"])
+        assert sorted(id(stand) for stand in doubles) == sorted(id(stand) for stand in data_inputs["doubles"])
+
+    def test_racking_order_reproduces_completion(self, data_inputs):
+        triples, doubles, completion = optimize(1000, data_inputs, time_budget=1.0)
+        resolved = solve(1000, triples, doubles, data_inputs)
+        assert [element.id for element in resolved.solution] == [element.id for element in completion.solution]
+        assert resolved.length == completion.length
+
+    @pytest.mark.parametrize("goal", [1000, 1500])
+    def test_error_not_worse(self, data_inputs, goal):
+        initial = solve(goal, data_inputs["triples"], data_inputs["doubles"], data_inputs)
+        _, _, completion = optimize(goal, data_inputs, time_budget=1.0)
+        assert completion.done
+        assert abs(goal - completion.length) <= abs(goal - initial.length)
+
+    def test_input_stands_not_changed(self, data_inputs):
+        before = [stand.id for stand in data_inputs["triples"]]
+        optimize(1000, data_inputs, time_budget=0.5)
+        assert [stand.id for stand in data_inputs["triples"]] == before
+
+    def test_no_completion(self, data_inputs):
+        """Too few stands and pipes for the well: the search keeps the order and reports no completion"""
+        triples, doubles, completion = optimize_racking(2247, data_inputs["triples"][:3], [], [], [], data_inputs["assembly_tally"],
+                                                        data_inputs["casing_tally"], time_budget=0.5)
+        assert completion is None
@@ -0,0 +1,73 @@
+"""
+Tests for the running tally mode in running.py
+"""
+
+import pytest
+from running import RunningTally
+from utils import create_deck_tally
+
+
+@pytest.fixture
+def running_tally(data_inputs):
+    deck_tally = create_deck_tally(data_inputs["triples"], data_inputs["doubles"], data_inputs["singles"], data_inputs["pups"])
+    return RunningTally(2247, deck_tally, data_inputs["assembly_tally"], data_inputs["casing_tally"])
+
+
+class TestRunningTally:
+    """Test live updates of the plan from run events"""
+
+    def test_initial_plan(self, running_tally):
+        assert running_tally.plan.done
+        assert running_tally.as_run.solution == []
+
+    def test_running_the_plan_lands_as_planned(self, running_tally):
+        planned = [element.id for element in running_tally.plan.solution]
+        error = round(2247 - running_tally.plan.length, 3)
+        for id in planned:
+            report = running_tally.handle_event({"type": "run", "id": id})
+            assert report["plan_found"]
+            assert report["projected_error"] == error
+        assert report["landed"]
+        assert [element.id for element in running_tally.as_run.solution] == planned
+
+    def test_laid_out_stand_is_replaced(self, running_tally):
+        for id in [element.id for element in running_tally.plan.solution[:3]]:
+            running_tally.handle_event({"type": "run", "id": id})
+        rejected = running_tally.next_planned().id
+        report = running_tally.handle_event({"type": "laid_out", "id": rejected})
+        assert report["plan_found"]
+        assert rejected not in report["remaining"]
+        assert report["run"] == 3
+
+    def test_measured_length_moves_projection(self, running_tally):
+        first = running_tally.next_planned()
+        second = running_tally.plan.solution[1]
+        running_tally.handle_event({"type": "run", "id": first.id})
+        report = running_tally.handle_event({"type": "run", "id": second.id, "length": second.length + 0.5})
+        assert report["run_length"] == round(first.length + second.length + 0.5, 3)
+        assert running_tally.as_run.solution[1].length == round(second.length + 0.5, 3)
+        assert second.length != running_tally.as_run.solution[1].length # Original is unchanged
+
+    def test_report_latency(self, running_tally):
+        report = running_tally.handle_event({"type": "run", "id": running_tally.next_planned().id})
+        assert "elapsed_ms" in report
+        assert report["elapsed_ms"] < 1000
+
+    def test_unknown_pipe(self, running_tally):
+        with pytest.raises(ValueError, match="is not on deck"):
+            running_tally.handle_event({"type": "laid_out", "id": "no such pipe"})
+
+    def test_deck_runs_out(self, data_inputs):
+        """Without enough stands and pipes there is no plan, the events are still handled"""
+        deck_tally = create_deck_tally([], [], data_inputs["singles"][:5], data_inputs["pups"])
+        running_tally = RunningTally(2247, deck_tally, data_inputs["assembly_tally"], data_inputs["casing_tally"])
+        assert running_tally.plan is None
+        report = running_tally.handle_event({"type": "laid_out", "id": data_inputs["singles"][0].id})
+        assert not report["plan_found"]
+
+    def test_assemblies_of_caller_unchanged(self, data_inputs):
+        deck_tally = create_deck_tally(data_inputs["triples"], data_inputs["doubles"], data_inputs["singles"], data_inputs["pups"])
+        flags = [vars(assembly).copy() for assembly in data_inputs["assembly_tally"]]
+        running_tally = RunningTally(2247, deck_tally, data_inputs["assembly_tally"], data_inputs["casing_tally"])
+        running_tally.handle_event({"type": "run", "id": running_tally.next_planned().id})
+        assert [vars(assembly) for assembly in data_inputs["assembly_tally"]] == flags
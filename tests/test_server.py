@@ -0,0 +1,86 @@
+"""
+Tests for the planning server in server.py
+"""
+
+import asyncio
+import os
+import pytest
+from loader import default_sources
+import server
+from server import PlanningServer, request_plan
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data") + "/"
+
+
+@pytest.fixture(scope="module")
+def planning_server():
+    return PlanningServer(default_sources(DATA), workers=2, use_cache=False, use_processes=False)
+
+
+def run(planning_server, *requests):
+    """Start the server on a free port, send the requests concurrently and return the replies"""
+    async def session():
+        server = await planning_server.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await asyncio.gather(*(request_plan(request, port=port) for request in requests))
+        finally:
+            server.close()
+            await server.wait_closed()
+    return asyncio.run(session())
+
+
+class TestPlanningServer:
+    """Test plan requests over the JSON API"""
+
+    def test_plan_request(self, planning_server):
+        reply, = run(planning_server, {"depth": 2247, "request_id": 7})
+        assert reply["ok"]
+        assert reply["done"]
+        assert reply["request_id"] == 7
+        assert 0 <= reply["error"] < 5
+        assert reply["depths"][0][0] == "assy_11_tubinghanger"
+        assert reply["depths"][-1][0] == "assy_1_muleshoe"
+
+    def test_concurrent_requests(self, planning_server):
+        replies = run(planning_server, {"depth": 2247}, {"depth": 2100}, {"depth": 2247})
+        assert all(reply["ok"] for reply in replies)
+        assert replies[0]["solution"] == replies[2]["solution"]
+        assert replies[1]["goal"] == 2100
+
+    def test_excluded_pipes_are_not_used(self, planning_server):
+        first, = run(planning_server, {"depth": 2247})
+        pup = next(id for id in first["solution"] if str(id).startswith("P"))
+        reply, = run(planning_server, {"depth": 2247, "overrides": {"exclude_pipes": [pup]}})
+        assert reply["ok"]
+        assert pup not in reply["solution"]
+
+    def test_excluded_stands_are_not_used(self, planning_server):
+        first, = run(planning_server, {"depth": 2247})
+        reply, = run(planning_server, {"depth": 2247, "overrides": {"exclude_stands": [5, "Dbl1"]}})
+        assert reply["ok"]
+        assert 5 in first["solution"]
+        assert 5 not in reply["solution"] and "Dbl1" not in reply["solution"]
+
+    def test_excluded_pipe_drops_its_stand(self, planning_server):
+        """Pipe 5 is racked in triple stand 46, triple stand 5 has other pipes"""
+        stand = next(stand for stand in server._inputs["triples"] if 5 in [pipe.id for pipe in stand.pipes])
+        first, = run(planning_server, {"depth": 2247})
+        reply, = run(planning_server, {"depth": 2247, "overrides": {"exclude_pipes": [5]}})
+        assert reply["ok"]
+        assert stand.id in first["solution"] and stand.id not in reply["solution"]
+        assert 5 in reply["solution"]
+
+    def test_solver_modes(self, planning_server):
+        greedy, longest = run(planning_server, {"depth": 1451, "mode": "greedy"}, {"depth": 1451, "mode": "longest"})
+        assert greedy["ok"] and longest["ok"]
+        assert greedy["solution"] != longest["solution"]
+        any_order, = run(planning_server, {"depth": 1451, "mode": "any_order"})
+        assert any_order["ok"]
+        assert any_order["error"] <= greedy["error"]
+
+    def test_invalid_requests(self, planning_server):
+        unknown_mode, bad_json = run(planning_server, {"depth": 2247, "mode": "magic"}, {"no_depth": 1})
+        assert not unknown_mode["ok"]
+        assert "Unknown solver mode" in unknown_mode["error"]
+        assert not bad_json["ok"]
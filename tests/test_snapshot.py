@@ -0,0 +1,70 @@
+"""
+Tests for the deck snapshots in snapshot.py
+"""
+
+import copy
+import pytest
+from campaign import plan_wells
+from snapshot import DeckSnapshot
+from utils import create_deck_tally, generate_completion_tally
+
+
+def deck(inputs):
+    return create_deck_tally(inputs["triples"], inputs["doubles"], inputs["singles"], inputs["pups"])
+
+
+def solve(goal, deck_tally, inputs):
+    return generate_completion_tally(goal, deck_tally, [copy.copy(assembly) for assembly in inputs["assembly_tally"]], inputs["casing_tally"])
+
+
+def content(deck_tally):
+    return [[(stand.id, stand.length, [pipe.id for pipe in stand.pipes]) for stand in tally.stands] if hasattr(tally, "stands")
+            else [(pipe.id, pipe.length, pipe.pup) for pipe in tally.pipes] for tally in deck_tally]
+
+
+class TestDeckSnapshot:
+    """Test snapshots of the leftover tally as the deck of the next well"""
+
+    def test_leftover_snapshot(self, data_inputs):
+        completion = solve(1000, deck(data_inputs), data_inputs)
+        snapshot = completion.leftover_snapshot()
+        assert content(snapshot.deck_tally()) == content(completion.leftover_tally)
+        assert snapshot.counts() == {tally.type: len(tally.stands if hasattr(tally, "stands") else tally.pipes) for tally in completion.leftover_tally}
+
+        # The solver uses up its own racks and piles, the snapshot is unchanged
+        second = solve(1000, snapshot, data_inputs)
+        assert second.done
+        assert snapshot == completion.leftover_snapshot()
+        assert content(snapshot.deck_tally()) == content(completion.leftover_tally)
+
+        # Same as solving from the leftover tally itself
+        expected = solve(1000, completion.leftover_tally, data_inputs)
+        assert [element.id for element in second.solution] == [element.id for element in expected.solution]
+
+    def test_immutable(self, data_inputs):
+        snapshot = DeckSnapshot.from_deck_tally(deck(data_inputs))
+        with pytest.raises(AttributeError):
+            snapshot.tallies = ()
+        with pytest.raises(TypeError):
+            snapshot.tallies[0][2][0] = None
+        assert hash(snapshot) == hash(DeckSnapshot.from_deck_tally(deck(data_inputs)))
+
+    def test_save_and_load(self, data_inputs, tmp_path):
+        completion = solve(1000, deck(data_inputs), data_inputs)
+        snapshot = completion.leftover_snapshot()
+        snapshot.save(str(tmp_path / "leftover.json"))
+        loaded = DeckSnapshot.load(str(tmp_path / "leftover.json"))
+        assert loaded == snapshot
+        assert [type(pipe.id) for pipe in loaded.deck_tally()[2].pipes] == [type(pipe.id) for pipe in completion.leftover_tally[2].pipes]
+
+    def test_inputs(self, data_inputs):
+        inputs = DeckSnapshot.from_deck_tally(deck(data_inputs)).inputs()
+        for key in ("triples", "doubles", "singles", "pups"):
+            assert [item.id for item in inputs[key]] == [item.id for item in data_inputs[key]]
+        assert sorted(pipe.id for pipe in inputs["deck_tally"]) == sorted(pipe.id for pipe in data_inputs["deck_tally"])
+        assert all(pipe.pup for pipe in inputs["pups"])
+
+    def test_campaign_from_snapshot(self, data_inputs):
+        spec = {"name": "A", "depth": 800, "assembly_tally": data_inputs["assembly_tally"], "casing_tally": data_inputs["casing_tally"]}
+        snapshot = DeckSnapshot.from_deck_tally(deck(data_inputs))
+        assert plan_wells([spec], snapshot)["completions"]["A"].done
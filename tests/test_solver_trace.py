@@ -0,0 +1,95 @@
+"""
+Tests for the solver trace and replay in solver_trace.py
+"""
+
+import copy
+import numpy as np
+import pytest
+from solver_trace import SolverTrace, diff, replay
+from utils import create_deck_tally, generate_completion_tally, select_longest
+
+
+def solve(inputs, goal=2247, trace=None, selector=None):
+    deck_tally = create_deck_tally(inputs["triples"], inputs["doubles"], inputs["singles"], inputs["pups"])
+    assemblies = [copy.copy(assembly) for assembly in inputs["assembly_tally"]]
+    if selector is None:
+        return generate_completion_tally(goal, deck_tally, assemblies, inputs["casing_tally"], trace=trace)
+    return generate_completion_tally(goal, deck_tally, assemblies, inputs["casing_tally"], selector=selector, trace=trace)
+
+
+def deck(inputs):
+    return create_deck_tally(inputs["triples"], inputs["doubles"], inputs["singles"], inputs["pups"])
+
+
+class TestSolverTrace:
+    """Test the records and the ring buffer"""
+
+    def test_one_record_per_element(self, data_inputs):
+        trace = SolverTrace()
+        completion = solve(data_inputs, trace=trace)
+        records = trace.records()
+        placed = [record["chosen"][1] for record in records if record["placed"]]
+        assert placed == [element.id for element in completion.solution]
+        assert records[-1]["length"] == pytest.approx(completion.length)
+        assert {record["phase"] for record in records} <= {"assembly", "clear", "fill", "top"}
+        for record in records:
+            assert record["cleared"] <= record["candidates"]
+            if record["phase"] == "clear":
+                assert record["cleared"] > 0 and record["failed"]
+            # The clear flags of the top assembly are not used by the solver
+            if record["phase"] == "assembly" and record is not records[-1]:
+                assert record["failed"] == []
+
+    def test_same_solution_with_trace(self, data_inputs):
+        completion = solve(data_inputs, trace=SolverTrace())
+        assert [element.id for element in completion.solution] == [element.id for element in solve(data_inputs).solution]
+
+    def test_ring_buffer(self, data_inputs):
+        full = SolverTrace()
+        solve(data_inputs, trace=full)
+        small = SolverTrace(capacity=10)
+        solve(data_inputs, trace=small)
+        assert len(small) == 10
+        assert small.dropped == len(full) - 10
+        assert small.records() == full.records()[-10:]
+        with pytest.raises(ValueError):
+            replay(small, 2247, deck(data_inputs), data_inputs["assembly_tally"], data_inputs["casing_tally"])
+
+    def test_recording_does_not_allocate(self, data_inputs):
+        """Records are written into the preallocated arrays, only the table of chosen stands/pipes grows.
+        The time of a solve with and without a trace is reported by benchmark.py."""
+        trace = SolverTrace(capacity=64)
+        arrays = {name: (array, array.nbytes) for name, array in vars(trace).items() if isinstance(array, np.ndarray)}
+        completion = solve(data_inputs, trace=trace)
+        assert trace.count > trace.capacity
+        for name, (array, nbytes) in arrays.items():
+            assert getattr(trace, name) is array and array.nbytes == nbytes
+        # One entry per distinct assembly or stand/pipe chosen, plus the one that passed the goal
+        assert len(trace.items) <= len(completion.solution) + 1
+
+
+class TestReplay:
+    """Test replaying a trace"""
+
+    def test_replay_reproduces_solve(self, data_inputs):
+        trace = SolverTrace()
+        completion = solve(data_inputs, trace=trace)
+        replayed, new_trace = replay(trace, 2247, deck(data_inputs), data_inputs["assembly_tally"], data_inputs["casing_tally"],
+                                     selector=select_longest)
+        assert [element.id for element in replayed.solution] == [element.id for element in completion.solution]
+        assert diff(trace, new_trace) is None
+
+    def test_replay_to_step_then_other_selector(self, data_inputs):
+        trace = SolverTrace()
+        solve(data_inputs, trace=trace)
+        other = SolverTrace()
+        solve(data_inputs, trace=other, selector=select_longest)
+        first = diff(trace, other)
+        assert first is not None
+
+        # Following the trace up to a step before the solves diverge, the longest selector gives its own solve
+        choices_before = sum(1 for record in trace.records()[:first["index"]] if record["phase"] != "assembly")
+        _, new_trace = replay(trace, 2247, deck(data_inputs), data_inputs["assembly_tally"], data_inputs["casing_tally"],
+                              steps=choices_before, selector=select_longest)
+        assert diff(new_trace, other) is None
+        assert diff(new_trace, trace)["index"] == first["index"]
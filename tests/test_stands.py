@@ -0,0 +1,98 @@
+"""
+Tests for the stand building optimizer in stands.py
+"""
+
+import statistics
+import pytest
+from pipes import Pipe
+from stands import build_stands, swap_pass, stand_windows
+from utils import get_triple_stands_from_file, write_racked_tubing, get_num_stands_required
+
+
+@pytest.fixture
+def step_2_completion(data_inputs):
+    return get_num_stands_required(2247, data_inputs["deck_tally"], data_inputs["assembly_tally"], data_inputs["casing_tally"])
+
+
+def run_deviations(triples, doubles, windows):
+    """Length of the stands of each run minus the window length, taking the stands from the outside of the racks"""
+    triples, doubles = list(reversed(triples)), list(reversed(doubles))
+    deviations = []
+    for num_triples, num_doubles, length in windows:
+        deviations.append(sum(stand.length for stand in triples[:num_triples] + doubles[:num_doubles]) - length)
+        triples, doubles = triples[num_triples:], doubles[num_doubles:]
+    return deviations
+
+
+class TestBuildStands:
+    """Test partitioning of tubing joints into stands"""
+
+    def test_counts_and_joints(self, data_inputs):
+        tally = data_inputs["deck_tally"]
+        triples, doubles, singles = build_stands(tally, 20, 4)
+        assert len(triples) == 20 and all(stand.num_pipes == 3 for stand in triples)
+        assert len(doubles) == 4 and all(stand.num_pipes == 2 for stand in doubles)
+        used = [pipe for stand in triples + doubles for pipe in stand.pipes] + singles
+        assert sorted(id(pipe) for pipe in used) == sorted(id(pipe) for pipe in tally)
+
+    def test_stand_numbering(self, data_inputs):
+        triples, doubles, _ = build_stands(data_inputs["deck_tally"], 3, 2)
+        assert [stand.id for stand in triples] == [1, 2, 3]
+        assert [stand.id for stand in doubles] == ["Dbl1", "Dbl2"]
+
+    def test_shortest_and_longest_kept_as_singles(self, data_inputs):
+        tally = data_inputs["deck_tally"]
+        _, _, singles = build_stands(tally, 40, 0)
+        lengths = sorted(pipe.length for pipe in tally)
+        assert min(pipe.length for pipe in singles) == lengths[0]
+        assert max(pipe.length for pipe in singles) == lengths[-1]
+
+    def test_stands_more_even_than_racked(self, data_inputs):
+        num_triples = len(data_inputs["triples"])
+        triples, _, _ = build_stands(data_inputs["deck_tally"], num_triples, 0)
+        spread = statistics.pstdev(stand.length for stand in triples)
+        assert spread < statistics.pstdev(stand.length for stand in data_inputs["triples"])
+        assert max(stand.length for stand in triples) - min(stand.length for stand in triples) < 0.1
+
+    def test_swaps_balance_stands(self):
+        groups = [[Pipe(i, 10) for i in range(3)], [Pipe(i, 12) for i in range(3, 6)]]
+        sums = [30, 36]
+        while swap_pass(groups, sums, [33, 33]):
+            pass
+        assert sorted(sums) == [32, 34]
+        assert sorted(sum(pipe.length for pipe in group) for group in groups) == [32, 34]
+
+    def test_not_enough_joints(self, data_inputs):
+        with pytest.raises(ValueError, match="need"):
+            build_stands(data_inputs["deck_tally"], 100, 0)
+
+    def test_output_feeds_file_reader(self, tmp_path, data_inputs):
+        path = str(tmp_path / "racked_tubing.csv")
+        triples, doubles, _ = build_stands(data_inputs["deck_tally"], 10, 2)
+        write_racked_tubing(path, triples, doubles, start_row=2, end_row=31)
+        stands = get_triple_stands_from_file(path, None, 'F', 2, 31, data_inputs["deck_tally"])
+        assert [stand.length for stand in stands] == [stand.length for stand in triples]
+
+
+class TestStandWindows:
+    """Test building the stands toward the lengths between the assemblies of Step 2"""
+
+    def test_windows_match_step_2_counts(self, step_2_completion):
+        windows = stand_windows(step_2_completion)
+        counts = step_2_completion.get_number_of_pipe_types()
+        assert sum(window[0] for window in windows) == counts["triples"]
+        assert sum(window[1] for window in windows) == counts["doubles"]
+        assert len(windows) > 1
+
+    def test_runs_close_to_windows(self, data_inputs, step_2_completion):
+        windows = stand_windows(step_2_completion)
+        counts = step_2_completion.get_number_of_pipe_types()
+        triples, doubles, _ = build_stands(data_inputs["deck_tally"], counts["triples"], counts["doubles"], windows=windows)
+        even = run_deviations(*build_stands(data_inputs["deck_tally"], counts["triples"], counts["doubles"])[:2], windows)
+        deviations = run_deviations(triples, doubles, windows)
+        assert max(abs(deviation) for deviation in deviations) < 0.05
+        assert max(abs(deviation) for deviation in deviations) < max(abs(deviation) for deviation in even)
+
+    def test_windows_must_match_counts(self, data_inputs, step_2_completion):
+        with pytest.raises(ValueError, match="windows"):
+            build_stands(data_inputs["deck_tally"], 1, 0, windows=stand_windows(step_2_completion))
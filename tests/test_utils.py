@@ -5,14 +5,23 @@ Tests for utility functions in utils.py
 import pytest
 import os
 import tempfile
+import tracemalloc
 import pandas as pd
 from utils import (
     extract_casing_joints, 
     extract_deck_tally, 
     extract_ids, 
     extract_csv_rows_to_list,
+    stream_deck_tally,
+    stream_ids,
     get_num_pipes_required,
-    ids_to_pipes
+    ids_to_pipes,
+    create_deck_tally,
+    generate_completion_tally,
+    replan_completion,
+    triple_stands_from_ids,
+    double_stands_from_ids,
+    write_racked_tubing
 )
 from pipes import Pipe
 
@@ -115,6 +124,75 @@ class TestCSVImportFunctions:
             os.unlink(f.name)
 
 
+class TestStreamingReaders:
+    """Test chunked reading of row ranges"""
+
+    @pytest.fixture
+    def long_csv_file(self, tmp_path):
+        path = tmp_path / "long.csv"
+        lines = ["ID,Length"] + [f"{i},{10 + i/1000}" for i in range(1, 1001)]
+        path.write_text("\n".join(lines) + "\n")
+        return str(path)
+
+    def test_chunks_are_bounded(self, long_csv_file):
+        chunks = list(stream_ids(long_csv_file, 'A', 101, 350, chunk_size=100))
+        assert [len(chunk) for chunk in chunks] == [100, 100, 50]
+        assert chunks[0][0] == 101
+        assert chunks[-1][-1] == 350
+
+    def test_stream_matches_extract(self, long_csv_file):
+        streamed = []
+        for chunk in stream_deck_tally(long_csv_file, 'B', 5, 995, chunk_size=64):
+            streamed += chunk
+        assert streamed == extract_deck_tally(long_csv_file, 'B', 5, 995)
+
+    def test_reading_stops_at_end_row(self, tmp_path):
+        """Rows after the end row are never parsed, here they are malformed"""
+        path = tmp_path / "truncated.csv"
+        path.write_text("ID,Length\n1,11.5\n2,12.0\n3,11.8,x,y,z\n\"unterminated\n")
+        assert extract_ids(str(path), 'A', 1, 2) == [1, 2]
+
+    def test_out_of_bounds_end_row(self, long_csv_file):
+        with pytest.raises(ValueError, match="Row range .* is out of bounds"):
+            list(stream_ids(long_csv_file, 'A', 990, 1010, chunk_size=5))
+
+    def test_rows_counted_as_dataframe_rows(self, tmp_path):
+        """Blank lines and quoted line breaks do not shift the row range"""
+        path = tmp_path / "blank_lines.csv"
+        path.write_text('ID,Note\n1,a\n\n2,"two\nlines"\n3,b\n4,c\n')
+        for start_row in range(1, 5):
+            assert extract_ids(str(path), 'A', start_row, 4) == pd.read_csv(path)['ID'].iloc[start_row-1:4].tolist()
+
+    def test_memory_does_not_grow_with_start_row(self, tmp_path):
+        path = tmp_path / "longer.csv"
+        path.write_text("ID\n" + "\n".join(str(i) for i in range(1, 200001)) + "\n")
+        tracemalloc.start()
+        assert extract_ids(str(path), 'A', 199990, 200000)[0] == 199990
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert peak < 5_000_000
+
+
+class TestWriteRackedTubing:
+    """Test writing stands in the racked tubing layout"""
+
+    def test_round_trip(self, tmp_path, data_inputs):
+        path = str(tmp_path / "racked_tubing.csv")
+        triples = list(reversed(data_inputs["triples"]))
+        write_racked_tubing(path, triples, data_inputs["doubles"], start_row=2, end_row=150)
+        assert extract_ids(path, 'F', 2, 150) == [round(pipe.id) for stand in triples for pipe in stand.pipes]
+
+        stands = triple_stands_from_ids(extract_ids(path, 'F', 2, 150), data_inputs["deck_tally"])
+        assert [stand.length for stand in stands] == [stand.length for stand in triples]
+        assert [stand.id for stand in stands] == list(range(1, len(triples)+1))   # Numbered again
+        doubles = double_stands_from_ids(extract_ids(path, 'O', 2, 9), data_inputs["deck_tally"])
+        assert [stand.length for stand in doubles] == [stand.length for stand in data_inputs["doubles"]]
+
+    def test_stands_do_not_fit(self, tmp_path, data_inputs):
+        with pytest.raises(ValueError, match="do not fit"):
+            write_racked_tubing(str(tmp_path / "racked_tubing.csv"), data_inputs["triples"], [], start_row=2, end_row=20)
+
+
 class TestUtilityFunctions:
     """Test utility calculation functions"""
     
@@ -173,6 +251,90 @@ class TestUtilityFunctions:
         assert result == []
 
 
+class TestWarmStart:
+    """Test solving from a previous completion at a nearby depth"""
+
+    def solve(self, goal, data_inputs, warm_start=None, checkpoints=False, triples=None):
+        deck_tally = create_deck_tally(triples if triples is not None else data_inputs["triples"], data_inputs["doubles"],
+                                       data_inputs["singles"], data_inputs["pups"])
+        return generate_completion_tally(goal, deck_tally, data_inputs["assembly_tally"], data_inputs["casing_tally"],
+                                         checkpoints=checkpoints, warm_start=warm_start)
+
+    def test_same_depth(self, data_inputs):
+        cold = self.solve(2247, data_inputs)
+        warm = self.solve(2247, data_inputs, warm_start=cold)
+        assert [e.id for e in warm.solution] == [e.id for e in cold.solution]
+        assert warm.length == cold.length
+
+    def test_nearby_depth_reuses_bottom(self, data_inputs):
+        prior = self.solve(2247, data_inputs)
+        warm = self.solve(2249.5, data_inputs, warm_start=prior)
+        assert warm.done
+        assert 0 <= warm.get_length_error() < 5
+        assert [e.id for e in warm.solution[:10]] == [e.id for e in prior.solution[:10]]
+        used = [id(e) for e in warm.solution]
+        assert len(used) == len(set(used))
+
+    def test_prior_from_other_deck(self, data_inputs):
+        prior = self.solve(2247, data_inputs)
+        warm = self.solve(2000, data_inputs, warm_start=prior, triples=data_inputs["triples"][:-1])
+        assert warm.done
+        assert prior.solution[1] not in warm.solution    # The outermost stand is not on deck
+
+    def test_checkpoints(self, data_inputs):
+        prior = self.solve(2247, data_inputs)
+        warm = self.solve(2240, data_inputs, warm_start=prior, checkpoints=True)
+        assert len(warm.checkpoints) == len(warm.solution)
+        replanned = replan_completion(warm, len(warm.solution)-3, data_inputs["assembly_tally"])
+        assert [e.id for e in replanned.solution] == [e.id for e in warm.solution]
+
+
+class TestReplanCompletion:
+    """Test re-solving a completion from a checkpoint"""
+
+    @pytest.fixture
+    def completion(self, data_inputs):
+        deck_tally = create_deck_tally(data_inputs["triples"], data_inputs["doubles"], data_inputs["singles"], data_inputs["pups"])
+        return generate_completion_tally(2247, deck_tally, data_inputs["assembly_tally"], data_inputs["casing_tally"], checkpoints=True)
+
+    def test_one_checkpoint_per_element(self, completion):
+        assert completion.done
+        assert len(completion.checkpoints) == len(completion.solution)
+
+    def test_replan_without_changes_gives_same_completion(self, completion, data_inputs):
+        for position in [0, 10, len(completion.solution)-1]:
+            replanned = replan_completion(completion, position, data_inputs["assembly_tally"])
+            assert [e.id for e in replanned.solution] == [e.id for e in completion.solution]
+            assert replanned.length == completion.length
+            assert replanned.num_pipe_types == completion.num_pipe_types
+
+    def test_replan_keeps_bottom_and_avoids_rejected_stand(self, completion, data_inputs):
+        position = 12
+        rejected = completion.solution[position]
+        replanned = replan_completion(completion, position, data_inputs["assembly_tally"], remove_stands=[rejected.id])
+        assert replanned.solution[:position] == completion.solution[:position]
+        assert rejected not in replanned.solution
+        assert replanned.done
+        assert 0 <= replanned.get_length_error() < 5
+
+    def test_replan_with_substituted_pipe(self, completion, data_inputs):
+        position = 12
+        stand = completion.solution[position]
+        old_pipe = stand.pipes[0]
+        new_pipe = Pipe(999, old_pipe.length)
+        replanned = replan_completion(completion, position, data_inputs["assembly_tally"], substitute={old_pipe.id: new_pipe})
+        assert replanned.solution[position].id == stand.id
+        assert replanned.solution[position].pipes[0] is new_pipe
+        assert replanned.solution[position].num_pipes == 3
+        assert stand.pipes[0] is old_pipe # The original completion is unchanged
+
+    def test_original_completion_is_unchanged(self, completion, data_inputs):
+        solution = list(completion.solution)
+        replan_completion(completion, 5, data_inputs["assembly_tally"], remove_stands=[completion.solution[5].id])
+        assert completion.solution == solution
+        assert len(completion.checkpoints) == len(solution)
+
+
 class TestFixtureData:
     """Test that our fixture files are valid"""
     
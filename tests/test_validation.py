@@ -0,0 +1,95 @@
+"""
+Tests for the input validation in validation.py
+"""
+
+import copy
+import pytest
+import server
+from pipes import AssemblyPipe, Pipe
+from utils import triple_stands_from_ids
+from validation import check_inputs, validate_inputs
+
+
+@pytest.fixture
+def inputs(data_inputs):
+    """Shallow copy of the inputs, with lists that can be changed"""
+    return {key: copy.copy(value) for key, value in data_inputs.items()}
+
+
+def checks(problems, severity="error"):
+    """{check: [ids of each report]}"""
+    found = {}
+    for problem in problems:
+        if problem["severity"] == severity:
+            found.setdefault(problem["check"], []).append(problem["ids"])
+    return found
+
+
+class TestValidateInputs:
+    """Test each check against inputs with one problem"""
+
+    def test_data_inputs(self, data_inputs):
+        problems = validate_inputs(data_inputs)
+        assert checks(problems) == {}
+        # The joints after the last whole stand are singles
+        assert checks(problems, "warning") == {"leftover_stand_ids": [[2, 3], [31]]}
+        assert check_inputs(data_inputs) == problems
+
+    def test_casing_mismatch(self, inputs):
+        inputs["casing_checks"] = inputs["casing_checks"] + [{"path": "liner_tally.csv", "report": [{"row": 104, "derived": 1508.2, "tally": None, "difference": None}]}]
+        assert checks(check_inputs(inputs), "warning")["casing_mismatch"] == [[104]]
+
+    def test_duplicate_ids(self, inputs):
+        inputs["deck_tally"].append(Pipe(inputs["deck_tally"][5].id, 11.9))
+        inputs["pups"].append(Pipe(inputs["pups"][0].id, 2.0, pup=True))
+        assert checks(validate_inputs(inputs))["duplicate_ids"] == [[inputs["deck_tally"][5].id], [inputs["pups"][0].id]]
+
+    def test_invalid_lengths(self, inputs):
+        inputs["deck_tally"] += [Pipe(1001, float("nan")), Pipe(1002, "12,1"), Pipe(1003, 0.0)]
+        assert checks(validate_inputs(inputs))["invalid_lengths"] == [[1001, 1002, 1003]]
+
+    def test_missing_stand_ids(self, inputs):
+        ids = [5000] + inputs["stand_ids"]["triples"][1:147]
+        inputs["stand_ids"] = {"triples": ids, "doubles": inputs["stand_ids"]["doubles"][:6]}
+        inputs["triples"] = triple_stands_from_ids(ids, inputs["deck_tally"])
+        problems = checks(validate_inputs(inputs))
+        assert problems["missing_stand_ids"] == [[5000]]
+        # The stand is built without the missing joint
+        assert problems["incomplete_stands"] == [[1]]
+
+    def test_reused_stand_ids(self, inputs):
+        inputs["stand_ids"] = {"triples": inputs["stand_ids"]["triples"][:147], "doubles": inputs["stand_ids"]["triples"][:2]}
+        assert checks(validate_inputs(inputs))["reused_stand_ids"] == [inputs["stand_ids"]["triples"][:2]]
+
+    def test_pups_in_stands(self, inputs):
+        pup = inputs["pups"][0]
+        inputs["triples"][0] = copy.copy(inputs["triples"][0])
+        inputs["triples"][0].pipes = inputs["triples"][0].pipes[:2] + [pup]
+        inputs["deck_tally"].append(Pipe(pup.id, pup.length))
+        assert checks(validate_inputs(inputs))["pups_in_stands"] == [[pup.id], [pup.id]]
+
+    def test_invalid_casing(self, inputs):
+        inputs["casing_tally"] += [float("nan"), -3.0]
+        assert checks(validate_inputs(inputs))["invalid_casing"] == [[len(inputs["casing_tally"]) - 2], [len(inputs["casing_tally"]) - 1]]
+
+    def test_invalid_assemblies(self, inputs):
+        inputs["assembly_tally"] = [AssemblyPipe("bad", float("nan"))] + inputs["assembly_tally"][:-1]
+        assert checks(validate_inputs(inputs))["invalid_assemblies"] == [["bad"], [inputs["assembly_tally"][-1].id]]
+
+    def test_without_stand_ids(self, inputs):
+        del inputs["stand_ids"]
+        assert validate_inputs(inputs) == []
+
+
+class TestCheckInputs:
+    """Test that broken inputs fail before solving"""
+
+    def test_raises(self, inputs):
+        inputs["deck_tally"].append(Pipe(1001, float("nan")))
+        with pytest.raises(ValueError, match="invalid_lengths"):
+            check_inputs(inputs)
+
+    def test_server_rejects_requests(self, monkeypatch):
+        monkeypatch.setattr(server, "_invalid", "Invalid inputs:\ninvalid_lengths")
+        with pytest.raises(ValueError, match="invalid_lengths"):
+            server.solve_request({"depth": 2247})
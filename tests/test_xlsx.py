@@ -0,0 +1,117 @@
+"""
+Tests for reading .xlsx workbooks and several slices of a sheet in one pass, in utils.py
+"""
+
+import os
+import pandas as pd
+import pytest
+import utils
+from loader import default_sources, load_inputs
+from utils import extract_deck_tally, extract_ids, get_deck_tally, read_slices, get_assemblies_from_file
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data") + "/"
+
+
+def write_workbook(csv_path, xlsx_path, sheet):
+    """Sheet with the rows of the CSV file, the header in the first row as in the original spreadsheets"""
+    openpyxl = pytest.importorskip("openpyxl")
+    df = pd.read_csv(csv_path, header=None, dtype=object)
+    workbook = openpyxl.Workbook()
+    workbook.active.title = "Cover"
+    worksheet = workbook.create_sheet(sheet)
+    for row in df.itertuples(index=False):
+        worksheet.append([to_number(cell) for cell in row])
+    workbook.save(xlsx_path)
+
+
+def to_number(cell):
+    if pd.isna(cell):
+        return None
+    try:
+        return float(cell)
+    except ValueError:
+        return cell
+
+
+class TestReadSlices:
+    """Test reading several slices of a CSV file in one pass"""
+
+    def test_same_as_columns(self):
+        path = DATA + "tubing_tally.csv"
+        slices = [("A", 20, 200), ("D", 20, 200), ("C", 25, 30)]
+        ids, lengths, mu_losses = [utils.deck_tally_values(values) for values in read_slices(path, slices)]
+        assert ids == extract_deck_tally(path, "A", 20, 200)
+        assert lengths == extract_deck_tally(path, "D", 20, 200)
+        assert mu_losses == extract_deck_tally(path, "C", 25, 30)
+
+    def test_out_of_bounds(self):
+        with pytest.raises(ValueError):
+            read_slices(DATA + "pups.csv", [("A", 25, 33), ("E", 25, 5000)])
+
+    def test_unknown_column(self):
+        with pytest.raises(ValueError, match="Column Z not found"):
+            read_slices(DATA + "pups.csv", [("A", 25, 33), ("Z", 25, 33)])
+
+    def test_deck_tally_one_pass(self, tmp_path):
+        # The cached path reads each column on its own
+        source = DATA + "tubing_tally.csv"
+        copied = str(tmp_path / "tubing_tally.csv")
+        with open(source) as f, open(copied, "w") as g:
+            g.write(f.read())
+        one_pass = get_deck_tally(copied, None, "A", "D", 20, 200, dt_column_mu_loss="C")
+        cached = get_deck_tally(copied, None, "A", "D", 20, 200, dt_column_mu_loss="C", use_cache=True)
+        assert [(p.id, p.length, p.mu_loss) for p in one_pass] == [(p.id, p.length, p.mu_loss) for p in cached]
+
+
+class TestXlsx:
+    """Test that a workbook gives the same inputs as its CSV export"""
+
+    def test_without_openpyxl(self, monkeypatch):
+        monkeypatch.setattr(utils, "openpyxl", None)
+        with pytest.raises(ImportError, match="openpyxl"):
+            extract_ids("tally.xlsx", "F", 2, 150)
+
+    def test_column(self, tmp_path):
+        path = str(tmp_path / "racked_tubing.xlsx")
+        write_workbook(DATA + "racked_tubing.csv", path, "Racked")
+        assert extract_ids(path, "F", 2, 150, "Racked") == extract_ids(DATA + "racked_tubing.csv", "F", 2, 150)
+        with pytest.raises(ValueError):
+            extract_ids(path, "F", 2, 5000, "Racked")
+
+    def test_load_inputs(self, tmp_path):
+        sources = default_sources(DATA)
+        names = {"tubing": "tubing_tally", "triples": "racked_tubing", "doubles": "racked_tubing", "pups": "pups"}
+        sheets = {}
+        for key, name in names.items():
+            path = str(tmp_path / (name + ".xlsx"))
+            if not os.path.exists(path):
+                write_workbook(DATA + name + ".csv", path, "Tally")
+            sources[key] = (path,) + sources[key][1:]
+            sheets[key] = "Tally"
+        for i, source in enumerate(sources["casing"]):
+            path = str(tmp_path / os.path.basename(source[0]).replace(".csv", ".xlsx"))
+            write_workbook(source[0], path, "Casing")
+            sources["casing"][i] = (path,) + source[1:]
+            sheets[f"casing {i+1}"] = "Casing"
+        sources["sheets"] = sheets
+
+        inputs, _ = load_inputs(sources)
+        expected, _ = load_inputs(default_sources(DATA))
+        for key in ("deck_tally", "singles", "pups", "triples", "doubles"):
+            assert [(item.id, item.length) for item in inputs[key]] == [(item.id, item.length) for item in expected[key]]
+        assert inputs["casing_tally"] == expected["casing_tally"]
+
+    def test_assemblies(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "assemblies.xlsx")
+        write_workbook(DATA + "assemblies.csv", path, "Assemblies")
+        openpyxl = pytest.importorskip("openpyxl")
+        workbook = openpyxl.load_workbook(path)
+        workbook["Assemblies"].append([None]*11)    # Empty rows at the end of the sheet
+        workbook.save(path)
+        # The sheet is streamed, never loaded whole
+        monkeypatch.setattr(pd, "read_excel", None)
+        attributes = lambda assembly: (assembly.id, assembly.length, assembly.lower_lim, assembly.upper_lim, assembly.sep_length,
+                                       assembly.sep_ea, assembly.critical_point, assembly.is_top_assembly, assembly.order_group)
+        assemblies = get_assemblies_from_file(path, sheet="Assemblies")
+        expected = get_assemblies_from_file(DATA + "assemblies.csv")
+        assert [attributes(assembly) for assembly in assemblies] == [attributes(assembly) for assembly in expected]
@@ -1,12 +1,28 @@
 from completion import Completion
 from pipes import AssemblyPipe, Pipe, Stand, Rack, Pile
+from cache import cached_extract
+from snapshot import DeckSnapshot
 import pandas as pd
 
-def get_deck_tally(dt_path, dt_sheet, dt_column_ids, dt_column_lengths, dt_start, dt_end, are_pups=False):
-    """Extract id and length of all pipes in deck tally from a CSV file"""
-
-    deck_tally_ids = extract_deck_tally(dt_path, dt_column_ids, dt_start, dt_end)
-    deck_tally_lengths = extract_deck_tally(dt_path, dt_column_lengths, dt_start, dt_end)
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+def get_deck_tally(dt_path, dt_sheet, dt_column_ids, dt_column_lengths, dt_start, dt_end, are_pups=False, use_cache=False, dt_column_mu_loss=None):
+    """Extract id and length of all pipes in deck tally from a CSV or .xlsx file (dt_sheet, the first sheet if None).
+    The make-up loss of each pipe is read from dt_column_mu_loss if given."""
+
+    columns = [dt_column_ids, dt_column_lengths] + ([dt_column_mu_loss] if dt_column_mu_loss else [])
+    if use_cache:
+        # Cached per column
+        values = [extract(extract_deck_tally, dt_path, column, dt_start, dt_end, use_cache=use_cache, sheet=dt_sheet) for column in columns]
+    else:
+        # All columns in one pass over the rows
+        values = [deck_tally_values(items) for items in read_slices(dt_path, [(column, dt_start, dt_end) for column in columns], sheet=dt_sheet)]
+    deck_tally_ids, deck_tally_lengths = values[:2]
+    if dt_column_mu_loss:
+        deck_tally_mu_losses = values[2]
 
     deck_tally = []
     for i, length in enumerate(deck_tally_lengths):
@@ -16,13 +32,20 @@ def get_deck_tally(dt_path, dt_sheet, dt_column_ids, dt_column_lengths, dt_start
         if are_pups == True:
             pipe.set_pup()
 
+        if dt_column_mu_loss and pd.notna(deck_tally_mu_losses[i]):
+            pipe.mu_loss = deck_tally_mu_losses[i]
+
         deck_tally.append(pipe)
     return deck_tally
 
-def get_triple_stands_from_file(path, sheet, column, start_row, stop_row, deck_tally):
+def get_triple_stands_from_file(path, sheet, column, start_row, stop_row, deck_tally, use_cache=False):
     """Get pipes in triple stands from CSV file and create the stands."""
 
-    pipe_ids = extract_ids(path, column, start_row, stop_row)
+    pipe_ids = extract(extract_ids, path, column, start_row, stop_row, use_cache=use_cache, sheet=sheet)
+    return triple_stands_from_ids(pipe_ids, deck_tally)
+
+def triple_stands_from_ids(pipe_ids, deck_tally):
+    """Create triple stands from a list of pipe ids, three consecutive ids per stand."""
     stands = []
     for i in range(len(pipe_ids)//3):
         stand_pipe_ids = pipe_ids[0:3]
@@ -31,10 +54,14 @@ def get_triple_stands_from_file(path, sheet, column, start_row, stop_row, deck_t
         stands.append(Stand(i+1, stand_pipes))
     return stands
 
-def get_double_stands_from_file(path, sheet, column, start_row, stop_row, deck_tally):
+def get_double_stands_from_file(path, sheet, column, start_row, stop_row, deck_tally, use_cache=False):
     """Get pipes in double stands from CSV file and create the stands."""
 
-    pipe_ids = extract_ids(path, column, start_row, stop_row)
+    pipe_ids = extract(extract_ids, path, column, start_row, stop_row, use_cache=use_cache, sheet=sheet)
+    return double_stands_from_ids(pipe_ids, deck_tally)
+
+def double_stands_from_ids(pipe_ids, deck_tally):
+    """Create double stands from a list of pipe ids, two consecutive ids per stand."""
     stands = []
     for i in range(len(pipe_ids)//2):
         stand_pipe_ids = pipe_ids[0:2]
@@ -43,14 +70,16 @@ def get_double_stands_from_file(path, sheet, column, start_row, stop_row, deck_t
         stands.append(Stand("Dbl"+str(i+1), stand_pipes))
     return stands
 
-def get_assemblies_from_file(path):
+def get_assemblies_from_file(path, use_cache=False, sheet=None):
     """Get assemblies from file.
     Warning: This function requires a strict structure on the assembly file."""
 
-    assembly_list = extract_csv_rows_to_list(path)
+    assembly_list = extract(extract_csv_rows_to_list, path, use_cache=use_cache, sheet=sheet)
+    order_groups = extract(extract_order_groups, path, use_cache=use_cache, sheet=sheet)
     assemblies = []
-    for row in assembly_list:
+    for row, order_group in zip(assembly_list, order_groups):
         new_assembly = AssemblyPipe(row[0], row[1], row[2], row[3], row[4], row[5], row[6], row[7])
+        new_assembly.order_group = order_group
         assemblies.append(new_assembly)
     return assemblies
 
@@ -92,6 +121,39 @@ def create_deck_tally(triples, doubles, singles, pups):
 
     return [triple_rack, double_rack, single_pile, pup_pile]
 
+def copy_deck_tally(deck_tally):
+    """New racks and piles with the same stands and pipes, so the copy can be used by the solver without changing deck_tally"""
+    if type(deck_tally) == DeckSnapshot:
+        return deck_tally.deck_tally()
+    new_deck_tally = []
+    for tally in deck_tally:
+        if type(tally) == Rack:
+            new_tally = Rack(tally.type)
+            new_tally.add_stands(list(tally.stands))
+        else:
+            new_tally = Pile(tally.type)
+            new_tally.add_pipes(list(tally.pipes))
+        new_deck_tally.append(new_tally)
+    return new_deck_tally
+
+def mm(length):
+    """Length in whole millimeters, so that sums of lengths are exact"""
+    return round(length*1000)
+
+def deck_signature(deck_tally):
+    """Racks are only ever taken from the outside, so the number of stands left identifies a rack."""
+    signature = []
+    for tally in deck_tally:
+        if type(tally) == Rack:
+            signature.append(len(tally.stands))
+        else:
+            signature.append(frozenset(id(pipe) for pipe in tally.pipes))
+    return tuple(signature)
+
+def completion_score(completion):
+    """Lower is better: landing error, then number of pups"""
+    return (round(completion.get_length_error(), 3), completion.num_pipe_types["pups"])
+
 def remove_stand_pipes_from_tally(stands, tally):
     new_tally = []
     stand_pipes = []
@@ -166,21 +228,113 @@ def get_num_stands_required(goal, ramco_tally, assembly_tally, casing_tally) ->
     return dummy_completion
 
 # Step 3 Find completion tally.
-def generate_completion_tally(goal, deck_tally, assembly_tally, casing_tally) -> Completion:
+def select_default(pipes, phase):
+    """Choose the next stand/pipe from pipes, sorted by length. phase is one of:
+    - "clear": the pipes that let the active assembly be placed after them
+    - "fill": all available pipes, when none of them let the assembly be placed
+    - "top": the pipes that do not pass the goal, below the top assembly
+    The shortest pipe that clears the assembly is used, otherwise the longest."""
+    if phase == "clear":
+        return pipes[0]
+    return pipes[-1]
+
+def select_longest(pipes, phase):
+    """Always the longest pipe, reaching each assembly with as few stands/pipes as possible"""
+    return pipes[-1]
+
+def select_shortest(pipes, phase):
+    """Always the shortest pipe, leaving the longest stands/pipes for the top section"""
+    return pipes[0]
+
+def generate_completion_tally(goal, deck_tally, assembly_tally, casing_tally, checkpoints=False, selector=select_default, warm_start=None, trace=None) -> Completion:
     """
     arguments:
     - goal: float
-    - deck_tally: [triple stand rack, double stand rack, singles, pups]
+    - deck_tally: [triple stand rack, double stand rack, singles, pups], or a DeckSnapshot, e.g. the leftover of a previous well
     - assembly_tally: [assy_1, ..., assy_n]
+    - checkpoints: record the solver state before each placed stand/pipe/assembly, see replan_completion
+    - selector: function choosing the next stand/pipe, see select_default
+    - warm_start: completion from a previous solve with the same inputs, e.g. at a nearby depth.
+      The part of it that is still valid is reused, see replay_completion
+    - trace: solver_trace.SolverTrace recording each decision of the solver
     """
 
     # Setup
+    if type(deck_tally) == DeckSnapshot:
+        deck_tally = deck_tally.deck_tally()
     completion = Completion(goal)
     completion.add_casing_joints(casing_tally)
-    max_iterations = goal//10 # Arbitrary number to avoid infinite loop
-    iteration = 0
-    num_assemblies = len(assembly_tally)
+    assembly_index, iteration = 0, 0
+    if warm_start is not None:
+        assembly_index, iteration = replay_completion(completion, warm_start, deck_tally, assembly_tally, checkpoints)
+    return continue_completion_tally(completion, deck_tally, assembly_tally, assembly_index, iteration, checkpoints=checkpoints, selector=selector, trace=trace)
+
+def replay_completion(completion, prior, deck_tally, assembly_tally, checkpoints=False):
+    """Place the bottom part of a prior solution that is still valid for the goal of completion.
+
+    The prior solution is followed while its stands/pipes can be taken from the deck tally (outermost
+    stand of a rack) without passing the goal, and its assemblies are clear at the new goal. The replay
+    then goes back to the last assembly placed, so the solver builds the rest of the string from there.
+    The top section is never replayed.
+
+    returns (assembly_index, iteration) to continue the solve from
+    """
+    # Find how much of the prior solution is valid, on a copy of the deck tally
+    trial = Completion(completion.goal)
+    trial.add_casing_joints(completion.casing_joints)
+    trial_deck_tally = copy_deck_tally(deck_tally)
+    assembly_index = 0
+    num_valid = 0   # Elements of the prior solution up to and including the last valid assembly
+    for i, element in enumerate(prior.solution):
+        if type(element) == AssemblyPipe:
+            if assembly_index >= len(assembly_tally) or assembly_tally[assembly_index].id != element.id:
+                break
+            assembly = assembly_tally[assembly_index]
+            if assembly.is_top_assembly:
+                break
+            assembly.update_all_clears(trial)
+            if not assembly.is_available():
+                break
+            trial.add_assembly_pipe(assembly)
+            assembly_index += 1
+            num_valid = i + 1
+        else:
+            pipe = take_from_tally(trial_deck_tally, element)
+            if pipe is None or trial.length + pipe.length > trial.goal:
+                break
+            trial.add_normal_pipe(pipe)
+
+    # Place the valid part
     assembly_index = 0
+    for i, element in enumerate(prior.solution[:num_valid]):
+        if checkpoints:
+            completion.add_checkpoint(deck_tally, assembly_index, i)
+        if type(element) == AssemblyPipe:
+            completion.add_assembly_pipe(assembly_tally[assembly_index])
+            assembly_index += 1
+        else:
+            completion.add_normal_pipe(take_from_tally(deck_tally, element))
+    return assembly_index, num_valid
+
+def take_from_tally(tally, pipe):
+    """Remove the stand/pipe with the same id as pipe from the tally, stands only from the outside of the rack.
+    Returns the removed stand/pipe, or None if it is not available."""
+    if pipe.num_pipes == 3 or pipe.num_pipes == 2:
+        rack = tally[0] if pipe.num_pipes == 3 else tally[1]
+        if rack.stands and rack.stands[-1].id == pipe.id:
+            return rack.remove_stand()
+        return None
+    elif pipe.pup == False:
+        return tally[2].remove_pipe(pipe.id)
+    return tally[3].remove_pipe(pipe.id)
+
+def continue_completion_tally(completion, deck_tally, assembly_tally, assembly_index=0, iteration=0, checkpoints=False, selector=select_default, trace=None) -> Completion:
+    """Main loop of step 3. Continues from the current state of the completion, where assembly_index
+    is the index of the next assembly to place and iteration is the number of iterations already used."""
+
+    # Setup
+    max_iterations = completion.goal//10 # Arbitrary number to avoid infinite loop
+    num_assemblies = len(assembly_tally)
     assembly = None
 
     # Main loop
@@ -207,25 +361,36 @@ def generate_completion_tally(goal, deck_tally, assembly_tally, casing_tally) ->
                 if current_completion_length + pipe.length <= completion.goal:
                     checked_available_pipes.append(pipe) # Add stands/pipes/pups which do not overshoot
 
+            if checkpoints:
+                completion.add_checkpoint(deck_tally, assembly_index, iteration)
+
             if checked_available_pipes == []:
                 completion.add_assembly_pipe(assembly)
+                if trace is not None:
+                    trace.record(iteration, assembly_index, "assembly", assembly, 0, 0, assembly, completion.length)
                 if completion.goal - completion.length < 5:     # Completion is done if error is less than 5 meters
                     completion.done = True
                     completion.add_leftover_tally(deck_tally)
                 else:                                           # Error raised if completion does not reach within 5 meters of goal
                     raise RuntimeError("No available pipes!")   # Currently have no handling of this.
             
-            # If there are any stands/pipes/pups which do not overshoot, add the longest one to the solution
+            # If there are any stands/pipes/pups which do not overshoot, add the longest one (by default) to the solution
             else:
-                longest_pipe = checked_available_pipes[-1]
-                completion.add_normal_pipe(longest_pipe)
-                deck_tally = remove_from_tally(deck_tally, longest_pipe)
+                next_pipe = selector(checked_available_pipes, "top")
+                completion.add_normal_pipe(next_pipe)
+                if trace is not None:
+                    trace.record(iteration, assembly_index, "top", assembly, len(available_pipes), len(checked_available_pipes), next_pipe, completion.length)
+                deck_tally = remove_from_tally(deck_tally, next_pipe)
             iteration += 1
             continue # Since the assembly is the final assembly, we can skip the next part of the main loop
 
         # If the active assembly is available, add it to the solution
         if assembly.is_available():
+            if checkpoints:
+                completion.add_checkpoint(deck_tally, assembly_index, iteration)
             completion.add_assembly_pipe(assembly)
+            if trace is not None:
+                trace.record(iteration, assembly_index, "assembly", assembly, 0, 0, assembly, completion.length)
             do_normal_pipe = False
             assembly_index += 1
             assembly = None
@@ -234,27 +399,33 @@ def generate_completion_tally(goal, deck_tally, assembly_tally, casing_tally) ->
             # Get and sort all available stands/pipes
             available_pipes = get_available_pipes_excluding_pups(deck_tally) # Excluding pups to avoid wasting the pups early on
             available_pipes = sorted(available_pipes)
-            checked_available_pipes = []
 
             # Check if any of the stands/pipes allow the assembly to be placed after
-            for pipe in available_pipes:
-                if assembly.check_all_clears_with_pipe(completion, pipe):
-                    checked_available_pipes.append(pipe)
+            clears = assembly.check_all_clears_with_pipes(completion, available_pipes)
+            checked_available_pipes = [pipe for pipe, clear in zip(available_pipes, clears) if clear]
             
-            # If there are no stands/pipes which allow the assembly to be placed, add the longest available.
+            # If there are no stands/pipes which allow the assembly to be placed, add the longest available (by default).
             if checked_available_pipes == []:
-                longest_pipe = available_pipes[-1]
-                if completion.length + longest_pipe.length <= completion.goal:
-                    completion.add_normal_pipe(longest_pipe)
-                    deck_tally = remove_from_tally(deck_tally, longest_pipe)
+                next_pipe = selector(available_pipes, "fill")
+                if completion.length + next_pipe.length <= completion.goal:
+                    if checkpoints:
+                        completion.add_checkpoint(deck_tally, assembly_index, iteration)
+                    completion.add_normal_pipe(next_pipe)
+                    deck_tally = remove_from_tally(deck_tally, next_pipe)
                 else:
                     completion.done = True
+                if trace is not None:
+                    trace.record(iteration, assembly_index, "fill", assembly, len(available_pipes), 0, next_pipe, completion.length, placed=not completion.done)
             
-            # If any stands/pipes allow the assembly to be placed, add the shortest available.
+            # If any stands/pipes allow the assembly to be placed, add the shortest available (by default).
             else:
-                shortest_pipe = checked_available_pipes[0]
-                completion.add_normal_pipe(shortest_pipe)
-                deck_tally = remove_from_tally(deck_tally, shortest_pipe)
+                next_pipe = selector(checked_available_pipes, "clear")
+                if checkpoints:
+                    completion.add_checkpoint(deck_tally, assembly_index, iteration)
+                completion.add_normal_pipe(next_pipe)
+                if trace is not None:
+                    trace.record(iteration, assembly_index, "clear", assembly, len(available_pipes), len(checked_available_pipes), next_pipe, completion.length)
+                deck_tally = remove_from_tally(deck_tally, next_pipe)
                 
             # Update the constraints for the assembly
             assembly.update_all_clears(completion)
@@ -262,140 +433,315 @@ def generate_completion_tally(goal, deck_tally, assembly_tally, casing_tally) ->
         iteration += 1
     return completion
 
+def replan_completion(completion, position, assembly_tally, remove_stands=(), remove_pipes=(), substitute=None) -> Completion:
+    """Re-solve a completion from the given position, keeping everything below it.
+    Used when a stand or pipe is rejected on the drill floor while running the completion.
+
+    arguments:
+    - completion: completion generated with checkpoints=True
+    - position: index in completion.solution of the first stand/pipe/assembly to re-solve (0 is the bottom)
+    - assembly_tally: the assemblies used for the original completion
+    - remove_stands: IDs of triple/double stands that can not be used
+    - remove_pipes: IDs of single pipes and pups that can not be used
+    - substitute: {old pipe id: new Pipe}, replaces a pipe in the remaining deck, also within stands
+    """
+    new_completion, deck_tally, assembly_index, iteration = completion.from_checkpoint(position)
+
+    for tally in deck_tally:
+        if type(tally) == Rack:
+            tally.stands = [stand for stand in tally.stands if stand.id not in remove_stands]
+        else:
+            tally.pipes = [pipe for pipe in tally.pipes if pipe.id not in remove_pipes]
+
+    for old_pipe_id, new_pipe in (substitute or {}).items():
+        for tally in deck_tally:
+            if type(tally) == Rack:
+                for i, stand in enumerate(tally.stands):
+                    if any(pipe.id == old_pipe_id for pipe in stand.pipes):
+                        # Change a copy, the stand may be part of other completions
+                        new_stand = Stand(stand.id, list(stand.pipes))
+                        new_stand.change_pipe(old_pipe_id, new_pipe)
+                        tally.stands[i] = new_stand
+            else:
+                tally.pipes = [new_pipe if pipe.id == old_pipe_id else pipe for pipe in tally.pipes]
+
+    return continue_completion_tally(new_completion, deck_tally, assembly_tally, assembly_index, iteration, checkpoints=True)
+
+def plan_completion(goal, triples, doubles, singles, pups, assembly_tally, casing_tally, solver=generate_completion_tally) -> Completion:
+    """Step 3 as run from main.py.
+    The first solve finds the length that can be reached, the second solve uses this length as the goal.
+    Each solve gets a new deck tally, since the solver removes the stands and pipes it uses."""
+    intermediate_completion = solver(goal, create_deck_tally(triples, doubles, singles, pups), assembly_tally, casing_tally)
+    completion_length = goal-intermediate_completion.get_length_error()
+    return solver(completion_length, create_deck_tally(triples, doubles, singles, pups), assembly_tally, casing_tally)
+
 
 # CSV Import Functions
-def extract_casing_joints(csv_path, column_letter, start_row, end_row):
+# The input files can also be .xlsx workbooks, read with openpyxl. Row numbers are the same as in the CSV
+# export of the sheet, where the first row of the sheet is the header: row 1 is the second row of the sheet.
+def extract(extract_function, path, *args, use_cache=False, sheet=None):
+    """Call one of the extract functions below, optionally through the binary input cache (see cache.py).
+    sheet is the name of the sheet for .xlsx files, the first sheet by default."""
+    if sheet is not None:
+        args += (sheet,)
+    if use_cache:
+        return cached_extract(extract_function, path, *args)
+    return extract_function(path, *args)
+
+def extract_casing_joints(csv_path, column_letter, start_row, end_row, sheet=None):
     """Extract casing joints from CSV file"""
-    # Convert the column letter to column index
+    numbers = []
+    for chunk in stream_casing_joints(csv_path, column_letter, start_row, end_row, sheet=sheet):
+        numbers += chunk
+    return numbers
+
+def extract_deck_tally(csv_path, column_letter, start_row, end_row, sheet=None):
+    """Extract deck tally from CSV file"""
+    values = []
+    for chunk in stream_deck_tally(csv_path, column_letter, start_row, end_row, sheet=sheet):
+        values += chunk
+    return values
+
+def extract_ids(csv_path, column_letter, start_row, end_row, sheet=None):
+    """Extract IDs from CSV file"""
+    numbers = []
+    for chunk in stream_ids(csv_path, column_letter, start_row, end_row, sheet=sheet):
+        numbers += chunk
+    return numbers
+
+# CSV Export Functions
+RACKED_TUBING_HEADER = ["Unnamed: 0", "Unnamed: 1", "Unnamed: 2", "Deck", "Length", "Original number", "Stand", "Finger",
+                        "Onshore length", "Diff", "Unnamed: 10", "Unnamed: 11", "Deck", "Length", "Original number", "Stand"]
+
+def write_racked_tubing(path, triples, doubles, start_row=2, end_row=None):
+    """Write the stands to a racked tubing file in the layout of data/racked_tubing.csv, first racked first.
+    Pipe IDs of the triples go in column F and of the doubles in column O, from start_row (same row numbers
+    as the readers). The file is padded with empty rows up to end_row, so it can be read with the row range
+    configured in loader.default_sources. Stands are numbered again when the file is read."""
+    rows = [[None]*len(RACKED_TUBING_HEADER) for _ in range(start_row - 1)]
+    for stands, first_column, name in ((triples, 4, lambda i: i+1), (doubles, 13, lambda i: "Dbl"+str(i+1))):
+        row = start_row - 1
+        for i, stand in enumerate(stands):
+            for j, pipe in enumerate(stand.pipes):
+                while len(rows) <= row:
+                    rows.append([None]*len(RACKED_TUBING_HEADER))
+                rows[row][first_column] = pipe.length          # E/N: Length
+                rows[row][first_column+1] = pipe.id            # F/O: Original number
+                if j == 0:
+                    rows[row][first_column+2] = name(i)        # G/P: Stand
+                row += 1
+
+    if end_row is not None:
+        if len(rows) > end_row:
+            raise ValueError(f"{len(rows)} rows of stands do not fit in rows {start_row}-{end_row}")
+        rows += [[None]*len(RACKED_TUBING_HEADER) for _ in range(end_row - len(rows))]
+
+    pd.DataFrame(rows, columns=RACKED_TUBING_HEADER).to_csv(path, index=False)
+
+# Streaming readers
+# These read only the requested row range of one column, in chunks of at most chunk_size rows,
+# so memory use does not depend on the size of the file.
+CHUNK_SIZE = 10000
+
+def stream_column(csv_path, column_letter, start_row, end_row, chunk_size=CHUNK_SIZE, sheet=None):
+    """Yield the raw values in rows start_row to end_row (1-based, inclusive) of one column.
+    Only the column is parsed, rows before start_row are dropped chunk by chunk, and reading stops at end_row."""
+    if is_xlsx(csv_path):
+        yield from stream_xlsx_column(csv_path, column_letter, start_row, end_row, chunk_size, sheet)
+        return
+
+    if start_row < 1:
+        raise ValueError(f"Row range {start_row}-{end_row} is out of bounds")
+
+    num_rows = end_row - start_row + 1
+    if num_rows <= 0:
+        return
+
+    rows_read = 0
+    for chunk in stream_csv_rows(csv_path, [column_letter], start_row, end_row, chunk_size):
+        rows_read += len(chunk)
+        yield chunk.iloc[:, 0].tolist()
+
+    # The file ended before end_row
+    if rows_read < num_rows:
+        raise ValueError(f"Row range {start_row}-{end_row} is out of bounds")
+
+def stream_csv_rows(csv_path, column_letters, start_row, end_row, chunk_size=CHUNK_SIZE):
+    """Yield DataFrame chunks of rows start_row to end_row (1-based, inclusive) of the columns, in column order.
+
+    The header is read once to check the columns, the rows are then read without it in chunks of at most
+    chunk_size rows. Rows before start_row are dropped chunk by chunk, so memory does not depend on start_row
+    (a skiprows list or range is held as a set of every skipped line number). Rows are counted as in
+    pd.read_csv(csv_path).iloc, blank lines are not rows."""
+    names = list(pd.read_csv(csv_path, nrows=0).columns)
+    column_indexes = []
+    for column_letter in column_letters:
+        column_index = ord(column_letter.upper()) - ord('A')
+        if column_index >= len(names):
+            raise ValueError(f"Column {column_letter} not found in CSV file")
+        column_indexes.append(column_index)
+
+    rows_seen = 0
+    with pd.read_csv(csv_path,
+                     header=None,
+                     names=names,
+                     usecols=sorted(set(column_indexes)),
+                     skiprows=1,            # The header
+                     nrows=end_row,
+                     chunksize=chunk_size) as reader:
+        for chunk in reader:
+            first = max(start_row - 1 - rows_seen, 0)
+            rows_seen += len(chunk)
+            if first < len(chunk):
+                yield chunk.iloc[first:]
+
+def stream_xlsx_column(xlsx_path, column_letter, start_row, end_row, chunk_size=CHUNK_SIZE, sheet=None):
+    """stream_column for .xlsx files. The sheet is streamed row by row in read-only mode, so the workbook
+    is never loaded into memory, and reading stops at end_row. Formulas give their last computed value."""
     column_index = ord(column_letter.upper()) - ord('A')
-    
-    # Load the CSV file
-    df = pd.read_csv(csv_path)
-    
-    # Get the column by index (0-based)
-    if column_index >= len(df.columns):
-        raise ValueError(f"Column {column_letter} not found in CSV file")
-    
-    column_name = df.columns[column_index]
-    
-    # Extract the specified rows (convert to 0-based indexing)
-    start_idx = start_row - 1
-    end_idx = end_row - 1
-    
-    if start_idx < 0 or end_idx >= len(df):
+    if start_row < 1:
         raise ValueError(f"Row range {start_row}-{end_row} is out of bounds")
-    
-    # Get the column data for the specified range
-    column_data = df[column_name].iloc[start_idx:end_idx+1]
-    
-    # Initialize a list to hold the numbers
+    num_rows = end_row - start_row + 1
+    if num_rows <= 0:
+        return
+
+    rows_read = 0
+    with open_sheet(xlsx_path, sheet) as worksheet:
+        if worksheet.max_column is not None and column_index >= worksheet.max_column:
+            raise ValueError(f"Column {column_letter} not found in sheet {worksheet.title}")
+        chunk = []
+        # Row 1 of the sheet is the header
+        for row in worksheet.iter_rows(min_row=start_row+1, max_row=end_row+1, min_col=column_index+1, max_col=column_index+1, values_only=True):
+            chunk.append(row[0] if row else None)
+            if len(chunk) == chunk_size:
+                rows_read += len(chunk)
+                yield chunk
+                chunk = []
+        if chunk:
+            rows_read += len(chunk)
+            yield chunk
+
+    # The sheet ended before end_row
+    if rows_read < num_rows:
+        raise ValueError(f"Row range {start_row}-{end_row} is out of bounds")
+
+def read_slices(path, slices, sheet=None):
+    """Raw values of several (column letter, start row, end row) slices of one CSV file or sheet, read in one
+    pass over the rows of the slices. Returns one list per slice."""
+    column_indexes = [ord(column_letter.upper()) - ord('A') for column_letter, _, _ in slices]
+    first_row = min(start_row for _, start_row, _ in slices)
+    last_row = max(end_row for _, _, end_row in slices)
+    values = [[] for _ in slices]
+
+    def add_row(row_number, row):
+        """row: {column index: value}"""
+        for i, (column_index, (_, start_row, end_row)) in enumerate(zip(column_indexes, slices)):
+            if start_row <= row_number <= end_row:
+                values[i].append(row.get(column_index))
+
+    if is_xlsx(path):
+        first_column = min(column_indexes)
+        with open_sheet(path, sheet) as worksheet:
+            if worksheet.max_column is not None and max(column_indexes) >= worksheet.max_column:
+                column_letter = slices[column_indexes.index(max(column_indexes))][0]
+                raise ValueError(f"Column {column_letter} not found in sheet {worksheet.title}")
+            rows = worksheet.iter_rows(min_row=first_row+1, max_row=last_row+1, min_col=first_column+1, max_col=max(column_indexes)+1, values_only=True)
+            for row_number, row in enumerate(rows, start=first_row):
+                add_row(row_number, {first_column + j: value for j, value in enumerate(row)})
+    else:
+        columns = sorted(set(column_indexes))
+        row_number = first_row
+        for chunk in stream_csv_rows(path, [column_letter for column_letter, _, _ in slices], first_row, last_row):
+            for row in chunk.itertuples(index=False):
+                add_row(row_number, dict(zip(columns, row)))
+                row_number += 1
+
+    for (column_letter, start_row, end_row), column in zip(slices, values):
+        if len(column) < end_row - start_row + 1:
+            raise ValueError(f"Row range {start_row}-{end_row} of column {column_letter} is out of bounds")
+    return values
+
+class open_sheet:
+    """Context manager giving a sheet of an .xlsx workbook opened in read-only mode, the first sheet by default"""
+    def __init__(self, path, sheet=None):
+        if openpyxl is None:
+            raise ImportError(f"Reading {path} requires openpyxl (pip install openpyxl)")
+        self.workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        self.sheet = sheet
+
+    def __enter__(self):
+        return self.workbook[self.sheet] if self.sheet is not None else self.workbook.worksheets[0]
+
+    def __exit__(self, *exc):
+        self.workbook.close()
+
+def is_xlsx(path):
+    return str(path).lower().endswith((".xlsx", ".xlsm"))
+
+def casing_values(items):
+    """Casing joint depths of raw values, non-numeric values are skipped"""
     numbers = []
-    
-    # Iterate over the column items
-    for item in column_data:
-        # Try to convert to float first
+    for item in items:
         if pd.notna(item):
             try:
-                # Try to convert to float
-                float_val = float(item)
-                numbers.append(round(float_val, 2))
+                numbers.append(round(float(item), 2))
             except (ValueError, TypeError):
                 # Skip non-numeric values
                 pass
-    
     return numbers
 
-def extract_deck_tally(csv_path, column_letter, start_row, end_row):
-    """Extract deck tally from CSV file"""
-    # Convert the column letter to column index
-    column_index = ord(column_letter.upper()) - ord('A')
-    
-    # Load the CSV file
-    df = pd.read_csv(csv_path)
-    
-    # Get the column by index
-    if column_index >= len(df.columns):
-        raise ValueError(f"Column {column_letter} not found in CSV file")
-    
-    column_name = df.columns[column_index]
-    
-    # Extract the specified rows (convert to 0-based indexing)
-    start_idx = start_row - 1
-    end_idx = end_row - 1
-    
-    if start_idx < 0 or end_idx >= len(df):
-        raise ValueError(f"Row range {start_row}-{end_row} is out of bounds")
-    
-    # Get the column data for the specified range
-    column_data = df[column_name].iloc[start_idx:end_idx+1]
-    
-    # Initialize a list to hold the values
+def deck_tally_values(items):
+    """Deck tally values of raw values, numbers are rounded to 3 decimals"""
     values = []
-    
-    # Iterate over the column items
-    for item in column_data:
-        # Try to convert to float first
+    for item in items:
         if pd.notna(item):
             try:
-                # Try to convert to float
-                float_val = float(item)
-                values.append(round(float_val, 3))
+                values.append(round(float(item), 3))
             except (ValueError, TypeError):
                 # If conversion fails, keep original value
                 values.append(item)
         else:
             values.append(item)
-    
     return values
 
-def extract_ids(csv_path, column_letter, start_row, end_row):
-    """Extract IDs from CSV file"""
-    # Convert the column letter to column index
-    column_index = ord(column_letter.upper()) - ord('A')
-    
-    # Load the CSV file
-    df = pd.read_csv(csv_path)
-    
-    # Get the column by index
-    if column_index >= len(df.columns):
-        raise ValueError(f"Column {column_letter} not found in CSV file")
-    
-    column_name = df.columns[column_index]
-    
-    # Extract the specified rows (convert to 0-based indexing)
-    start_idx = start_row - 1
-    end_idx = end_row - 1
-    
-    if start_idx < 0 or end_idx >= len(df):
-        raise ValueError(f"Row range {start_row}-{end_row} is out of bounds")
-    
-    # Get the column data for the specified range
-    column_data = df[column_name].iloc[start_idx:end_idx+1]
-    
-    # Initialize a list to hold the numbers
+def id_values(items):
+    """Pipe IDs of raw values, non-numeric values are skipped"""
     numbers = []
-    
-    # Iterate over the column items
-    for item in column_data:
-        # Try to convert to float first
+    for item in items:
         if pd.notna(item):
             try:
-                # Try to convert to float
-                float_val = float(item)
-                numbers.append(round(float_val))
+                numbers.append(round(float(item)))
             except (ValueError, TypeError):
                 # Skip non-numeric values
                 pass
-    
     return numbers
 
-def extract_csv_rows_to_list(csv_file_name):
+def stream_casing_joints(csv_path, column_letter, start_row, end_row, chunk_size=CHUNK_SIZE, sheet=None):
+    """Streaming version of extract_casing_joints, yields lists of casing joint depths"""
+    for items in stream_column(csv_path, column_letter, start_row, end_row, chunk_size, sheet):
+        yield casing_values(items)
+
+def stream_deck_tally(csv_path, column_letter, start_row, end_row, chunk_size=CHUNK_SIZE, sheet=None):
+    """Streaming version of extract_deck_tally, yields lists of values"""
+    for items in stream_column(csv_path, column_letter, start_row, end_row, chunk_size, sheet):
+        yield deck_tally_values(items)
+
+def stream_ids(csv_path, column_letter, start_row, end_row, chunk_size=CHUNK_SIZE, sheet=None):
+    """Streaming version of extract_ids, yields lists of IDs"""
+    for items in stream_column(csv_path, column_letter, start_row, end_row, chunk_size, sheet):
+        yield id_values(items)
+
+def extract_csv_rows_to_list(csv_file_name, sheet=None):
     """
     Extracts the first 8 columns from each row in a CSV file into a list of lists.
     
     :param csv_file_name: The name of the CSV file.
     :return: A list of lists, where each sublist contains the data from one row.
     """
+    if is_xlsx(csv_file_name):
+        _, rows = sheet_rows(csv_file_name, sheet)
+        return [(row + [None]*8)[:8] for row in rows]
+
     # Read the CSV file, taking only the first 8 columns
     df = pd.read_csv(csv_file_name, usecols=range(8))
     
@@ -406,3 +752,38 @@ def extract_csv_rows_to_list(csv_file_name):
     row_data = [[None if pd.isna(cell) else cell for cell in row] for row in data_array]
     
     return row_data
+
+def extract_order_groups(csv_file_name, sheet=None):
+    """Extracts the 'order group' column of the assembly file as strings, None where it is empty.
+    Files without the column give None for every row."""
+    if is_xlsx(csv_file_name):
+        header, rows = sheet_rows(csv_file_name, sheet)
+        if "order group" not in header:
+            return [None]*len(rows)
+        column = header.index("order group")
+        groups = [row[column] if column < len(row) else None for row in rows]
+        # Whole numbers as in the CSV export, 1.0 as '1'
+        return [None if group is None else str(int(group)) if isinstance(group, float) and group.is_integer() else str(group).strip()
+                for group in groups]
+
+    df = pd.read_csv(csv_file_name, dtype={"order group": str})
+    if "order group" not in df.columns:
+        return [None]*len(df)
+    return [None if pd.isna(group) else group.strip() for group in df["order group"]]
+
+def sheet_rows(path, sheet=None):
+    """(header, rows) of a sheet of an .xlsx file (the first sheet by default), as lists of cell values with
+    None for empty cells. The sheet is streamed row by row in read-only mode, as in stream_xlsx_column.
+    Empty rows at the end of the sheet are dropped, as pd.read_csv drops them from the CSV export."""
+    with open_sheet(path, sheet) as worksheet:
+        rows = worksheet.iter_rows(values_only=True)
+        header = [None if cell is None else str(cell) for cell in next(rows, ())]
+        table, empty = [], 0
+        for row in rows:
+            if all(cell is None for cell in row):
+                empty += 1
+                continue
+            table += [[None]*len(row) for _ in range(empty)]
+            table.append(list(row))
+            empty = 0
+    return header, table
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+from pipes import AssemblyPipe, value
+
+
+def validate_inputs(inputs):
+    """Check the loaded inputs (see loader.load_inputs) before any solve.
+
+    All checks are array operations and set joins over the whole input, so they take milliseconds:
+    - duplicate_ids: tubing joints or pups with the same ID
+    - invalid_lengths: tubing joints or pups with a missing, non-numeric or non-positive length
+    - missing_stand_ids: racked stand IDs not in the tubing tally, which the stands are built without
+    - reused_stand_ids: tubing joints racked in more than one stand
+    - incomplete_stands: stands without 3 (triples) or 2 (doubles) joints
+    - leftover_stand_ids (warning): racked IDs after the last whole stand, these joints are used as singles
+    - pups_in_stands: pups that are also tubing joints or racked in a stand
+    - invalid_casing: missing or negative casing connection depths
+    - invalid_assemblies: missing or non-positive assembly lengths, and a top assembly that is not the last
+    - casing_mismatch (warning): rows of a casing tally where the depth derived from the joint lengths and
+      the depth column disagree, see casing.cross_check
+
+    The racked IDs are in inputs["stand_ids"] ({"triples": [...], "doubles": [...]}) and the casing cross-checks
+    in inputs["casing_checks"], when the inputs have them (see loader.load_inputs).
+
+    returns list of problems, dicts with check, severity ("error"/"warning"), message and ids (the offending
+    IDs, or positions for the casing)
+    """
+    problems = []
+
+    def add(check, message, ids, severity="error"):
+        if len(ids):
+            problems.append({"check": check, "severity": severity, "message": message, "ids": [value(id) for id in ids]})
+
+    tubing_ids = pd.Series([pipe.id for pipe in inputs["deck_tally"]], dtype=object)
+    pup_ids = pd.Series([pipe.id for pipe in inputs["pups"]], dtype=object)
+    add("duplicate_ids", "Tubing joints with the same ID", tubing_ids[tubing_ids.duplicated()].unique())
+    add("duplicate_ids", "Pups with the same ID", pup_ids[pup_ids.duplicated()].unique())
+
+    for name, pipes, ids in (("tubing joints", inputs["deck_tally"], tubing_ids), ("pups", inputs["pups"], pup_ids)):
+        lengths = lengths_array([pipe.length for pipe in pipes])
+        add("invalid_lengths", f"{name.capitalize()} without a positive length", ids[~(lengths > 0)].tolist())
+
+    stand_ids = inputs.get("stand_ids")
+    if stand_ids is not None:
+        racked = pd.Series(list(stand_ids["triples"]) + list(stand_ids["doubles"]), dtype=object)
+        add("missing_stand_ids", "Racked IDs not in the tubing tally", racked[~racked.isin(tubing_ids)].unique())
+        add("reused_stand_ids", "Tubing joints racked in more than one stand", racked[racked.duplicated()].unique())
+        for kind, size in (("triples", 3), ("doubles", 2)):
+            leftover = len(stand_ids[kind]) % size
+            add("leftover_stand_ids", f"Racked {kind} IDs after the last whole stand, used as singles",
+                list(stand_ids[kind])[len(stand_ids[kind]) - leftover:], severity="warning")
+        add("pups_in_stands", "Pups racked in a stand", pup_ids[pup_ids.isin(racked)].unique())
+
+    for kind, size in (("triples", 3), ("doubles", 2)):
+        num_pipes = np.array([stand.num_pipes for stand in inputs[kind]], dtype=np.int64)
+        add("incomplete_stands", f"{kind.capitalize()} without {size} joints", [stand.id for stand in np.array(inputs[kind], dtype=object)[num_pipes != size]])
+
+    add("pups_in_stands", "Pups that are also tubing joints", pup_ids[pup_ids.isin(tubing_ids)].unique())
+    stand_pipes = {id(pipe) for stand in inputs["triples"] + inputs["doubles"] for pipe in stand.pipes}
+    add("pups_in_stands", "Pups used in a stand", [pipe.id for pipe in inputs["pups"] if id(pipe) in stand_pipes])
+
+    casing = lengths_array(inputs["casing_tally"])
+    add("invalid_casing", "Casing connections (positions in the tally) without a depth", np.flatnonzero(np.isnan(casing)))
+    add("invalid_casing", "Casing connections (positions in the tally) with a negative depth", np.flatnonzero(casing < 0))
+    for check in inputs.get("casing_checks", []):
+        add("casing_mismatch", f"Rows of {check['path']} where the depth derived from the joint lengths and the depth column disagree",
+            [row["row"] for row in check["report"]], severity="warning")
+
+    assemblies = inputs["assembly_tally"]
+    lengths = lengths_array([assembly.length for assembly in assemblies])
+    add("invalid_assemblies", "Assemblies without a positive length", [assembly.id for assembly, ok in zip(assemblies, lengths > 0) if not ok])
+    top = [assembly.id for assembly in assemblies[:-1] if type(assembly) == AssemblyPipe and assembly.is_top_assembly]
+    add("invalid_assemblies", "Top assemblies before the last assembly", top)
+    if assemblies and not assemblies[-1].is_top_assembly:
+        add("invalid_assemblies", "The last assembly is not a top assembly", [assemblies[-1].id])
+    return problems
+
+
+def check_inputs(inputs):
+    """Raise ValueError with the report if validate_inputs finds any errors. Returns the warnings."""
+    problems = validate_inputs(inputs)
+    errors = [problem for problem in problems if problem["severity"] == "error"]
+    if errors:
+        raise ValueError("Invalid inputs:\n" + format_report(errors))
+    return [problem for problem in problems if problem["severity"] == "warning"]
+
+
+def format_report(problems):
+    lines = []
+    for problem in problems:
+        ids = ", ".join(str(id) for id in problem["ids"][:10])
+        more = f" and {len(problem['ids']) - 10} more" if len(problem["ids"]) > 10 else ""
+        lines.append(f"{problem['check']:.<20}: {problem['message']}: {ids}{more}")
+    return "\n".join(lines)
+
+
+def lengths_array(values):
+    """float64 array of the values, NaN where a value is missing or not numeric"""
+    return pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=np.float64)